@@ -0,0 +1,59 @@
+"""Add per-user aggregate tables
+
+Revision ID: 3b8d6f2a9e41
+Revises: e5a0b7c3d218
+Create Date: 2026-10-18 15:02:47.910224
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8d6f2a9e41'
+down_revision: Union[str, Sequence[str], None] = 'e5a0b7c3d218'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_org_stats',
+                    sa.Column('user_id', sa.Integer(), nullable=False),
+                    sa.Column('org_id', sa.Integer(), nullable=False),
+                    sa.Column('checks_count', sa.Integer(), nullable=False),
+                    sa.Column('total_sum', sa.Numeric(precision=14, scale=2), nullable=False),
+                    sa.ForeignKeyConstraint(['org_id'], ['organizations.org_id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('user_id', 'org_id')
+                    )
+    op.create_table('user_daily_stats',
+                    sa.Column('user_id', sa.Integer(), nullable=False),
+                    sa.Column('day', sa.Date(), nullable=False),
+                    sa.Column('org_id', sa.Integer(), nullable=False),
+                    sa.Column('checks_count', sa.Integer(), nullable=False),
+                    sa.Column('total_sum', sa.Numeric(precision=14, scale=2), nullable=False),
+                    sa.ForeignKeyConstraint(['org_id'], ['organizations.org_id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('user_id', 'day', 'org_id')
+                    )
+    # Заполняем итоги по уже существующим чекам.
+    op.execute("""
+        INSERT INTO user_org_stats (user_id, org_id, checks_count, total_sum)
+        SELECT user_id, org_id, COUNT(*), SUM(check_sum)
+        FROM checks
+        GROUP BY user_id, org_id
+    """)
+    op.execute("""
+        INSERT INTO user_daily_stats (user_id, day, org_id, checks_count, total_sum)
+        SELECT user_id, (created_at AT TIME ZONE 'UTC')::date, org_id, COUNT(*), SUM(check_sum)
+        FROM checks
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_daily_stats')
+    op.drop_table('user_org_stats')
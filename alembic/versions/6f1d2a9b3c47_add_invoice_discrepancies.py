@@ -0,0 +1,36 @@
+"""Add invoice_discrepancies
+
+Revision ID: 6f1d2a9b3c47
+Revises: 4c35167a7a1a
+Create Date: 2026-10-18 10:05:12.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '6f1d2a9b3c47'
+down_revision: Union[str, Sequence[str], None] = '4c35167a7a1a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('invoice_discrepancies',
+                    sa.Column('invoice_id', sa.Integer(), nullable=False),
+                    sa.Column('invoice_sum', sa.Numeric(precision=10, scale=2), nullable=False),
+                    sa.Column('linked_sum', sa.Numeric(precision=14, scale=2), nullable=False),
+                    sa.Column('checks_count', sa.Integer(), nullable=False),
+                    sa.Column('difference', sa.Numeric(precision=14, scale=2), nullable=False),
+                    sa.Column('computed_at', sa.DateTime(timezone=True), nullable=False),
+                    sa.ForeignKeyConstraint(['invoice_id'], ['invoices.invoice_id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('invoice_id')
+                    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('invoice_discrepancies')
@@ -0,0 +1,27 @@
+"""Add index on checks (user_id, created_at, check_id)
+
+Revision ID: 7c4e9a1b5d30
+Revises: 3b8d6f2a9e41
+Create Date: 2026-10-19 10:24:31.562019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4e9a1b5d30'
+down_revision: Union[str, Sequence[str], None] = '3b8d6f2a9e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_checks_user_id_created_at', 'checks', ['user_id', 'created_at', 'check_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_checks_user_id_created_at', table_name='checks')
@@ -0,0 +1,48 @@
+"""Stop bumping the data version from ingest tables
+
+Revision ID: 8d2f5b7e4a16
+Revises: f3c8a1d6e290
+Create Date: 2026-10-19 18:47:12.630518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f5b7e4a16'
+down_revision: Union[str, Sequence[str], None] = 'f3c8a1d6e290'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SHARDS = 64
+# Таблицы, которые меняет вставка чеков и перенос в итоги: версию увеличивает перенос в итоги.
+INGEST_TABLES = (
+    "checks", "items", "user_org_stats", "user_daily_stats", "org_daily_stats", "org_item_daily_stats",
+)
+
+
+def _bump_function(shard: str) -> str:
+    return f"""
+        CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE shard = mod({shard}, {SHARDS});
+            RETURN NULL;
+        END
+        $$
+    """
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in INGEST_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_data_version ON {table}")
+    op.execute(_bump_function("txid_current()"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(_bump_function("pg_backend_pid()"))
+    for table in INGEST_TABLES:
+        op.execute(f"CREATE TRIGGER trg_{table}_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+                   f"FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()")
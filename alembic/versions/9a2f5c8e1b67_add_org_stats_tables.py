@@ -0,0 +1,65 @@
+"""Add organization and item rollup tables
+
+Revision ID: 9a2f5c8e1b67
+Revises: 7c4e9a1b5d30
+Create Date: 2026-10-19 11:48:12.307455
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9a2f5c8e1b67'
+down_revision: Union[str, Sequence[str], None] = '7c4e9a1b5d30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('org_stats_pending',
+                    sa.Column('check_id', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('check_id')
+                    )
+    op.create_table('org_daily_stats',
+                    sa.Column('org_id', sa.Integer(), nullable=False),
+                    sa.Column('day', sa.Date(), nullable=False),
+                    sa.Column('checks_count', sa.Integer(), nullable=False),
+                    sa.Column('total_sum', sa.Numeric(precision=16, scale=2), nullable=False),
+                    sa.ForeignKeyConstraint(['org_id'], ['organizations.org_id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('org_id', 'day')
+                    )
+    op.create_table('org_item_daily_stats',
+                    sa.Column('org_id', sa.Integer(), nullable=False),
+                    sa.Column('day', sa.Date(), nullable=False),
+                    sa.Column('item_name', sa.VARCHAR(length=255), nullable=False),
+                    sa.Column('items_count', sa.Integer(), nullable=False),
+                    sa.Column('total_quantity', sa.Numeric(precision=16, scale=3), nullable=False),
+                    sa.Column('total_revenue', sa.Numeric(precision=16, scale=2), nullable=False),
+                    sa.ForeignKeyConstraint(['org_id'], ['organizations.org_id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('org_id', 'day', 'item_name')
+                    )
+    # Заполняем итоги по уже существующим чекам.
+    op.execute("""
+        INSERT INTO org_daily_stats (org_id, day, checks_count, total_sum)
+        SELECT org_id, (created_at AT TIME ZONE 'UTC')::date, COUNT(*), SUM(check_sum)
+        FROM checks
+        GROUP BY 1, 2
+    """)
+    op.execute("""
+        INSERT INTO org_item_daily_stats (org_id, day, item_name, items_count, total_quantity, total_revenue)
+        SELECT c.org_id, (c.created_at AT TIME ZONE 'UTC')::date, i.item_name,
+               COUNT(*), COALESCE(SUM(i.item_quantity), 0), COALESCE(SUM(i.item_sum), 0)
+        FROM items i
+                 JOIN checks c ON c.check_id = i.check_id
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('org_item_daily_stats')
+    op.drop_table('org_daily_stats')
+    op.drop_table('org_stats_pending')
@@ -0,0 +1,30 @@
+"""Add indexes for loading checks of an invoice
+
+Revision ID: a83e5c1f0d92
+Revises: 6f1d2a9b3c47
+Create Date: 2026-10-18 11:20:43.907116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a83e5c1f0d92'
+down_revision: Union[str, Sequence[str], None] = '6f1d2a9b3c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_check_invoices_invoice_id_check_id', 'check_invoices', ['invoice_id', 'check_id'],
+                    unique=False)
+    op.create_index(op.f('ix_items_check_id'), 'items', ['check_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_items_check_id'), table_name='items')
+    op.drop_index('ix_check_invoices_invoice_id_check_id', table_name='check_invoices')
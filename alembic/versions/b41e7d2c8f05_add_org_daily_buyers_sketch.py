@@ -0,0 +1,28 @@
+"""Add buyers HyperLogLog sketch to org_daily_stats
+
+Revision ID: b41e7d2c8f05
+Revises: 9a2f5c8e1b67
+Create Date: 2026-10-19 14:06:53.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41e7d2c8f05'
+down_revision: Union[str, Sequence[str], None] = '9a2f5c8e1b67'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Скетчи по уже существующим чекам строятся скриптом scripts.rebuild_stats.
+    op.add_column('org_daily_stats', sa.Column('buyers_sketch', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('org_daily_stats', 'buyers_sketch')
@@ -0,0 +1,43 @@
+"""Add idempotency_keys
+
+Revision ID: c2b7e4d9a615
+Revises: a83e5c1f0d92
+Create Date: 2026-10-18 12:02:37.551840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2b7e4d9a615'
+down_revision: Union[str, Sequence[str], None] = 'a83e5c1f0d92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('idempotency_keys',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('user_id', sa.Integer(), nullable=False),
+                    sa.Column('scope', sa.VARCHAR(length=50), nullable=False),
+                    sa.Column('key', sa.VARCHAR(length=255), nullable=False),
+                    sa.Column('request_hash', sa.CHAR(length=64), nullable=False),
+                    sa.Column('status_code', sa.SMALLINT(), nullable=True),
+                    sa.Column('response_body', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+                    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'),
+                              nullable=False),
+                    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.UniqueConstraint('user_id', 'scope', 'key', name='uq_idempotency_keys_user_id_scope_key')
+                    )
+    op.create_index(op.f('ix_idempotency_keys_created_at'), 'idempotency_keys', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_idempotency_keys_created_at'), table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,28 @@
+"""Add check sum DDSketch to org_daily_stats
+
+Revision ID: d7a3c9e4f162
+Revises: b41e7d2c8f05
+Create Date: 2026-10-19 16:37:20.845913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3c9e4f162'
+down_revision: Union[str, Sequence[str], None] = 'b41e7d2c8f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Скетчи по уже существующим чекам строятся скриптом scripts.rebuild_stats.
+    op.add_column('org_daily_stats', sa.Column('check_sum_sketch', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('org_daily_stats', 'check_sum_sketch')
@@ -0,0 +1,53 @@
+"""Search item names through a dictionary of distinct names
+
+Revision ID: e5a0b7c3d218
+Revises: c2b7e4d9a615
+Create Date: 2026-10-18 14:11:05.283371
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a0b7c3d218'
+down_revision: Union[str, Sequence[str], None] = 'c2b7e4d9a615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_table(
+        'item_names',
+        sa.Column('item_name', sa.VARCHAR(length=255), nullable=False),
+        sa.Column('item_name_tsv', postgresql.TSVECTOR(),
+                  sa.Computed("to_tsvector('russian', item_name)", persisted=True), nullable=True),
+        sa.PrimaryKeyConstraint('item_name'),
+    )
+    op.execute("INSERT INTO item_names (item_name) SELECT DISTINCT item_name FROM items")
+    op.create_index('ix_item_names_item_name_tsv', 'item_names', ['item_name_tsv'], unique=False,
+                    postgresql_using='gin')
+    op.create_index('ix_item_names_item_name_trgm', 'item_names', ['item_name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'item_name': 'gin_trgm_ops'})
+    op.create_index('ix_items_item_name_item_id', 'items', ['item_name', 'item_id'], unique=False)
+    op.create_index('ix_items_check_id_item_name', 'items', ['check_id', 'item_name'], unique=False,
+                    postgresql_include=['item_id'])
+    op.drop_index('ix_items_check_id', table_name='items')
+    op.create_index('ix_checks_org_id_created_at', 'checks', ['org_id', 'created_at', 'check_id'], unique=False)
+    op.create_index('ix_checks_created_at', 'checks', ['created_at', 'check_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_checks_created_at', table_name='checks')
+    op.drop_index('ix_checks_org_id_created_at', table_name='checks')
+    op.create_index('ix_items_check_id', 'items', ['check_id'], unique=False)
+    op.drop_index('ix_items_check_id_item_name', table_name='items')
+    op.drop_index('ix_items_item_name_item_id', table_name='items')
+    op.drop_index('ix_item_names_item_name_trgm', table_name='item_names', postgresql_using='gin')
+    op.drop_index('ix_item_names_item_name_tsv', table_name='item_names', postgresql_using='gin')
+    op.drop_table('item_names')
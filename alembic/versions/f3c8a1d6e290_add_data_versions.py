@@ -0,0 +1,51 @@
+"""Add data version counter bumped by triggers on data tables
+
+Revision ID: f3c8a1d6e290
+Revises: d7a3c9e4f162
+Create Date: 2026-10-19 18:02:44.517210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a1d6e290'
+down_revision: Union[str, Sequence[str], None] = 'd7a3c9e4f162'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SHARDS = 64
+TABLES = (
+    "users", "organizations", "invoices", "invoice_discrepancies", "check_invoices", "checks", "items",
+    "user_org_stats", "user_daily_stats", "org_daily_stats", "org_item_daily_stats",
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('data_versions',
+                    sa.Column('shard', sa.SMALLINT(), autoincrement=False, nullable=False),
+                    sa.Column('version', sa.BigInteger(), nullable=False),
+                    sa.PrimaryKeyConstraint('shard'))
+    op.execute(f"INSERT INTO data_versions (shard, version) SELECT generate_series(0, {SHARDS - 1}), 0")
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE shard = mod(pg_backend_pid(), {SHARDS});
+            RETURN NULL;
+        END
+        $$
+    """)
+    for table in TABLES:
+        op.execute(f"CREATE TRIGGER trg_{table}_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+                   f"FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_data_version ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS bump_data_version()")
+    op.drop_table('data_versions')
@@ -1,13 +1,14 @@
 """
 Зависимости для API.
 """
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.crud import crud_user
+from app.core.http_cache import etag_matches
+from app.crud import crud_data_version, crud_user
 from app.db.session import get_db
 from app.models.receipt import User
 from app.schemas.token import TokenData
@@ -39,3 +40,47 @@ async def get_current_user(
     if user is None:
         raise credentials_exception
     return user
+
+
+# Наибольшее значение столбцов ID (integer в PostgreSQL).
+_MAX_ID = 2_147_483_647
+
+
+def id_list(
+        ids: str = Query(..., pattern=r"^\d{1,10}(,\d{1,10})*$", max_length=settings.BATCH_GET_MAX_IDS * 11,
+                         description="ID через запятую, например `1,2,3`")
+) -> list[int]:
+    """
+    Список ID из параметра `ids` в порядке запроса, без повторов.
+
+    Не больше `BATCH_GET_MAX_IDS` ID; ID, которых не может быть в базе, отклоняются с кодом 422.
+    Длина ID и всего параметра ограничена, чтобы длинная строка цифр не разбиралась целиком.
+    """
+    parsed = list(dict.fromkeys(int(value) for value in ids.split(",")))
+    if len(parsed) > settings.BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f"Не больше {settings.BATCH_GET_MAX_IDS} ID в одном запросе")
+    if max(parsed) > _MAX_ID:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f"ID не может быть больше {_MAX_ID}")
+    return parsed
+
+
+async def data_version_etag(
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+) -> str:
+    """
+    ETag ответа аналитики по версии данных (см. `app.crud.crud_data_version`).
+
+    Если ETag совпадает с `If-None-Match`, запрос завершается ответом `304`
+    до выполнения аналитического запроса. Иначе ETag добавляется в ответ.
+    """
+    etag = f'W/"dv{await crud_data_version.get_data_version(db)}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return etag
@@ -1,20 +1,111 @@
 """
 Эндпоинты для работы с чеками.
 """
-from typing import List, Optional
-from datetime import date
+import asyncio
+import hashlib
+from datetime import date, datetime, timedelta, UTC
+from typing import Any, Awaitable, Callable, List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.v1.dependencies import get_current_user
-from app.crud import crud_check
-from app.db.session import get_db
+from app.api.v1.dependencies import data_version_etag, get_current_user, id_list
+from app.core.config import settings
+from app.core.validation import validate_check_totals
+from app.crud import crud_check, crud_idempotency, crud_org_stats, crud_organization, crud_user
+from app.db.session import SessionOpener, get_db, get_session_opener
 from app.schemas import check as check_schema
 from app.schemas.check import User
+from app.services.ingestion import IngestionKeyConflict, IngestionQueueFull, get_ingestion_queue
 
 router = APIRouter()
 
+# Размер страницы при потоковой выгрузке чеков пользователя.
+USER_CHECKS_STREAM_PAGE_SIZE = 1000
+
+IdempotencyKeyHeader = Header(
+    None,
+    alias="Idempotency-Key",
+    max_length=255,
+    description="Уникальный ключ запроса. Повтор с тем же ключом вернет сохраненный ответ вместо повторного создания.",
+)
+
+
+async def _run_idempotent(
+        db: AsyncSession,
+        user_id: int,
+        scope: str,
+        idempotency_key: str,
+        payload: BaseModel,
+        status_code: int,
+        operation: Callable[[], Awaitable[Any]],
+) -> JSONResponse:
+    """
+    Выполнить операцию не более одного раза для данного ключа идемпотентности.
+
+    Ключ резервируется в той же транзакции, что и сама операция, а ответ
+    сохраняется до коммита, поэтому повтор запроса стоит одного индексного
+    поиска. Операция не должна выполнять коммит сама и должна вернуть
+    JSON-совместимое тело ответа.
+    """
+    request_hash = hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+    stored = await crud_idempotency.reserve_idempotency_key(
+        db, user_id=user_id, scope=scope, key=idempotency_key, request_hash=request_hash,
+        ttl=timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+    )
+    if stored is not None:
+        if stored.request_hash != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Ключ идемпотентности уже использован с другим телом запроса",
+            )
+        return JSONResponse(status_code=stored.status_code, content=stored.response_body,
+                            headers={"Idempotent-Replayed": "true"})
+
+    body = await operation()
+    await crud_idempotency.save_idempotent_response(
+        db, user_id=user_id, scope=scope, key=idempotency_key, status_code=status_code, response_body=body
+    )
+    await db.commit()
+    return JSONResponse(status_code=status_code, content=body)
+
+
+def _ensure_valid_totals(checks: List[check_schema.CheckCreate], bulk: bool = False):
+    """
+    Проверяет согласованность сумм чеков и отвечает 422 со списком ошибок по строкам.
+
+    Для пакетного запроса путь ошибки включает индекс чека в массиве.
+    """
+    if not settings.CHECK_TOTALS_VALIDATION_ENABLED:
+        return
+    errors = validate_check_totals(checks, item_sum_tolerance=settings.CHECK_ITEM_SUM_TOLERANCE)
+    if errors:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=[error.as_detail(prefix=("body", error.index) if bulk else ("body",)) for error in errors],
+        )
+
+
+async def _serialize_checks(db: AsyncSession, checks) -> List[check_schema.Check]:
+    """
+    Схемы ответа для чеков. Пользователи и организации берутся из кэша
+    справочников (см. `app.services.reference_cache`), а не загружаются из базы
+    вместе с каждой страницей чеков.
+    """
+    users = await crud_user.get_users_cached(db, list(dict.fromkeys(check.user_id for check in checks)))
+    organizations = await crud_organization.get_organizations_cached(
+        db, list(dict.fromkeys(check.org_id for check in checks)))
+    return [
+        check_schema.Check(
+            check_id=check.check_id, user_id=check.user_id, org_id=check.org_id, check_sum=check.check_sum,
+            created_at=check.created_at, items=check.items,
+            user=users[check.user_id], organization=organizations[check.org_id],
+        )
+        for check in checks
+    ]
+
 
 @router.get(
     "/checks/",
@@ -39,7 +130,29 @@ async def read_checks(
         db, skip=skip, limit=limit, user_id=user_id, org_id=org_id,
         start_date=start_date, end_date=end_date, sort_by=sort_by, sort_order=sort_order
     )
-    return checks
+    return await _serialize_checks(db, checks)
+
+
+@router.get(
+    "/checks/batch",
+    response_model=check_schema.ChecksBatch,
+    summary="Получение чеков по списку ID",
+    responses={401: {"description": "Не авторизован"}}
+)
+async def read_checks_batch(
+        ids: list[int] = Depends(id_list),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Получить чеки по списку ID (`?ids=1,2,3`) одним запросом вместо запроса на каждый чек.
+
+    Чеки возвращаются в порядке `ids`; ID, для которых чеков нет, перечислены в `missing_ids`.
+    """
+    checks = await crud_check.get_checks_by_ids(db, ids)
+    found = {check.check_id for check in checks}
+    return check_schema.ChecksBatch(items=await _serialize_checks(db, checks),
+                                    missing_ids=[check_id for check_id in ids if check_id not in found])
 
 
 @router.get(
@@ -57,7 +170,7 @@ async def read_check(
     db_check = await crud_check.get_check(db, check_id=check_id)
     if db_check is None:
         raise HTTPException(status_code=404, detail="Чек не найден")
-    return db_check
+    return (await _serialize_checks(db, [db_check]))[0]
 
 
 @router.post(
@@ -65,15 +178,150 @@ async def read_check(
     response_model=check_schema.Check,
     status_code=status.HTTP_201_CREATED,
     summary="Создание нового чека",
-    responses={401: {"description": "Не авторизован"}}
+    responses={401: {"description": "Не авторизован"},
+               422: {"description": "Ключ идемпотентности уже использован с другим телом запроса"}}
 )
 async def create_check(
         check: check_schema.CheckCreate,
         db: AsyncSession = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        current_user: User = Depends(get_current_user),
+        idempotency_key: Optional[str] = IdempotencyKeyHeader,
+):
+    """
+    Создать новый чек.
+
+    При передаче заголовка `Idempotency-Key` повторные запросы с тем же
+    ключом возвращают сохраненный ответ (с заголовком `Idempotent-Replayed`)
+    и не создают дубликатов.
+    """
+    _ensure_valid_totals([check])
+    if idempotency_key is None:
+        db_check = await crud_check.create_check(db=db, check=check)
+        return (await _serialize_checks(db, [db_check]))[0]
+
+    async def operation():
+        db_check = await crud_check.create_check(db=db, check=check, commit=False)
+        return (await _serialize_checks(db, [db_check]))[0].model_dump(mode="json")
+
+    return await _run_idempotent(
+        db, user_id=current_user.user_id, scope="checks:create", idempotency_key=idempotency_key,
+        payload=check, status_code=status.HTTP_201_CREATED, operation=operation,
+    )
+
+
+@router.post(
+    "/checks/bulk",
+    response_model=check_schema.CheckBulkCreateResult,
+    status_code=status.HTTP_201_CREATED,
+    summary="Пакетное создание чеков",
+    responses={401: {"description": "Не авторизован"},
+               413: {"description": "Слишком много чеков в одном запросе"},
+               422: {"description": "Ошибки проверки чеков (по строкам) или повтор ключа с другим телом"}}
+)
+async def create_checks_bulk(
+        checks: List[check_schema.CheckCreate],
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user),
+        idempotency_key: Optional[str] = IdempotencyKeyHeader,
+):
+    """
+    Создать массив чеков одной транзакцией.
+
+    Суммы всех чеков проверяются заранее; если хотя бы один чек некорректен,
+    ничего не создается, а ответ 422 содержит ошибки с индексами чеков.
+    Поддерживает заголовок `Idempotency-Key`.
+    """
+    if len(checks) > settings.CHECK_BULK_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Слишком много чеков в одном запросе (максимум {settings.CHECK_BULK_MAX_SIZE})",
+        )
+    _ensure_valid_totals(checks, bulk=True)
+
+    async def operation():
+        return {"check_ids": await crud_check.create_checks_bulk(db, checks, commit=False)}
+
+    if idempotency_key is None:
+        body = await operation()
+        await db.commit()
+        return body
+    return await _run_idempotent(
+        db, user_id=current_user.user_id, scope="checks:bulk_create", idempotency_key=idempotency_key,
+        payload=check_schema.CheckBulkCreate(checks=checks), status_code=status.HTTP_201_CREATED,
+        operation=operation,
+    )
+
+
+def _ingestion_status(row: dict) -> check_schema.CheckIngestionStatus:
+    """Преобразует запись очереди приема в схему статуса."""
+    return check_schema.CheckIngestionStatus(
+        tracking_id=row["tracking_id"],
+        status=row["status"],
+        accepted_at=datetime.fromtimestamp(row["accepted_at"], UTC),
+        check_id=row["check_id"],
+        error=row["error"],
+    )
+
+
+@router.post(
+    "/checks/async",
+    response_model=check_schema.CheckIngestionStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Асинхронное создание чека через очередь приема",
+    responses={401: {"description": "Не авторизован"},
+               422: {"description": "Ключ идемпотентности использован с другим телом запроса"},
+               503: {"description": "Асинхронный прием отключен или очередь переполнена"}}
+)
+async def create_check_async(
+        check: check_schema.CheckCreate,
+        current_user: User = Depends(get_current_user),
+        idempotency_key: Optional[str] = IdempotencyKeyHeader,
+):
+    """
+    Принять чек в очередь без синхронной записи в базу данных.
+
+    Чек записывается в локальный журнал и позже сохраняется в базу фоновым
+    потребителем. Статус можно узнать по `tracking_id` через
+    `GET /checks/async/{tracking_id}`. Повтор с тем же `Idempotency-Key`
+    возвращает ту же запись очереди, а с тем же ключом и другим телом — `422`.
+    """
+    queue = get_ingestion_queue()
+    if queue is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Асинхронный прием чеков отключен")
+    _ensure_valid_totals([check])
+    client_key = f"{current_user.user_id}:{idempotency_key}" if idempotency_key is not None else None
+    try:
+        row = await asyncio.to_thread(queue.enqueue, current_user.user_id, check.model_dump_json(), client_key)
+    except IngestionQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Очередь приема чеков переполнена, повторите запрос позже",
+            headers={"Retry-After": "5"},
+        )
+    except IngestionKeyConflict:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Ключ идемпотентности уже использован с другим телом запроса",
+        )
+    return _ingestion_status(row)
+
+
+@router.get(
+    "/checks/async/{tracking_id}",
+    response_model=check_schema.CheckIngestionStatus,
+    summary="Статус чека, принятого через очередь приема",
+    responses={401: {"description": "Не авторизован"}, 404: {"description": "Запись не найдена"}}
+)
+async def read_check_ingestion_status(
+        tracking_id: str,
+        current_user: User = Depends(get_current_user),
 ):
-    """Создать новый чек."""
-    return await crud_check.create_check(db=db, check=check)
+    """Получить статус обработки чека по идентификатору отслеживания."""
+    queue = get_ingestion_queue()
+    row = await asyncio.to_thread(queue.get, tracking_id) if queue is not None else None
+    if row is None or row["user_id"] != current_user.user_id:
+        raise HTTPException(status_code=404, detail="Запись не найдена")
+    return _ingestion_status(row)
 
 
 @router.get(
@@ -93,7 +341,7 @@ async def read_full_check(
     db_check = await crud_check.get_check(db, check_id=check_id)
     if db_check is None:
         raise HTTPException(status_code=404, detail="Чек не найден")
-    return db_check
+    return (await _serialize_checks(db, [db_check]))[0]
 
 
 @router.post(
@@ -117,6 +365,7 @@ async def link_check_to_invoice(
 # Эндпоинты для Аналитики
 @router.get(
     "/analysis/sales_by_organization",
+    dependencies=[Depends(data_version_etag)],
     response_model=List[check_schema.SalesByOrganization],
     summary="Анализ продаж по организациям",
     responses={401: {"description": "Не авторизован"}}
@@ -134,7 +383,7 @@ async def analysis_sales_by_organization(
 
 @router.get(
     "/users/{user_id}/checks_by_date",
-    response_model=List[check_schema.UserCheck],
+    response_model=check_schema.UserChecksPage,
     summary="Поиск чеков по пользователю за период",
     responses={401: {"description": "Не авторизован"}}
 )
@@ -142,19 +391,73 @@ async def analysis_checks_by_user_for_period(
         user_id: int,
         start_date: date,
         end_date: date,
+        after_created_at: Optional[datetime] = None,
+        after_check_id: Optional[int] = None,
+        limit: int = Query(100, ge=1, le=1000),
         db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     """
-    Поиск чеков по пользователю за период.
+    Поиск чеков по пользователю за период (даты включительно), от новых к старым.
+
+    Для следующей страницы передайте `after_created_at` и `after_check_id`
+    из `next_after_created_at` и `next_after_check_id` предыдущего ответа.
+    """
+    if (after_created_at is None) != (after_check_id is None):
+        raise HTTPException(status_code=422, detail="after_created_at и after_check_id передаются вместе")
+    checks = await crud_check.get_checks_by_user_for_period(
+        db, user_id=user_id, start_date=start_date, end_date=end_date,
+        after_created_at=after_created_at, after_check_id=after_check_id, limit=limit,
+    )
+    page = check_schema.UserChecksPage(checks=checks)
+    if len(checks) == limit:
+        page.next_after_created_at = checks[-1]["created_at"]
+        page.next_after_check_id = checks[-1]["check_id"]
+    return page
+
+
+@router.get(
+    "/users/{user_id}/checks_by_date/stream",
+    summary="Выгрузка чеков пользователя за период потоком",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}, 401: {"description": "Не авторизован"}}
+)
+async def stream_checks_by_user_for_period(
+        user_id: int,
+        start_date: date,
+        end_date: date,
+        open_session: SessionOpener = Depends(get_session_opener),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Выгрузить все чеки пользователя за период в формате NDJSON (по чеку в строке).
+
+    Чеки читаются страницами по `USER_CHECKS_STREAM_PAGE_SIZE`, поэтому память
+    сервера не зависит от объема истории пользователя.
     """
-    user_checks = await crud_check.get_checks_by_user_for_period(db, user_id=user_id, start_date=start_date,
-                                                                 end_date=end_date)
-    return user_checks
+    async def lines():
+        # Сессия зависимости закрывается до отправки ответа, поэтому генератор открывает свою.
+        after_created_at = after_check_id = None
+        async with open_session() as db:
+            while True:
+                checks = await crud_check.get_checks_by_user_for_period(
+                    db, user_id=user_id, start_date=start_date, end_date=end_date,
+                    after_created_at=after_created_at, after_check_id=after_check_id,
+                    limit=USER_CHECKS_STREAM_PAGE_SIZE,
+                )
+                if checks:
+                    yield "".join(check_schema.UserCheck.model_validate(check).model_dump_json() + "\n"
+                                  for check in checks)
+                if len(checks) < USER_CHECKS_STREAM_PAGE_SIZE:
+                    break
+                after_created_at, after_check_id = checks[-1]["created_at"], checks[-1]["check_id"]
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @router.get(
     "/analysis/items_by_category",
+    dependencies=[Depends(data_version_etag)],
     response_model=List[check_schema.ItemsByCategory],
     summary="Анализ товаров/услуг по категориям",
     responses={401: {"description": "Не авторизован"}}
@@ -168,3 +471,126 @@ async def analysis_items_by_category(
     """
     items_data = await crud_check.get_items_by_category(db)
     return items_data
+
+
+@router.get(
+    "/analysis/top_items",
+    dependencies=[Depends(data_version_etag)],
+    response_model=check_schema.TopItemsReport,
+    summary="Топ товаров по выручке, объему или числу продаж",
+    responses={401: {"description": "Не авторизован"}}
+)
+async def analysis_top_items(
+        order_by: Literal["revenue", "quantity", "count"] = "revenue",
+        limit: int = Query(100, ge=1, le=1000),
+        org_id: Optional[int] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        exact: bool = Query(False, description="Считать по исходным позициям (медленно, для офлайн-отчетов)"),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Топ товаров (по названию) за период (даты включительно, UTC), по всем
+    организациям или по одной.
+
+    По умолчанию отчет строится по дневным итогам, которые обновляются
+    фоновой задачей; `pending_checks` — сколько последних чеков (выбранной
+    организации) в них еще не учтено.
+    """
+    items = await crud_org_stats.get_top_items(db, order_by=order_by, limit=limit, org_id=org_id,
+                                               start_date=start_date, end_date=end_date, exact=exact)
+    if exact:
+        return check_schema.TopItemsReport(mode="exact", items=items)
+    pending = await crud_org_stats.count_pending_checks(db, org_id=org_id)
+    return check_schema.TopItemsReport(mode="rollup", pending_checks=pending, items=items)
+
+
+@router.get(
+    "/analysis/top_organizations",
+    dependencies=[Depends(data_version_etag)],
+    response_model=check_schema.TopOrganizationsReport,
+    summary="Топ организаций по выручке или числу чеков",
+    responses={401: {"description": "Не авторизован"}}
+)
+async def analysis_top_organizations(
+        order_by: Literal["revenue", "checks"] = "revenue",
+        limit: int = Query(100, ge=1, le=1000),
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        exact: bool = Query(False, description="Считать по исходным чекам (медленно, для офлайн-отчетов)"),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Топ организаций за период (даты включительно, UTC). Режимы — как у `/analysis/top_items`.
+    """
+    organizations = await crud_org_stats.get_top_organizations(db, order_by=order_by, limit=limit,
+                                                               start_date=start_date, end_date=end_date,
+                                                               exact=exact)
+    if exact:
+        return check_schema.TopOrganizationsReport(mode="exact", organizations=organizations)
+    pending = await crud_org_stats.count_pending_checks(db)
+    return check_schema.TopOrganizationsReport(mode="rollup", pending_checks=pending, organizations=organizations)
+
+
+@router.get(
+    "/analysis/distinct_buyers",
+    dependencies=[Depends(data_version_etag)],
+    response_model=check_schema.DistinctBuyersReport,
+    summary="Количество уникальных покупателей организации за период",
+    responses={401: {"description": "Не авторизован"}}
+)
+async def analysis_distinct_buyers(
+        org_id: int,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        exact: bool = Query(False, description="Точный подсчет по исходным чекам (медленно, для офлайн-отчетов)"),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Количество уникальных покупателей организации за период (даты включительно, UTC).
+
+    По умолчанию — оценка HyperLogLog по дневным скетчам с погрешностью
+    `relative_error`; `pending_checks` — сколько последних чеков в скетчах еще не учтено.
+    """
+    buyers = await crud_org_stats.get_distinct_buyers(db, org_id=org_id, start_date=start_date,
+                                                      end_date=end_date, exact=exact)
+    report = check_schema.DistinctBuyersReport(mode="exact" if exact else "sketch", org_id=org_id,
+                                               start_date=start_date, end_date=end_date, **buyers)
+    if not exact:
+        report.pending_checks = await crud_org_stats.count_pending_checks(db, org_id=org_id)
+    return report
+
+
+@router.get(
+    "/analysis/check_sum_distribution",
+    dependencies=[Depends(data_version_etag)],
+    response_model=check_schema.CheckSumDistribution,
+    summary="Квантили и гистограмма сумм чеков",
+    responses={401: {"description": "Не авторизован"}}
+)
+async def analysis_check_sum_distribution(
+        org_id: Optional[int] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        bins: int = Query(20, ge=1, le=200, description="Количество интервалов гистограммы"),
+        exact: bool = Query(False, description="Считать по исходным чекам (медленно, для офлайн-отчетов)"),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Распределение сумм чеков за период (даты включительно, UTC) по одной
+    организации или по всем: p50/p90/p99 и гистограмма с логарифмическими интервалами.
+
+    По умолчанию — по дневным скетчам DDSketch; `pending_checks` — сколько
+    последних чеков в них еще не учтено.
+    """
+    distribution = await crud_org_stats.get_check_sum_distribution(db, org_id=org_id, start_date=start_date,
+                                                                   end_date=end_date, bins=bins, exact=exact)
+    report = check_schema.CheckSumDistribution(mode="exact" if exact else "sketch", org_id=org_id,
+                                               start_date=start_date, end_date=end_date, **distribution)
+    if not exact:
+        report.pending_checks = await crud_org_stats.count_pending_checks(db, org_id=org_id)
+    return report
@@ -0,0 +1,78 @@
+"""
+Эндпоинты колоночной выгрузки данных (Arrow IPC).
+"""
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.dependencies import get_current_user
+from app.core.config import settings
+from app.db.session import SessionOpener, get_db, get_session_opener
+from app.schemas.check import User
+from app.services import export
+
+router = APIRouter()
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+EXPORT_SNAPSHOT_HEADER = "X-Export-Snapshot"
+
+
+@router.get(
+    "/export/{table}",
+    summary="Выгрузка таблицы в формате Arrow IPC",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {ARROW_STREAM_MEDIA_TYPE: {}}},
+        401: {"description": "Не авторизован"},
+        501: {"description": "Пакет pyarrow не установлен"},
+    }
+)
+async def export_table(
+        table: Literal["checks", "items"],
+        since: Optional[int] = Query(
+            None, ge=0,
+            description=f"Значение заголовка {EXPORT_SNAPSHOT_HEADER} предыдущей выгрузки: "
+                        f"вернуть только строки, измененные после нее.",
+        ),
+        db: AsyncSession = Depends(get_db),
+        open_session: SessionOpener = Depends(get_session_opener),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Выгрузить таблицу `checks` или `items` потоком Arrow IPC (stream format)
+    из согласованного снимка базы данных.
+
+    Строки читаются курсором на стороне сервера и отправляются пачками по
+    `EXPORT_BATCH_SIZE`. Заголовок `X-Export-Snapshot` ответа передается в
+    параметре `since` следующего запроса, чтобы получить только измененные
+    строки; отдельные строки могут повториться в двух выгрузках подряд
+    (см. `app.services.export`).
+    """
+    if export.pyarrow is None:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Пакет pyarrow не установлен")
+
+    # Снимок берется до начала ответа, чтобы вернуть его в заголовке. Сама выгрузка
+    # читает более поздний снимок, поэтому водяной знак не пропускает изменений.
+    await db.rollback()
+    snapshot_xmin, _ = await export.begin_snapshot(db)
+    await db.rollback()
+    schema = export.arrow_schema(table)
+
+    async def chunks():
+        # Сессия зависимости закрывается до отправки ответа, поэтому генератор открывает свою.
+        # Курсор выгрузки читается все время ответа; его длительность ограничена объемом таблицы.
+        async with open_session(statement_timeout_ms=0) as export_db:
+            # Транзакция выгрузки начинается заново с уровнем изоляции REPEATABLE READ.
+            await export_db.rollback()
+            _, snapshot_xmax = await export.begin_snapshot(export_db)
+            batches = export.iter_record_batches(
+                export_db, table, snapshot_xmax, since=since, batch_size=settings.EXPORT_BATCH_SIZE,
+            )
+            async for chunk in export.iter_arrow_stream(batches, schema):
+                yield chunk
+
+    return StreamingResponse(
+        chunks(), media_type=ARROW_STREAM_MEDIA_TYPE, headers={EXPORT_SNAPSHOT_HEADER: str(snapshot_xmin)},
+    )
@@ -1,13 +1,103 @@
 """
-Эндпоинт для проверки работоспособности приложения.
+Эндпоинты для проверки работоспособности приложения.
+
+`/health/live` — проба живости: процесс отвечает на запросы. К базе данных
+не обращается, поэтому недоступность базы не приводит к перезапуску процесса.
+
+`/health/ready` — проба готовности: база данных доступна по последней
+фоновой проверке (см. `app.services.db_health`). Отвечает сразу, не
+дожидаясь базы данных.
+
+`/health/db` — метрики выключателя подключения к базе и пула соединений.
+
+`/health/admission` — текущие лимиты контроля допуска по классам запросов.
+
+`/health/reference-cache` — заполненность и попадания кэша справочников.
 """
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
 
-from app.db.session import check_db_connection
+from app.core.admission import admission_controller
+from app.db.session import db_breaker, pool_metrics
+from app.services.db_health import db_health
+from app.services.reference_cache import reference_cache_metrics
 
 router = APIRouter()
 
 
+def _readiness_response() -> JSONResponse:
+    ready = db_health.ready
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "OK" if ready else "UNAVAILABLE", **db_health.status()},
+        headers={"Cache-Control": "no-store"},
+    )
+
+
+@router.get(
+    "/health/live",
+    status_code=status.HTTP_200_OK,
+    summary="Проба живости",
+)
+async def liveness_check():
+    """Процесс запущен и обрабатывает запросы."""
+    return {"status": "OK"}
+
+
+@router.get(
+    "/health/ready",
+    status_code=status.HTTP_200_OK,
+    summary="Проба готовности",
+    responses={503: {"description": "База данных недоступна"}}
+)
+async def readiness_check():
+    """
+    Возвращает результат последней фоновой проверки базы данных.
+    """
+    return _readiness_response()
+
+
+@router.get(
+    "/health/db",
+    status_code=status.HTTP_200_OK,
+    summary="Состояние подключения к базе данных",
+)
+async def database_metrics():
+    """
+    Состояние выключателя подключения к базе данных (`closed`, `open`, `half_open`),
+    счетчики его срабатываний и заполненность пула соединений процесса.
+    """
+    return {"breaker": db_breaker.metrics(), "pool": pool_metrics()}
+
+
+@router.get(
+    "/health/admission",
+    status_code=status.HTTP_200_OK,
+    summary="Лимиты контроля допуска",
+)
+async def admission_metrics():
+    """
+    Для каждого класса запросов (`ingestion`, `reads`, `analytics`, `login`):
+    текущий адаптивный лимит, выполняющиеся и ожидающие запросы, счетчики
+    допущенных и отклоненных запросов.
+    """
+    return admission_controller.metrics()
+
+
+@router.get(
+    "/health/reference-cache",
+    status_code=status.HTTP_200_OK,
+    summary="Состояние кэша справочников",
+)
+async def reference_cache_status():
+    """
+    Для кэшей организаций и пользователей в памяти процесса: размер и емкость,
+    версия (увеличивается при каждой инвалидации), счетчики попаданий,
+    промахов и инвалидаций.
+    """
+    return reference_cache_metrics()
+
+
 @router.get(
     "/health",
     status_code=status.HTTP_200_OK,
@@ -16,12 +106,6 @@ router = APIRouter()
 )
 async def health_check():
     """
-    Проверяет доступность базы данных.
+    Проверяет доступность базы данных (то же, что `/health/ready`).
     """
-    if await check_db_connection():
-        return {"status": "OK"}
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="База данных недоступна",
-        )
+    return _readiness_response()
@@ -1,15 +1,19 @@
 """
 Эндпоинты для работы с накладными.
 """
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.v1.dependencies import get_current_user
-from app.crud import crud_invoice
+from app.core.config import settings
+from app.crud import crud_check, crud_invoice
 from app.db.session import get_db
-from app.schemas.check import Invoice, InvoiceCreate, InvoiceWithChecks, User
+from app.schemas.check import (
+    CheckInvoiceLink, CheckInvoiceLinkResult, Invoice, InvoiceCheck, InvoiceCreate, InvoiceReconciliationReport,
+    InvoiceReconciliationRun, InvoiceWithChecks, Item, User
+)
 
 router = APIRouter()
 
@@ -47,6 +51,56 @@ async def read_invoices(
     return invoices
 
 
+@router.get(
+    "/invoices/reconciliation",
+    response_model=InvoiceReconciliationReport,
+    summary="Отчет о расхождениях сумм накладных и привязанных чеков",
+    responses={401: {"description": "Не авторизован"}}
+)
+async def read_invoice_reconciliation(
+        after_invoice_id: Optional[int] = None,
+        limit: int = Query(100, ge=1, le=1000),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Получить страницу отчета о расхождениях по результатам последней сверки.
+
+    Для получения следующей страницы передайте `after_invoice_id` из поля
+    `next_after_invoice_id` предыдущего ответа.
+    """
+    rows, total, computed_at = await crud_invoice.get_invoice_discrepancies(
+        db, after_invoice_id=after_invoice_id, limit=limit
+    )
+    return {
+        "computed_at": computed_at,
+        "total": total,
+        "items": rows,
+        "next_after_invoice_id": rows[-1].invoice_id if len(rows) == limit else None,
+    }
+
+
+@router.post(
+    "/invoices/reconciliation",
+    response_model=InvoiceReconciliationRun,
+    summary="Запуск сверки накладных",
+    responses={401: {"description": "Не авторизован"}, 409: {"description": "Сверка уже выполняется"}}
+)
+async def run_invoice_reconciliation(
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Пересчитать расхождения по всем накладным одним set-based запросом.
+
+    Если сверка уже выполняется (в этом или другом процессе), отвечает `409`.
+    """
+    summary = await crud_invoice.reconcile_invoices(db)
+    if summary is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Сверка накладных уже выполняется")
+    return summary
+
+
 @router.get(
     "/invoices/{invoice_id}",
     response_model=Invoice,
@@ -73,11 +127,93 @@ async def read_invoice(
 )
 async def read_invoice_with_checks(
         invoice_id: int,
+        after_check_id: Optional[int] = None,
+        limit: int = Query(100, ge=1, le=1000),
+        include_items: bool = False,
         db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
-    """Получить накладную с привязанными чеками."""
-    db_invoice = await crud_invoice.get_invoice_with_checks(db, invoice_id=invoice_id)
+    """
+    Получить накладную со страницей привязанных чеков.
+
+    Для получения следующей страницы передайте `after_check_id` из поля
+    `next_after_check_id` предыдущего ответа. Позиции чеков возвращаются
+    только при `include_items=true`.
+    """
+    db_invoice = await crud_invoice.get_invoice(db, invoice_id=invoice_id)
     if db_invoice is None:
         raise HTTPException(status_code=404, detail="Накладная не найдена")
-    return db_invoice
+    checks, total = await crud_invoice.get_invoice_checks(
+        db, invoice_id=invoice_id, after_check_id=after_check_id, limit=limit, include_items=include_items
+    )
+    return InvoiceWithChecks(
+        invoice_id=db_invoice.invoice_id, invoice_sum=db_invoice.invoice_sum,
+        invoice_type=db_invoice.invoice_type, payment_type=db_invoice.payment_type,
+        total_checks=total,
+        checks=[
+            InvoiceCheck(
+                check_id=check.check_id, created_at=check.created_at, check_sum=check.check_sum,
+                user_id=check.user_id, org_id=check.org_id,
+                items=[Item.model_validate(item) for item in check.items] if include_items else None,
+            )
+            for check in checks
+        ],
+        next_after_check_id=checks[-1].check_id if len(checks) == limit else None,
+    )
+
+
+def _check_link_batch_size(size: int):
+    """Проверяет, что пакет связей не превышает допустимый размер."""
+    if size > settings.LINK_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Слишком много связей в одном запросе (максимум {settings.LINK_BATCH_MAX_SIZE})",
+        )
+
+
+@router.post(
+    "/invoices/{invoice_id}/checks",
+    response_model=List[CheckInvoiceLinkResult],
+    summary="Пакетное связывание чеков с накладной",
+    responses={
+        401: {"description": "Не авторизован"},
+        404: {"description": "Накладная не найдена"},
+        413: {"description": "Слишком много связей в одном запросе"},
+    }
+)
+async def link_checks_to_invoice(
+        invoice_id: int,
+        check_ids: List[int] = Body(..., description="Список ID чеков для привязки к накладной."),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Связать список чеков с накладной одним запросом.
+
+    Возвращает результат для каждого ID чека. Уже существующие связи не
+    считаются ошибкой и помечаются статусом `already_linked`.
+    """
+    _check_link_batch_size(len(check_ids))
+    if await crud_invoice.get_invoice(db, invoice_id=invoice_id) is None:
+        raise HTTPException(status_code=404, detail="Накладная не найдена")
+    return await crud_check.link_checks_to_invoices(db, links=((check_id, invoice_id) for check_id in check_ids))
+
+
+@router.post(
+    "/invoices/links",
+    response_model=List[CheckInvoiceLinkResult],
+    summary="Пакетное связывание чеков с накладными (многие-ко-многим)",
+    responses={401: {"description": "Не авторизован"}, 413: {"description": "Слишком много связей в одном запросе"}}
+)
+async def link_checks_to_invoices(
+        links: List[CheckInvoiceLink],
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Связать произвольные пары "чек — накладная" одним запросом.
+
+    Возвращает результат для каждой пары в исходном порядке.
+    """
+    _check_link_batch_size(len(links))
+    return await crud_check.link_checks_to_invoices(db, links=((link.check_id, link.invoice_id) for link in links))
@@ -0,0 +1,54 @@
+"""
+Эндпоинты для работы с товарными позициями.
+"""
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.dependencies import get_current_user
+from app.crud import crud_item
+from app.db.session import get_db
+from app.schemas.check import ItemSearchPage, User
+
+router = APIRouter()
+
+
+@router.get(
+    "/items/search",
+    response_model=ItemSearchPage,
+    summary="Поиск позиций по названию",
+    responses={401: {"description": "Не авторизован"}}
+)
+async def search_items(
+        q: str = Query(..., min_length=2, max_length=255, description="Поисковый запрос"),
+        limit: int = Query(20, ge=1, le=100),
+        org_id: Optional[int] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        after_item_name: Optional[str] = Query(None, max_length=255),
+        after_item_id: Optional[int] = None,
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Найти позиции чеков по названию.
+
+    Поиск учитывает русскую морфологию ("молока" находит "Молоко") и
+    допускает опечатки. Результаты отсортированы по релевантности.
+    Можно ограничить поиск организацией и периодом (даты включительно).
+    Для следующей страницы передайте `after_item_name` и `after_item_id`
+    из `next_after_item_name` и `next_after_item_id` предыдущего ответа.
+    """
+    if (after_item_name is None) != (after_item_id is None):
+        raise HTTPException(status_code=422, detail="after_item_name и after_item_id передаются вместе")
+    items = await crud_item.search_items(
+        db, q=q, limit=limit, org_id=org_id, start_date=start_date, end_date=end_date,
+        after_item_name=after_item_name, after_item_id=after_item_id,
+    )
+    page = ItemSearchPage(items=items)
+    if len(items) == limit:
+        page.next_after_item_name = items[-1].item_name
+        page.next_after_item_id = items[-1].item_id
+    return page
@@ -6,10 +6,10 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.v1.dependencies import get_current_user
+from app.api.v1.dependencies import get_current_user, id_list
 from app.crud import crud_organization
 from app.db.session import get_db
-from app.schemas.check import Organization, OrganizationCreate, User
+from app.schemas.check import Organization, OrganizationCreate, OrganizationsBatch, User
 
 router = APIRouter()
 
@@ -47,6 +47,27 @@ async def read_organizations(
     return organizations
 
 
+@router.get(
+    "/organizations/batch",
+    response_model=OrganizationsBatch,
+    summary="Получение организаций по списку ID",
+    responses={401: {"description": "Не авторизован"}}
+)
+async def read_organizations_batch(
+        ids: list[int] = Depends(id_list),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Получить организации по списку ID (`?ids=1,2,3`) одним запросом.
+
+    Организации возвращаются в порядке `ids`; ненайденные ID перечислены в `missing_ids`.
+    """
+    organizations = await crud_organization.get_organizations_cached(db, ids)
+    return OrganizationsBatch(items=[organizations[org_id] for org_id in ids if org_id in organizations],
+                              missing_ids=[org_id for org_id in ids if org_id not in organizations])
+
+
 @router.get(
     "/organizations/{org_id}",
     response_model=Organization,
@@ -58,8 +79,8 @@ async def read_organization(
         db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
-    """Получить организацию по ID."""
-    db_org = await crud_organization.get_organization(db, org_id=org_id)
-    if db_org is None:
+    """Получить организацию по ID (из кэша справочников, если она там есть)."""
+    organization = (await crud_organization.get_organizations_cached(db, [org_id])).get(org_id)
+    if organization is None:
         raise HTTPException(status_code=404, detail="Организация не найдена")
-    return db_org
+    return organization
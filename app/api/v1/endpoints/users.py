@@ -1,15 +1,16 @@
 """
 Эндпоинты для работы с пользователями.
 """
-from typing import List
+from datetime import date
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.v1.dependencies import get_current_user
-from app.crud import crud_user
+from app.api.v1.dependencies import data_version_etag, get_current_user, id_list
+from app.crud import crud_user, crud_user_stats
 from app.db.session import get_db
-from app.schemas.check import User, UserCreate
+from app.schemas.check import User, UserCreate, UserSummary, UsersBatch
 
 router = APIRouter()
 
@@ -49,6 +50,27 @@ async def read_users(
     return users
 
 
+@router.get(
+    "/users/batch",
+    response_model=UsersBatch,
+    summary="Получение пользователей по списку ID",
+    responses={401: {"description": "Не авторизован"}}
+)
+async def read_users_batch(
+        ids: list[int] = Depends(id_list),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Получить пользователей по списку ID (`?ids=1,2,3`) одним запросом.
+
+    Пользователи возвращаются в порядке `ids`; ненайденные ID перечислены в `missing_ids`.
+    """
+    users = await crud_user.get_users_cached(db, ids)
+    return UsersBatch(items=[users[user_id] for user_id in ids if user_id in users],
+                      missing_ids=[user_id for user_id in ids if user_id not in users])
+
+
 @router.get(
     "/users/{user_id}",
     response_model=User,
@@ -60,8 +82,37 @@ async def read_user(
         db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
-    """Получить пользователя по ID."""
+    """Получить пользователя по ID (из кэша справочников, если он там есть)."""
+    user = (await crud_user.get_users_cached(db, [user_id])).get(user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    return user
+
+
+@router.get(
+    "/users/{user_id}/summary",
+    dependencies=[Depends(data_version_etag)],
+    response_model=UserSummary,
+    summary="Сводка покупок пользователя",
+    responses={401: {"description": "Не авторизован"}, 404: {"description": "Пользователь не найден"}}
+)
+async def read_user_summary(
+        user_id: int,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        top: int = Query(5, ge=1, le=50, description="Количество организаций в топе"),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+):
+    """
+    Получить сводку покупок пользователя: количество чеков, общую сумму,
+    средний чек и организации с наибольшей суммой покупок.
+
+    Без `start_date`/`end_date` сводка строится за все время, иначе — за
+    период (даты включительно, UTC).
+    """
     db_user = await crud_user.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
-    return db_user
+    return await crud_user_stats.get_user_summary(db, user_id=user_id, start_date=start_date,
+                                                  end_date=end_date, top=top)
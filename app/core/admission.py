@@ -0,0 +1,228 @@
+"""
+Контроль допуска запросов (admission control) при перегрузке.
+
+Запросы делятся на классы по маршруту (`route_class`): прием чеков и другие
+изменения (`ingestion`), чтение (`reads`), аналитика и выгрузки
+(`analytics`), получение токена (`login`). У каждого класса свой лимит
+одновременно выполняющихся запросов, поэтому тяжелая аналитика не занимает
+соединения пула, нужные приему чеков.
+
+Запрос сверх лимита ждет в очереди класса не дольше `queue_timeout_seconds`;
+если место не освободилось или очередь заполнена, он сразу получает `503` с
+заголовком `Retry-After`, а не ждет пула соединений до таймаута клиента.
+
+Лимит класса подстраивается по алгоритму AIMD: `get_db` сохраняет в
+`request.state.db_seconds` время работы с базой данных (включая ожидание
+соединения пула), и если оно превышает `latency_target_ms` или база
+недоступна (`503`/`504`), лимит уменьшается в `DECREASE_FACTOR` раз, иначе
+растет на `1 / limit` за запрос (примерно на единицу за "окно" запросов) до
+`max_concurrency`.
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import deque
+from typing import Optional
+
+from app.core.config import AdmissionClassSettings, settings
+
+logger = logging.getLogger(__name__)
+
+DECREASE_FACTOR = 0.8
+
+_READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+_ANALYTICS_PREFIXES = ("/api/v1/analysis/", "/api/v1/export/", "/api/v1/invoices/reconciliation")
+_OVERLOAD_STATUSES = frozenset({503, 504})
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Класс запроса для контроля допуска; None — запрос не ограничивается (служебные эндпоинты)."""
+    if not path.startswith("/api/v1/"):
+        return None
+    if path.startswith("/api/v1/login/"):
+        return "login"
+    if path.startswith(_ANALYTICS_PREFIXES) or path.endswith("/summary"):
+        return "analytics"
+    if method not in _READ_METHODS:
+        return "ingestion"
+    return "reads"
+
+
+class AdmissionRejected(Exception):
+    """Запрос не допущен: очередь класса заполнена или истекло время ожидания в ней."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name}: запрос не допущен, повторите через {retry_after:.1f} с")
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """Лимит одновременных запросов одного класса с очередью ожидания и AIMD-подстройкой."""
+
+    def __init__(self, name: str, config: AdmissionClassSettings):
+        self.name = name
+        self.min_limit = config.min_concurrency
+        self.max_limit = config.max_concurrency
+        self.latency_target = config.latency_target_ms / 1000
+        self.queue_timeout = config.queue_timeout_seconds
+        self.max_queue = config.max_queue
+        self.limit = float(config.max_concurrency)
+        self.in_flight = 0
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self.decreased_total = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def _reject(self) -> AdmissionRejected:
+        self.rejected_total += 1
+        return AdmissionRejected(self.name, max(self.queue_timeout, 1.0))
+
+    async def acquire(self):
+        """Занять место или выбросить `AdmissionRejected`."""
+        if self._has_capacity() and not self._waiters:
+            self.in_flight += 1
+            self.admitted_total += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await waiter
+        except BaseException as e:
+            self._abandon(waiter)
+            if isinstance(e, TimeoutError):
+                raise self._reject() from None
+            raise
+        self.admitted_total += 1
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False):
+        """
+        Освободить место. `latency` — время работы с базой данных (None, если
+        запрос к ней не обращался), `overloaded` — база данных не ответила вовремя.
+        """
+        if overloaded or (latency is not None and latency > self.latency_target):
+            self._decrease()
+        elif latency is not None:
+            self.limit = min(self.limit + 1 / self.limit, float(self.max_limit))
+        self.in_flight -= 1
+        self._wake()
+
+    def _decrease(self):
+        # Запросы, начатые до предыдущего уменьшения, отражают ту же перегрузку:
+        # уменьшаем не чаще одного раза за целевое время ответа.
+        now = time.monotonic()
+        if now - self._last_decrease < self.latency_target:
+            return
+        self._last_decrease = now
+        limit = max(self.limit * DECREASE_FACTOR, float(self.min_limit))
+        if int(limit) < int(self.limit):
+            logger.warning(f"Контроль допуска: лимит класса {self.name} снижен до {int(limit)}")
+        self.limit = limit
+        self.decreased_total += 1
+
+    def _wake(self):
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _abandon(self, waiter: asyncio.Future):
+        """Снять ожидание; если место уже было передано этому запросу, вернуть его."""
+        if waiter.done() and not waiter.cancelled():
+            self.in_flight -= 1
+            self._wake()
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def metrics(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted_total": self.admitted_total,
+            "rejected_total": self.rejected_total,
+            "decreased_total": self.decreased_total,
+        }
+
+
+class AdmissionController:
+    """Лимиты всех классов запросов процесса."""
+
+    def __init__(self, classes: dict[str, AdmissionClassSettings]):
+        self.limiters = {name: AdaptiveLimiter(name, config) for name, config in classes.items()}
+
+    def limiter_for(self, method: str, path: str) -> Optional[AdaptiveLimiter]:
+        name = route_class(method, path)
+        return self.limiters.get(name) if name is not None else None
+
+    def metrics(self) -> dict:
+        return {name: limiter.metrics() for name, limiter in self.limiters.items()}
+
+
+admission_controller = AdmissionController(settings.ADMISSION_CLASSES)
+
+
+_REJECTED_BODY = json.dumps({"detail": "Сервис перегружен, повторите запрос позже"}, ensure_ascii=False).encode()
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware: допуск запросов по лимитам `AdmissionController`."""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limiter = self.controller.limiter_for(scope["method"], scope["path"])
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await limiter.acquire()
+        except AdmissionRejected as e:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(_REJECTED_BODY)).encode()),
+                    (b"retry-after", str(math.ceil(e.retry_after)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": _REJECTED_BODY})
+            return
+
+        state = scope.setdefault("state", {})
+        status_code = None
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            limiter.release(latency=state.get("db_seconds"), overloaded=status_code in _OVERLOAD_STATUSES)
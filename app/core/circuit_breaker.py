@@ -0,0 +1,110 @@
+"""
+Автоматический выключатель (circuit breaker) для обращений к внешней зависимости.
+
+Состояния:
+- `closed` — вызовы разрешены; после `failure_threshold` ошибок подряд
+  выключатель размыкается;
+- `open` — вызовы сразу отклоняются (`CircuitOpenError`) в течение
+  `reset_timeout` секунд, не нагружая недоступную зависимость;
+- `half_open` — по истечении `reset_timeout` разрешается один пробный
+  вызов: успех замыкает выключатель, ошибка снова размыкает его, а
+  прерванный вызов (`record_abandoned`) разрешает следующий пробный.
+
+Методы синхронные и не ждут, поэтому безопасны в цикле событий без блокировок.
+"""
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Выключатель разомкнут: вызов отклонен без обращения к зависимости."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name}: выключатель разомкнут, повторите через {retry_after:.1f} с")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Выключатель с порогом ошибок подряд и одним пробным вызовом после паузы."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.failures_total = 0
+        self.successes_total = 0
+        self.rejected_total = 0
+        self.opened_total = 0
+        self.last_error: Optional[str] = None
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def retry_after(self) -> float:
+        """Через сколько секунд выключатель разрешит пробный вызов."""
+        if self._opened_at is None:
+            return 0.0
+        return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def before_call(self) -> bool:
+        """Разрешить вызов или выбросить `CircuitOpenError`; True — разрешен пробный вызов."""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        self.rejected_total += 1
+        # Пока идет пробный вызов, следующий возможен не раньше чем через полную паузу.
+        raise CircuitOpenError(self.name, self.retry_after() or self.reset_timeout)
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logger.info(f"{self.name}: выключатель замкнут, зависимость снова доступна")
+        self.successes_total += 1
+        self.consecutive_failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        self.failures_total += 1
+        self.consecutive_failures += 1
+        self.last_error = repr(error) if error is not None else None
+        if self._trial_in_flight or (self._opened_at is None and self.consecutive_failures >= self.failure_threshold):
+            if self._opened_at is None:
+                logger.warning(f"{self.name}: выключатель разомкнут после {self.consecutive_failures} ошибок "
+                               f"подряд: {self.last_error}")
+            self.opened_total += 1
+            self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def record_abandoned(self):
+        """
+        Пробный вызов прерван до результата (например, отменен): следующий
+        пробный вызов разрешается, выключатель не замыкается и не размыкается.
+        """
+        self._trial_in_flight = False
+
+    def metrics(self) -> dict:
+        """Состояние и счетчики выключателя."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failures_total": self.failures_total,
+            "successes_total": self.successes_total,
+            "rejected_total": self.rejected_total,
+            "opened_total": self.opened_total,
+            "retry_after_seconds": round(self.retry_after(), 3),
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,175 @@
+"""
+Сжатие HTTP-ответов с выбором кодировки по заголовку `Accept-Encoding`.
+
+Поддерживаются `gzip` (всегда), `br` (нужен пакет `brotli`) и `zstd`
+(нужен пакет `zstandard`); недоступные кодировки пропускаются. Из
+принимаемых клиентом кодировок выбирается кодировка с наибольшим
+весом `q`, при равных весах — первая в `COMPRESSION_ENCODINGS`.
+
+Ответ целиком (одно сообщение тела) сжимается, если он не меньше
+`COMPRESSION_MIN_SIZE` байт. Потоковый ответ (NDJSON) сжимается по
+частям: каждая часть сбрасывается в поток сразу, поэтому клиент получает
+данные по мере их готовности. Сжимаются только текстовые форматы и JSON.
+"""
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli необязателен
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard необязателен
+    zstandard = None
+
+_COMPRESSIBLE_TYPES = (b"application/json", b"application/x-ndjson", b"application/problem+json", b"text/")
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# Кодировка -> (класс компрессора, уровень сжатия). Уровни выбраны в пользу скорости.
+_ENCODINGS = {"gzip": (_GzipCompressor, 6)}
+if brotli is not None:
+    _ENCODINGS["br"] = (_BrotliCompressor, 4)
+if zstandard is not None:
+    _ENCODINGS["zstd"] = (_ZstdCompressor, 3)
+
+
+def available_encodings(preferred: list[str]) -> list[str]:
+    """Кодировки из `preferred`, для которых установлены пакеты, в том же порядке."""
+    return [encoding for encoding in preferred if encoding in _ENCODINGS]
+
+
+def negotiate_encoding(accept_encoding: str, encodings: list[str]) -> Optional[str]:
+    """Кодировка для ответа по `Accept-Encoding` или None, если сжимать не нужно."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                continue
+        weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def _header(headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """ASGI middleware: сжатие ответов выбранной по `Accept-Encoding` кодировкой."""
+
+    def __init__(self, app, encodings: list[str], minimum_size: int):
+        self.app = app
+        self.encodings = available_encodings(encodings)
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = _header(scope["headers"], b"accept-encoding")
+        encoding = negotiate_encoding(accept_encoding.decode("latin-1"), self.encodings) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        compressor_class, level = _ENCODINGS[encoding]
+        start = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = _header(headers, b"content-type") or b""
+                if (message["status"] not in (204, 304) and _header(headers, b"content-encoding") is None
+                        and content_type.startswith(_COMPRESSIBLE_TYPES)):
+                    start = message  # отправляется вместе с первой частью тела
+                    return
+            elif message["type"] == "http.response.body" and start is not None:
+                pending, start = start, None
+                body = message.get("body", b"")
+                more_body = message.get("more_body", False)
+                if not more_body and len(body) < self.minimum_size:
+                    await send(pending)
+                    await send(message)
+                    return
+                headers = [(k, v) for k, v in pending["headers"] if k.lower() != b"content-length"]
+                headers += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+                compressor = compressor_class(level)
+                if more_body:
+                    await send({**pending, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressor.compress(body) + compressor.flush(),
+                                "more_body": True})
+                    return
+                body = compressor.compress(body) + compressor.finish()
+                compressor = None
+                headers.append((b"content-length", str(len(body)).encode()))
+                await send({**pending, "headers": headers})
+                await send({"type": "http.response.body", "body": body})
+                return
+            elif message["type"] == "http.response.body" and compressor is not None:
+                body = compressor.compress(message.get("body", b""))
+                if message.get("more_body", False):
+                    await send({"type": "http.response.body", "body": body + compressor.flush(), "more_body": True})
+                    return
+                await send({"type": "http.response.body", "body": body + compressor.finish()})
+                compressor = None
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
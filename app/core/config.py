@@ -6,9 +6,51 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 Этот модуль определяет класс `Settings`, который использует Pydantic для
 загрузки и валидации настроек из переменных окружения (или .env файла).
 """
+from decimal import Decimal
+from typing import Optional
+
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class AdmissionClassSettings(BaseModel):
+    """
+    Лимиты контроля допуска для одного класса запросов (см. `app.core.admission`).
+
+    Атрибуты:
+        max_concurrency (int): Максимальное количество одновременно выполняющихся запросов класса.
+        min_concurrency (int): Нижняя граница лимита при его снижении из-за задержек базы данных.
+        latency_target_ms (float): Время работы запроса с базой данных, при превышении которого лимит снижается.
+        queue_timeout_seconds (float): Максимальное время ожидания запроса в очереди класса.
+        max_queue (int): Максимальное количество запросов в очереди класса.
+    """
+    max_concurrency: int
+    min_concurrency: int = 1
+    latency_target_ms: float
+    queue_timeout_seconds: float
+    max_queue: int
+
+
+class RateLimitRule(BaseModel):
+    """
+    Правило ограничения частоты запросов клиента (см. `app.core.rate_limit`).
+
+    Атрибуты:
+        name (str): Имя правила; у каждого клиента свое ведро токенов для каждого правила.
+        path (str): Префикс пути запроса.
+        methods (list[str]): HTTP-методы, к которым применяется правило (пусто — любые).
+        limit (int): Количество запросов за период.
+        period_seconds (float): Длительность периода в секундах.
+        burst (Optional[int]): Допустимый всплеск запросов (емкость ведра), по умолчанию равен `limit`.
+    """
+    name: str
+    path: str
+    methods: list[str] = []
+    limit: int
+    period_seconds: float
+    burst: Optional[int] = None
+
+
 class Settings(BaseSettings):
     """
     Настройки приложения, которые загружаются из переменных окружения.
@@ -27,6 +69,76 @@ class Settings(BaseSettings):
         SECRET_KEY (str): Секретный ключ для подписи JWT-токенов.
         ACCESS_TOKEN_EXPIRE_MINUTES (int): Время жизни токена доступа в минутах.
         TESTING (bool): Флаг, указывающий, запущено ли приложение в режиме тестирования.
+        LINK_BATCH_MAX_SIZE (int): Максимальное количество связей в одном запросе пакетного связывания.
+        RECONCILIATION_INTERVAL_SECONDS (int): Интервал фоновой сверки накладных (0 — отключена).
+        IDEMPOTENCY_KEY_TTL_HOURS (int): Время хранения ключей идемпотентности в часах.
+        IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS (int): Интервал удаления просроченных ключей (0 — отключено).
+        INGESTION_QUEUE_ENABLED (bool): Включает асинхронный прием чеков через локальную очередь.
+        INGESTION_QUEUE_PATH (str): Путь к файлу SQLite-журнала очереди приема.
+        INGESTION_BATCH_SIZE (int): Размер пачки, записываемой из очереди в PostgreSQL.
+        INGESTION_MAX_PENDING (int): Максимальное число необработанных записей в очереди.
+        INGESTION_CLAIM_TIMEOUT_SECONDS (float): Время аренды захваченных записей до их повторной выдачи.
+        INGESTION_POLL_INTERVAL_SECONDS (float): Пауза потребителя при пустой очереди.
+        INGESTION_RETENTION_HOURS (int): Время хранения обработанных записей для запросов статуса.
+        CHECK_TOTALS_VALIDATION_ENABLED (bool): Включает проверку согласованности сумм чека и позиций.
+        CHECK_ITEM_SUM_TOLERANCE (Decimal): Допустимое отклонение суммы позиции от цены × количество.
+        CHECK_BULK_MAX_SIZE (int): Максимальное количество чеков в одном запросе пакетного создания.
+        ORG_STATS_REFRESH_INTERVAL_SECONDS (float): Интервал переноса новых чеков в итоги организаций (0 — отключен).
+        ORG_STATS_BATCH_SIZE (int): Количество чеков, переносимых в итоги организаций одной транзакцией.
+        EXPORT_DIR (str): Каталог колоночных снимков (Parquet/Arrow) и журнала выгрузок.
+        EXPORT_BATCH_SIZE (int): Количество строк в одной пачке записей Arrow при выгрузке.
+        EXPORT_ROWS_PER_FILE (int): Максимальное количество строк в одном файле снимка.
+        SERVER_HOST (str): Адрес, на котором слушает сервер (`python -m app.server`).
+        SERVER_PORT (int): Порт сервера.
+        SERVER_WORKERS (int): Количество процессов-воркеров (0 — по числу доступных ядер).
+        SERVER_PRELOAD (bool): Загружать приложение в главном процессе до запуска воркеров.
+        SERVER_MAX_REQUESTS (int): Количество запросов, после которого воркер перезапускается (0 — без ограничения).
+        SERVER_MAX_REQUESTS_JITTER (int): Случайная добавка к SERVER_MAX_REQUESTS для каждого воркера.
+        SERVER_GRACEFUL_TIMEOUT (int): Время ожидания текущих запросов при остановке воркера, в секундах.
+        SERVER_KEEPALIVE_TIMEOUT (int): Время удержания неактивного keep-alive соединения, в секундах.
+        SERVER_BACKLOG (int): Размер очереди входящих соединений слушающего сокета.
+        BACKGROUND_JOBS_ENABLED (bool): Выполнять периодические фоновые задачи в этом процессе.
+        DB_POOL_SIZE (int): Количество постоянных соединений в пуле движка.
+        DB_MAX_OVERFLOW (int): Количество дополнительных соединений сверх DB_POOL_SIZE при пиковой нагрузке.
+        DB_POOL_TIMEOUT_SECONDS (float): Максимальное время ожидания свободного соединения пула.
+        DB_CONNECT_TIMEOUT_SECONDS (float): Максимальное время установки нового соединения с PostgreSQL.
+        DB_BREAKER_FAILURE_THRESHOLD (int): Количество неудачных получений соединения подряд, после которого
+            запросы отклоняются.
+        DB_BREAKER_RESET_TIMEOUT_SECONDS (float): Время, в течение которого запросы отклоняются до пробного подключения.
+        DB_READ_RETRY_ATTEMPTS (int): Количество повторов получения соединения для запросов чтения (GET/HEAD).
+        DB_READ_RETRY_BASE_DELAY_SECONDS (float): Базовая пауза между повторами (удваивается, со случайной
+            составляющей).
+        DB_POOL_WARMUP_CONNECTIONS (int): Количество соединений, открываемых и прогреваемых при запуске
+            (0 — без прогрева).
+        DB_WARMUP_TIMEOUT_SECONDS (float): Максимальное время прогрева пула при запуске.
+        SHUTDOWN_DRAIN_TIMEOUT_SECONDS (float): Максимальное время ожидания запросов и фоновых задач при остановке.
+        HEALTH_CHECK_INTERVAL_SECONDS (float): Интервал фоновой проверки доступности базы данных.
+        HEALTH_CHECK_TIMEOUT_SECONDS (float): Максимальное время одной проверки доступности базы данных.
+        HEALTH_CHECK_MAX_AGE_SECONDS (float): Возраст результата проверки, после которого сервис считается неготовым.
+        ADMISSION_CONTROL_ENABLED (bool): Включает ограничение одновременных запросов по классам маршрутов.
+        ADMISSION_CLASSES (dict[str, AdmissionClassSettings]): Лимиты классов `ingestion`, `reads`, `analytics`,
+            `login` (JSON).
+        RATE_LIMIT_ENABLED (bool): Включает ограничение частоты запросов отдельного клиента.
+        RATE_LIMIT_RULES (list[RateLimitRule]): Правила ограничения частоты; применяется первое подходящее (JSON).
+        RATE_LIMIT_REDIS_URL (Optional[str]): Redis для лимитов, общих для всех воркеров (не задан — в памяти процесса).
+        RATE_LIMIT_REDIS_TIMEOUT_SECONDS (float): Максимальное время подключения к Redis и ответа Redis.
+        RATE_LIMIT_REDIS_COOLDOWN_SECONDS (float): Время после ошибки Redis, в течение которого используются
+            только локальные ведра.
+        RATE_LIMIT_MAX_KEYS (int): Максимальное количество ведер токенов в памяти процесса.
+        DB_STATEMENT_TIMEOUTS_MS (dict[str, int]): Ограничение времени выражения SQL по классам запросов в мс
+            (0 — нет; JSON).
+        DB_CANCEL_ON_DISCONNECT (bool): Прерывать запросы чтения и их выражения SQL при отключении клиента.
+        COMPRESSION_ENABLED (bool): Включает сжатие ответов по `Accept-Encoding`.
+        COMPRESSION_ENCODINGS (list[str]): Поддерживаемые кодировки в порядке предпочтения (`zstd`, `br`, `gzip`).
+        COMPRESSION_MIN_SIZE (int): Минимальный размер тела ответа в байтах, начиная с которого оно сжимается.
+        ETAG_ENABLED (bool): Добавлять ETag по хешу тела к ответам на GET-запросы и отвечать `304` на `If-None-Match`.
+        BATCH_GET_MAX_IDS (int): Максимальное количество ID в запросе получения чеков, пользователей или
+            организаций по списку.
+        REFERENCE_CACHE_ENABLED (bool): Кэшировать организации и пользователей в памяти процесса.
+        ORGANIZATION_CACHE_SIZE (int): Максимальное количество организаций в кэше процесса.
+        USER_CACHE_SIZE (int): Максимальное количество пользователей в кэше процесса.
+        REFERENCE_CACHE_CHECK_INTERVAL_SECONDS (float): Интервал проверки соединения, на котором воркер слушает
+            уведомления об изменении справочников.
     """
     POSTGRES_SERVER: str
     POSTGRES_USER: str
@@ -42,6 +154,84 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     ALGORITHM: str = "HS256"
     TESTING: bool = False
+    LINK_BATCH_MAX_SIZE: int = 50_000
+    RECONCILIATION_INTERVAL_SECONDS: int = 0
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+    IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS: int = 3600
+    INGESTION_QUEUE_ENABLED: bool = False
+    INGESTION_QUEUE_PATH: str = "ingestion_queue.sqlite3"
+    INGESTION_BATCH_SIZE: int = 1000
+    INGESTION_MAX_PENDING: int = 100_000
+    INGESTION_CLAIM_TIMEOUT_SECONDS: float = 300
+    INGESTION_POLL_INTERVAL_SECONDS: float = 0.5
+    INGESTION_RETENTION_HOURS: int = 24
+    CHECK_TOTALS_VALIDATION_ENABLED: bool = True
+    CHECK_ITEM_SUM_TOLERANCE: Decimal = Decimal("0.01")
+    CHECK_BULK_MAX_SIZE: int = 10_000
+    ORG_STATS_REFRESH_INTERVAL_SECONDS: float = 5
+    ORG_STATS_BATCH_SIZE: int = 10_000
+    EXPORT_DIR: str = "exports"
+    EXPORT_BATCH_SIZE: int = 50_000
+    EXPORT_ROWS_PER_FILE: int = 1_000_000
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0
+    SERVER_PRELOAD: bool = True
+    SERVER_MAX_REQUESTS: int = 0
+    SERVER_MAX_REQUESTS_JITTER: int = 0
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SERVER_KEEPALIVE_TIMEOUT: int = 5
+    SERVER_BACKLOG: int = 2048
+    BACKGROUND_JOBS_ENABLED: bool = True
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 5
+    DB_CONNECT_TIMEOUT_SECONDS: float = 5
+    DB_BREAKER_FAILURE_THRESHOLD: int = 5
+    DB_BREAKER_RESET_TIMEOUT_SECONDS: float = 10
+    DB_READ_RETRY_ATTEMPTS: int = 2
+    DB_READ_RETRY_BASE_DELAY_SECONDS: float = 0.1
+    DB_POOL_WARMUP_CONNECTIONS: int = 5
+    DB_WARMUP_TIMEOUT_SECONDS: float = 10
+    SHUTDOWN_DRAIN_TIMEOUT_SECONDS: float = 20
+    HEALTH_CHECK_INTERVAL_SECONDS: float = 5
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2
+    HEALTH_CHECK_MAX_AGE_SECONDS: float = 15
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_CLASSES: dict[str, AdmissionClassSettings] = {
+        "ingestion": AdmissionClassSettings(max_concurrency=16, latency_target_ms=250,
+                                            queue_timeout_seconds=2, max_queue=200),
+        "reads": AdmissionClassSettings(max_concurrency=16, latency_target_ms=200,
+                                        queue_timeout_seconds=1, max_queue=200),
+        "analytics": AdmissionClassSettings(max_concurrency=4, latency_target_ms=2000,
+                                            queue_timeout_seconds=5, max_queue=20),
+        "login": AdmissionClassSettings(max_concurrency=4, latency_target_ms=500,
+                                        queue_timeout_seconds=2, max_queue=50),
+    }
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_RULES: list[RateLimitRule] = [
+        RateLimitRule(name="login", path="/api/v1/login/", methods=["POST"], limit=10, period_seconds=60),
+        RateLimitRule(name="ingestion", path="/api/v1/checks/", methods=["POST"], limit=50, period_seconds=1,
+                      burst=100),
+        RateLimitRule(name="default", path="/api/v1/", limit=100, period_seconds=1, burst=200),
+    ]
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
+    RATE_LIMIT_REDIS_TIMEOUT_SECONDS: float = 0.1
+    RATE_LIMIT_REDIS_COOLDOWN_SECONDS: float = 5
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    DB_STATEMENT_TIMEOUTS_MS: dict[str, int] = {
+        "ingestion": 30_000, "reads": 15_000, "analytics": 60_000, "login": 5_000,
+    }
+    DB_CANCEL_ON_DISCONNECT: bool = True
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_ENCODINGS: list[str] = ["zstd", "br", "gzip"]
+    COMPRESSION_MIN_SIZE: int = 1024
+    ETAG_ENABLED: bool = True
+    BATCH_GET_MAX_IDS: int = 1000
+    REFERENCE_CACHE_ENABLED: bool = True
+    ORGANIZATION_CACHE_SIZE: int = 10_000
+    USER_CACHE_SIZE: int = 10_000
+    REFERENCE_CACHE_CHECK_INTERVAL_SECONDS: float = 30.0
 
     @property
     def DATABASE_URL(self) -> str:
@@ -0,0 +1,80 @@
+"""
+Прерывание обработки запроса при отключении клиента.
+
+Без этого долгий аналитический запрос продолжает выполняться в базе данных
+и занимать соединение пула, хотя ответ уже некому отправить.
+`CancelOnDisconnectMiddleware` выполняет запрос чтения (GET/HEAD) в
+отдельной задаче и параллельно ждет от сервера сообщения
+`http.disconnect`; при отключении клиента задача отменяется. asyncpg при
+отмене ожидающей выражение задачи отправляет PostgreSQL запрос отмены
+(CancelRequest), поэтому выражение прерывается и на стороне базы данных.
+
+Запросы, изменяющие данные, не прерываются: их результат не должен
+зависеть от того, дождался ли клиент ответа.
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_CANCELLABLE_METHODS = frozenset({"GET", "HEAD"})
+
+# Код ответа для журнала, когда клиент отключился до ответа (соглашение nginx).
+CLIENT_CLOSED_REQUEST = 499
+
+
+class CancelOnDisconnectMiddleware:
+    """ASGI middleware: отмена обработки запроса чтения при отключении клиента."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in _CANCELLABLE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        # Все сообщения сервера читает наблюдатель; приложение получает их из очереди.
+        messages: asyncio.Queue = asyncio.Queue()
+        response_started = response_complete = False
+
+        async def receive_from_queue():
+            message = await messages.get()
+            if message["type"] == "http.disconnect":
+                messages.put_nowait(message)  # повторные вызовы тоже получают отключение
+            return message
+
+        async def send_tracking(message):
+            nonlocal response_started, response_complete
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        handler = asyncio.create_task(self.app(scope, receive_from_queue, send_tracking))
+
+        async def watch_disconnect():
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    # После отправки ответа целиком отключение штатное (например, фоновые задачи ответа).
+                    if not response_complete:
+                        handler.cancel()
+                    return
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await asyncio.wait({handler})
+        finally:
+            watcher.cancel()
+            handler.cancel()
+        if handler.cancelled():
+            logger.info(f"Клиент отключился, обработка запроса прервана: {scope['method']} {scope['path']}")
+            if not response_started:
+                # Ответ уже не будет доставлен, но внешние middleware должны его получить.
+                await send({"type": "http.response.start", "status": CLIENT_CLOSED_REQUEST, "headers": []})
+                await send({"type": "http.response.body", "body": b""})
+            return
+        handler.result()
@@ -0,0 +1,77 @@
+"""
+Условные GET-запросы: заголовки `ETag` и `If-None-Match`.
+
+Для аналитики ETag строится по версии данных (см.
+`app.api.v1.dependencies.data_version_etag`) и проверяется до выполнения
+запроса. Для остальных ответов на GET-запросы `ETagMiddleware` вычисляет
+ETag по хешу тела ответа: запрос выполняется, но неизмененный ответ не
+передается клиенту повторно (`304 Not Modified`).
+
+ETag слабые (`W/"..."`): тело ответа может передаваться в разных
+кодировках сжатия (см. `app.core.compression`).
+"""
+import hashlib
+from typing import Optional
+
+# Заголовки, которые сохраняются в ответе 304 (RFC 9110, 15.4.5).
+_NOT_MODIFIED_HEADERS = frozenset({b"cache-control", b"content-location", b"date", b"etag", b"expires", b"vary"})
+
+
+def body_etag(body: bytes) -> str:
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Совпадает ли ETag с заголовком `If-None-Match` (слабое сравнение)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def _header(headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class ETagMiddleware:
+    """ASGI middleware: ETag по хешу тела и `304` для неизмененных ответов на GET-запросы."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # У ответа на HEAD нет тела, по которому можно вычислить ETag.
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        if_none_match = _header(scope["headers"], b"if-none-match")
+        start = None
+
+        async def send_with_etag(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                if message["status"] == 200 and _header(message.get("headers", []), b"etag") is None:
+                    start = message  # отправляется вместе с первой частью тела
+                    return
+            elif message["type"] == "http.response.body" and start is not None:
+                pending, start = start, None
+                if message.get("more_body", False):
+                    # Потоковый ответ: тело целиком неизвестно, ETag не вычисляется.
+                    await send(pending)
+                    await send(message)
+                    return
+                etag = body_etag(message.get("body", b""))
+                if if_none_match is not None and etag_matches(if_none_match.decode("latin-1"), etag):
+                    headers = [(k, v) for k, v in pending["headers"] if k.lower() in _NOT_MODIFIED_HEADERS]
+                    await send({**pending, "status": 304, "headers": [*headers, (b"etag", etag.encode())]})
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+                await send({**pending, "headers": [*pending["headers"], (b"etag", etag.encode())]})
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,76 @@
+"""
+Учет выполняющихся запросов для плавной остановки приложения.
+
+`InFlightRequestsMiddleware` считает HTTP-запросы, которые еще не
+отправили ответ целиком (включая потоковые). При остановке приложение
+переводит учет в режим "слива" (`RequestTracker.start_draining`): новые
+запросы получают `503` с заголовком `Connection: close`, а остановка ждет
+завершения текущих запросов не дольше заданного времени.
+"""
+import asyncio
+import json
+
+
+class RequestTracker:
+    """Счетчик выполняющихся запросов процесса."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.draining = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def started(self):
+        self.in_flight += 1
+        self._idle.clear()
+
+    def finished(self):
+        self.in_flight -= 1
+        if not self.in_flight:
+            self._idle.set()
+
+    def start_draining(self):
+        """Перестать принимать новые запросы."""
+        self.draining = True
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Дождаться завершения выполняющихся запросов; False, если время истекло."""
+        try:
+            async with asyncio.timeout(timeout):
+                await self._idle.wait()
+        except TimeoutError:
+            return False
+        return True
+
+
+_DRAINING_BODY = json.dumps({"detail": "Сервис останавливается"}, ensure_ascii=False).encode()
+
+
+class InFlightRequestsMiddleware:
+    """ASGI middleware: учет запросов в `RequestTracker` и отказ в новых запросах при остановке."""
+
+    def __init__(self, app, tracker: RequestTracker):
+        self.app = app
+        self.tracker = tracker
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.tracker.draining:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(_DRAINING_BODY)).encode()),
+                    (b"connection", b"close"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": _DRAINING_BODY})
+            return
+        self.tracker.started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.tracker.finished()
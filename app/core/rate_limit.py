@@ -0,0 +1,274 @@
+"""
+Ограничение частоты запросов отдельного клиента (rate limiting).
+
+Клиент определяется по JWT-токену из заголовка `Authorization`
+(`user:<имя>`; подпись проверяется без обращения к базе данных), а для
+запросов без действительного токена — по IP-адресу (`ip:<адрес>`). За
+обратным прокси адрес клиента берется из `X-Forwarded-For` средствами
+uvicorn (`--forwarded-allow-ips`).
+
+Правила (`RATE_LIMIT_RULES`) сопоставляются с запросом по префиксу пути и
+методу, применяется первое подходящее. Каждое правило — "ведро токенов":
+`limit` запросов за `period_seconds` с запасом `burst` на всплески. У
+каждого клиента свое ведро для каждого правила.
+
+Ведра хранятся в памяти процесса (`LocalRateLimitStore`), поэтому при
+нескольких воркерах лимит действует в каждом воркере отдельно. Общий для
+воркеров лимит дает хранилище в Redis (`RedisRateLimitStore`,
+`RATE_LIMIT_REDIS_URL`, нужен пакет `redis`): ведро обновляется атомарно
+Lua-скриптом по часам сервера Redis. При недоступности Redis запросы
+ограничиваются локальными ведрами: обращения к Redis ограничены коротким
+таймаутом (`RATE_LIMIT_REDIS_TIMEOUT_SECONDS`), а после ошибки выключатель
+не обращается к Redis `RATE_LIMIT_REDIS_COOLDOWN_SECONDS` секунд, чтобы
+каждый запрос не ждал недоступный сервер.
+
+Ответы содержат заголовки `RateLimit-Limit`, `RateLimit-Remaining`,
+`RateLimit-Reset` и `RateLimit-Policy`; отклоненные запросы получают `429`
+с `Retry-After`.
+"""
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional, Protocol
+
+from jose import JWTError, jwt
+
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.config import RateLimitRule, settings
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - redis необязателен
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: int
+    reset_after: float
+    retry_after: float
+
+
+def _bucket_result(allowed: bool, tokens: float, rate: float, capacity: int) -> RateLimitResult:
+    return RateLimitResult(
+        allowed=allowed,
+        remaining=int(tokens),
+        reset_after=(capacity - tokens) / rate,
+        retry_after=0.0 if allowed else (1 - tokens) / rate,
+    )
+
+
+class RateLimitStore(Protocol):
+    async def consume(self, key: str, rate: float, capacity: int) -> RateLimitResult:
+        """Взять токен из ведра `key` (`rate` токенов в секунду, не больше `capacity`)."""
+
+    async def close(self):
+        ...
+
+
+class LocalRateLimitStore:
+    """Ведра токенов в памяти процесса; при `max_keys` ведрах вытесняются давно не использованные."""
+
+    def __init__(self, max_keys: int, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def consume(self, key: str, rate: float, capacity: int) -> RateLimitResult:
+        now = self.clock()
+        state = self._buckets.get(key)
+        if state is None:
+            tokens = float(capacity)
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            tokens, updated_at = state
+            tokens = min(float(capacity), tokens + (now - updated_at) * rate)
+            self._buckets.move_to_end(key)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        return _bucket_result(allowed, tokens, rate, capacity)
+
+    async def close(self):
+        self._buckets.clear()
+
+
+# KEYS[1] — ведро; ARGV — токенов в секунду и емкость. Возвращает {допущен, остаток токенов}.
+# Остаток возвращается строкой: числа Lua в ответе Redis округляются до целых.
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimitStore:
+    """Ведра токенов в Redis, общие для всех воркеров; при ошибках Redis используется `fallback`."""
+
+    def __init__(self, client, fallback: LocalRateLimitStore, prefix: str = "ratelimit:",
+                 cooldown_seconds: float = 5.0):
+        self.client = client
+        self.fallback = fallback
+        self.prefix = prefix
+        self._script = client.register_script(_TOKEN_BUCKET_LUA)
+        # Первая же ошибка размыкает выключатель: следующие `cooldown_seconds` секунд Redis не вызывается.
+        self.breaker = CircuitBreaker("Redis лимитов частоты запросов", failure_threshold=1,
+                                      reset_timeout=cooldown_seconds)
+        self._failing = False
+
+    async def consume(self, key: str, rate: float, capacity: int) -> RateLimitResult:
+        try:
+            trial = self.breaker.before_call()
+        except CircuitOpenError:
+            return await self.fallback.consume(key, rate, capacity)
+        try:
+            allowed, tokens = await self._script(keys=[self.prefix + key], args=[rate, capacity])
+        except Exception as e:
+            self.breaker.record_failure(e)
+            if not self._failing:
+                logger.warning(f"Redis недоступен, лимиты частоты запросов действуют в пределах процесса: {e!r}")
+                self._failing = True
+            return await self.fallback.consume(key, rate, capacity)
+        except BaseException:
+            if trial:
+                self.breaker.record_abandoned()
+            raise
+        self.breaker.record_success()
+        if self._failing:
+            logger.info("Redis снова доступен для лимитов частоты запросов")
+            self._failing = False
+        return _bucket_result(bool(allowed), float(tokens), rate, capacity)
+
+    async def close(self):
+        await self.client.aclose()
+        await self.fallback.close()
+
+
+def create_rate_limit_store() -> RateLimitStore:
+    """Хранилище ведер по настройкам: Redis, если задан `RATE_LIMIT_REDIS_URL`, иначе память процесса."""
+    local = LocalRateLimitStore(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+    if not settings.RATE_LIMIT_REDIS_URL:
+        return local
+    if redis_asyncio is None:
+        logger.error("Задан RATE_LIMIT_REDIS_URL, но пакет redis не установлен: "
+                     "лимиты частоты запросов действуют в пределах процесса")
+        return local
+    client = redis_asyncio.from_url(
+        settings.RATE_LIMIT_REDIS_URL,
+        socket_connect_timeout=settings.RATE_LIMIT_REDIS_TIMEOUT_SECONDS,
+        socket_timeout=settings.RATE_LIMIT_REDIS_TIMEOUT_SECONDS,
+    )
+    return RedisRateLimitStore(client, fallback=local, cooldown_seconds=settings.RATE_LIMIT_REDIS_COOLDOWN_SECONDS)
+
+
+def client_key(scope) -> str:
+    """Ключ клиента: имя пользователя из действительного JWT-токена или IP-адрес."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    username = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("sub")
+                except JWTError:
+                    username = None
+                if username:
+                    return f"user:{username}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "ip:unknown"
+
+
+class RateLimiter:
+    """Правила ограничения частоты и хранилище ведер токенов."""
+
+    def __init__(self, rules: list[RateLimitRule], store: RateLimitStore):
+        self.rules = rules
+        self.store = store
+
+    def rule_for(self, method: str, path: str) -> Optional[RateLimitRule]:
+        for rule in self.rules:
+            if path.startswith(rule.path) and (not rule.methods or method in rule.methods):
+                return rule
+        return None
+
+    async def hit(self, rule: RateLimitRule, client: str) -> RateLimitResult:
+        return await self.store.consume(f"{rule.name}:{client}", rule.limit / rule.period_seconds,
+                                        rule.burst or rule.limit)
+
+
+def rate_limit_headers(rule: RateLimitRule, result: RateLimitResult) -> list[tuple[bytes, bytes]]:
+    policy = f"{rule.limit};w={rule.period_seconds:g}"
+    if rule.burst:
+        policy += f";burst={rule.burst}"
+    headers = [
+        (b"ratelimit-limit", str(rule.burst or rule.limit).encode()),
+        (b"ratelimit-remaining", str(result.remaining).encode()),
+        (b"ratelimit-reset", str(math.ceil(result.reset_after)).encode()),
+        (b"ratelimit-policy", policy.encode()),
+    ]
+    if not result.allowed:
+        headers.append((b"retry-after", str(max(math.ceil(result.retry_after), 1)).encode()))
+    return headers
+
+
+rate_limiter = RateLimiter(settings.RATE_LIMIT_RULES, create_rate_limit_store())
+
+
+_REJECTED_BODY = json.dumps({"detail": "Слишком много запросов, повторите позже"}, ensure_ascii=False).encode()
+
+
+class RateLimitMiddleware:
+    """ASGI middleware: ограничение частоты запросов клиента по правилам `RateLimiter`."""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rule = self.limiter.rule_for(scope["method"], scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+        result = await self.limiter.hit(rule, client_key(scope))
+        headers = rate_limit_headers(rule, result)
+        if not result.allowed:
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(_REJECTED_BODY)).encode()),
+                    *headers,
+                ],
+            })
+            await send({"type": "http.response.body", "body": _REJECTED_BODY})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), *headers]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,262 @@
+"""
+Вероятностные структуры данных (скетчи) для аналитики.
+
+`HyperLogLog` оценивает количество различных значений (например, уникальных
+покупателей) с относительной погрешностью около 1.04 / sqrt(2^precision),
+занимая 2^precision байт. Скетчи объединяются поэлементным максимумом
+регистров, поэтому оценку за любой период можно получить объединением
+дневных скетчей без обращения к исходным данным.
+
+`DDSketch` оценивает квантили положительных величин (например, сумм чеков)
+с заданной относительной точностью: значения раскладываются по корзинам с
+логарифмическими границами, а скетчи объединяются сложением счетчиков.
+Если установлен NumPy, объединение большого числа скетчей выполняется
+векторно; без него используется реализация на чистом Python.
+"""
+import hashlib
+import math
+import struct
+import sys
+from array import array
+from typing import Iterable, Optional
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - NumPy необязателен
+    numpy = None
+
+HLL_PRECISION = 12
+
+# 2^-r для всех возможных значений регистра (не больше 64 - precision + 1).
+_INVERSE_POWERS = [2.0 ** -r for r in range(66)]
+
+
+def _hash64(value: int) -> int:
+    """Стабильный 64-битный хеш целого числа (одинаковый во всех процессах)."""
+    digest = hashlib.blake2b(value.to_bytes(8, "little", signed=True), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class HyperLogLog:
+    """Скетч HyperLogLog с плотным хранением регистров (по байту на регистр)."""
+
+    def __init__(self, registers: Optional[bytes] = None, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            self.registers = bytearray(self.size)
+        elif len(registers) != self.size:
+            raise ValueError(f"Ожидалось {self.size} регистров, получено {len(registers)}")
+        else:
+            self.registers = bytearray(registers)
+
+    @property
+    def relative_error(self) -> float:
+        """Стандартная относительная погрешность оценки."""
+        return 1.04 / math.sqrt(self.size)
+
+    def add(self, value: int):
+        """Учесть значение."""
+        hashed = _hash64(value)
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        # Позиция первой единицы в оставшихся битах (1, если старший бит единичный).
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[int]):
+        """Учесть несколько значений."""
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "HyperLogLog"):
+        """Объединить со скетчем той же точности."""
+        if other.precision != self.precision:
+            raise ValueError("Нельзя объединить скетчи разной точности")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    @classmethod
+    def merged(cls, sketches: Iterable[bytes], precision: int = HLL_PRECISION) -> "HyperLogLog":
+        """Объединить скетчи, сохраненные через `to_bytes`, за один проход по регистрам."""
+        sketches = list(sketches)
+        if not sketches:
+            return cls(precision=precision)
+        if len(sketches) == 1:
+            return cls(sketches[0], precision=precision)
+        return cls(bytes(map(max, *sketches)), precision=precision)
+
+    def estimate(self) -> float:
+        """Оценка количества различных значений."""
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        raw = alpha * self.size * self.size / sum(map(_INVERSE_POWERS.__getitem__, self.registers))
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * self.size and zeros:
+            # Поправка для малых значений (линейный подсчет).
+            return self.size * math.log(self.size / zeros)
+        return raw
+
+    def to_bytes(self) -> bytes:
+        """Регистры скетча для хранения."""
+        return bytes(self.registers)
+
+
+DDSKETCH_RELATIVE_ACCURACY = 0.01
+
+# Заголовок сохраненного DDSketch: минимум, максимум, счетчик нулевой корзины, индекс первой корзины.
+_DDSKETCH_HEADER = struct.Struct("<ddIi")
+
+
+class DDSketch:
+    """
+    Скетч DDSketch для неотрицательных значений.
+
+    Корзина `i` содержит значения из (gamma^(i-1), gamma^i], где
+    gamma = (1 + a) / (1 - a); оценка квантиля отличается от истинного
+    значения не больше чем в (1 ± a) раз. Значения не больше `min_value`
+    учитываются в отдельной нулевой корзине. Точные минимум и максимум
+    хранятся отдельно.
+    """
+
+    def __init__(self, relative_accuracy: float = DDSKETCH_RELATIVE_ACCURACY, min_value: float = 0.005):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.bins: dict[int, int] = {}
+        self.zero_count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self) -> int:
+        """Количество учтенных значений."""
+        return self.zero_count + sum(self.bins.values())
+
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        """Представитель корзины с относительной погрешностью не больше `relative_accuracy`."""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value: float):
+        """Учесть значение."""
+        value = float(value)
+        if value <= self.min_value:
+            self.zero_count += 1
+        else:
+            index = self._index(value)
+            self.bins[index] = self.bins.get(index, 0) + 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def update(self, values: Iterable[float]):
+        """Учесть несколько значений."""
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "DDSketch"):
+        """Объединить со скетчем той же точности."""
+        if other.gamma != self.gamma:
+            raise ValueError("Нельзя объединить скетчи разной точности")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля `q` (0 ≤ q ≤ 1); None для пустого скетча."""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return self.min
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                # Оценка не выходит за пределы точных минимума и максимума.
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def histogram(self, bins: int) -> list[tuple[float, float, int]]:
+        """
+        Гистограмма из `bins` интервалов с логарифмически равными границами
+        от минимума до максимума: список (нижняя граница, верхняя граница, количество).
+
+        Значения относятся к интервалу по представителю своей корзины.
+        """
+        if not self.count:
+            return []
+        low = max(self.min, self.min_value)
+        high = max(self.max, low)
+        if high == low:
+            return [(self.min, self.max, self.count)]
+        ratio = math.log(high / low) / bins
+        edges = [low * math.exp(ratio * n) for n in range(bins)] + [high]
+        edges[0] = self.min
+        counts = [0] * bins
+        counts[0] += self.zero_count
+        for index, count in self.bins.items():
+            value = min(max(self._value(index), low), high)
+            position = min(int(math.log(value / low) / ratio), bins - 1)
+            counts[position] += count
+        return [(edges[n], edges[n + 1], counts[n]) for n in range(bins)]
+
+    def to_bytes(self) -> bytes:
+        """
+        Сериализация: заголовок и плотный массив 32-битных счетчиков (little-endian)
+        от первой до последней непустой корзины.
+        """
+        if self.bins:
+            first, last = min(self.bins), max(self.bins)
+            counts = array("I", (self.bins.get(index, 0) for index in range(first, last + 1)))
+        else:
+            first, counts = 0, array("I")
+        if sys.byteorder == "big":
+            counts.byteswap()
+        return _DDSKETCH_HEADER.pack(self.min, self.max, self.zero_count, first) + counts.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, relative_accuracy: float = DDSKETCH_RELATIVE_ACCURACY) -> "DDSketch":
+        """Восстановить скетч из `to_bytes`."""
+        sketch = cls(relative_accuracy)
+        sketch.min, sketch.max, sketch.zero_count, first = _DDSKETCH_HEADER.unpack_from(data)
+        counts = array("I")
+        counts.frombytes(data[_DDSKETCH_HEADER.size:])
+        if sys.byteorder == "big":
+            counts.byteswap()
+        sketch.bins = {first + offset: count for offset, count in enumerate(counts) if count}
+        return sketch
+
+    @classmethod
+    def merged(cls, blobs: Iterable[bytes], relative_accuracy: float = DDSKETCH_RELATIVE_ACCURACY) -> "DDSketch":
+        """Объединить скетчи, сохраненные через `to_bytes` (векторно, если доступен NumPy)."""
+        blobs = list(blobs)
+        if numpy is None or len(blobs) < 2:
+            sketch = cls(relative_accuracy)
+            for blob in blobs:
+                sketch.merge(cls.from_bytes(blob, relative_accuracy))
+            return sketch
+
+        headers = [_DDSKETCH_HEADER.unpack_from(blob) for blob in blobs]
+        sketch = cls(relative_accuracy)
+        sketch.min = min(header[0] for header in headers)
+        sketch.max = max(header[1] for header in headers)
+        sketch.zero_count = sum(header[2] for header in headers)
+        counts = numpy.frombuffer(b"".join(blob[_DDSKETCH_HEADER.size:] for blob in blobs), dtype="<u4")
+        if not counts.size:
+            return sketch
+        firsts = numpy.array([header[3] for header in headers], dtype=numpy.int64)
+        lengths = numpy.array([(len(blob) - _DDSKETCH_HEADER.size) // 4 for blob in blobs], dtype=numpy.int64)
+        # Индекс корзины каждого счетчика: первая корзина его скетча + позиция внутри скетча.
+        starts = numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+        indexes = numpy.repeat(firsts, lengths) + numpy.arange(counts.size) - starts
+        base = int(indexes.min())
+        totals = numpy.bincount(indexes - base, weights=counts)
+        nonzero = numpy.flatnonzero(totals)
+        sketch.bins = dict(zip((nonzero + base).tolist(), totals[nonzero].astype(numpy.int64).tolist()))
+        return sketch
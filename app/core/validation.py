@@ -0,0 +1,91 @@
+"""
+Модуль для проверки согласованности сумм в чеках.
+
+Правила:
+- `item_sum` позиции должна совпадать с точным произведением
+  `item_price × item_quantity` с допуском `CHECK_ITEM_SUM_TOLERANCE`
+  (на округление до копеек);
+- `check_sum` чека должна в точности равняться сумме `item_sum` позиций
+  (если у чека есть позиции и у всех них указана сумма);
+- денежные значения не могут иметь больше 2 знаков после запятой,
+  количество — больше 3.
+
+Проверка выполняется для целого массива чеков за один проход в
+целочисленной арифметике (копейки и тысячные доли количества), без
+операций над Decimal в цикле, поэтому подходит и для пакетного импорта.
+"""
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_FLOOR
+from typing import Optional, Sequence
+
+from app.schemas.check import CheckCreate
+
+
+@dataclass(frozen=True)
+class CheckValidationError:
+    """Ошибка проверки одного поля одного чека из массива."""
+    index: int
+    loc: tuple
+    msg: str
+
+    def as_detail(self, prefix: tuple = ("body",)) -> dict:
+        """Представление ошибки в формате ответа 422 FastAPI."""
+        return {"loc": [*prefix, *self.loc], "msg": self.msg, "type": "value_error"}
+
+
+def _to_units(value: Decimal, places: int) -> Optional[int]:
+    """Переводит Decimal в целое число единиц 10^-places или возвращает None, если знаков больше."""
+    scaled = value.scaleb(places)
+    units = int(scaled)
+    return units if units == scaled else None
+
+
+def validate_check_totals(checks: Sequence[CheckCreate], item_sum_tolerance: Decimal) -> list[CheckValidationError]:
+    """
+    Проверяет суммы массива чеков.
+
+    Returns:
+        Список ошибок с индексом чека в массиве; пустой список, если все чеки корректны.
+    """
+    errors = []
+    # Допуск в единицах 10^-5 рубля (копейки цены × тысячные доли количества); более мелкие доли
+    # не различаются при такой точности и отбрасываются.
+    tolerance = int(item_sum_tolerance.scaleb(5).to_integral_value(rounding=ROUND_FLOOR))
+    for index, check in enumerate(checks):
+        check_sum = _to_units(check.check_sum, 2)
+        if check_sum is None:
+            errors.append(CheckValidationError(index, ("check_sum",), "Больше 2 знаков после запятой"))
+        items_total = 0
+        for position, item in enumerate(check.items):
+            if item.item_sum is None:
+                items_total = None
+                continue
+            item_sum = _to_units(item.item_sum, 2)
+            if item_sum is None:
+                errors.append(CheckValidationError(index, ("items", position, "item_sum"),
+                                                   "Больше 2 знаков после запятой"))
+                items_total = None
+                continue
+            if items_total is not None:
+                items_total += item_sum
+            if item.item_price is None or item.item_quantity is None:
+                continue
+            price = _to_units(item.item_price, 2)
+            quantity = _to_units(item.item_quantity, 3)
+            if price is None or quantity is None:
+                field, places = ("item_price", 2) if price is None else ("item_quantity", 3)
+                errors.append(CheckValidationError(index, ("items", position, field),
+                                                   f"Больше {places} знаков после запятой"))
+                continue
+            if abs(price * quantity - item_sum * 1000) > tolerance:
+                errors.append(CheckValidationError(
+                    index, ("items", position, "item_sum"),
+                    f"Сумма позиции {item.item_sum} не равна цене × количество "
+                    f"({item.item_price} × {item.item_quantity})",
+                ))
+        if check.items and check_sum is not None and items_total is not None and items_total != check_sum:
+            errors.append(CheckValidationError(
+                index, ("check_sum",),
+                f"Сумма чека {check.check_sum} не равна сумме позиций {Decimal(items_total).scaleb(-2)}",
+            ))
+    return errors
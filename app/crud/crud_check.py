@@ -1,27 +1,44 @@
 """
 Модуль с CRUD-операциями для модели Check.
 """
-from typing import Optional
-from datetime import date
+from typing import Iterable, Optional, Sequence
+from datetime import date, datetime, timedelta
 
-from sqlalchemy import text
+from sqlalchemy import Integer, any_, bindparam, insert, text, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
-from app.models.receipt import Check, Item, CheckInvoice
+from app.crud import crud_item, crud_org_stats, crud_user_stats
+from app.models.receipt import Check, Item, CheckInvoice, Organization
 from app.schemas.check import CheckCreate
 
 
 async def get_check(db: AsyncSession, check_id: int):
     """Получить чек по ID."""
     result = await db.execute(
-        select(Check).options(selectinload(Check.items), selectinload(Check.user), selectinload(Check.organization),
-                              selectinload(Check.invoices)).where(Check.check_id == check_id)
+        select(Check).options(selectinload(Check.items), selectinload(Check.invoices))
+        .where(Check.check_id == check_id)
     )
     return result.scalars().first()
 
 
+async def get_checks_by_ids(db: AsyncSession, check_ids: Sequence[int]) -> list[Check]:
+    """
+    Получить чеки по списку ID одним запросом `check_id = ANY(:ids)`; позиции и
+    накладные загружаются по одному запросу на связь для всех чеков сразу.
+
+    Чеки возвращаются в порядке `check_ids`, отсутствующие пропускаются.
+    """
+    result = await db.execute(
+        select(Check).options(selectinload(Check.items), selectinload(Check.invoices))
+        .where(Check.check_id == any_(bindparam("check_ids", list(check_ids), type_=ARRAY(Integer))))
+    )
+    checks = {check.check_id: check for check in result.scalars()}
+    return [checks[check_id] for check_id in check_ids if check_id in checks]
+
+
 async def get_checks(
         db: AsyncSession,
         skip: int = 0,
@@ -36,8 +53,6 @@ async def get_checks(
     """Получить список чеков с фильтрацией и сортировкой."""
     query = select(Check).options(
         selectinload(Check.items),
-        selectinload(Check.user),
-        selectinload(Check.organization),
         selectinload(Check.invoices)
     )
 
@@ -61,8 +76,13 @@ async def get_checks(
     return result.scalars().all()
 
 
-async def create_check(db: AsyncSession, check: CheckCreate):
-    """Создать новый чек."""
+async def create_check(db: AsyncSession, check: CheckCreate, commit: bool = True):
+    """
+    Создать новый чек.
+
+    При `commit=False` чек только записывается в текущую транзакцию, чтобы
+    вызывающий код мог выполнить в ней дополнительные действия перед коммитом.
+    """
     db_check = Check(check_sum=check.check_sum, user_id=check.user_id, org_id=check.org_id)
     db.add(db_check)
     await db.flush()
@@ -71,19 +91,56 @@ async def create_check(db: AsyncSession, check: CheckCreate):
         db_item = Item(**item_data.model_dump(), check_id=db_check.check_id)
         db.add(db_item)
 
-    await db.commit()
-    result = await db.execute(
-        select(Check)
-        .options(
-            selectinload(Check.items),
-            selectinload(Check.user),
-            selectinload(Check.organization)
-        )
-        .where(Check.check_id == db_check.check_id)
-    )
+    # Запрос подгружает позиции в уже созданный экземпляр db_check; пользователь и
+    # организация ответа берутся из кэша справочников.
+    await db.execute(select(Check).options(selectinload(Check.items)).where(Check.check_id == db_check.check_id))
+    await crud_item.add_item_names(db, (item.item_name for item in check.items))
+    await crud_user_stats.add_checks_to_user_stats(db, [db_check.check_id])
+    await crud_org_stats.enqueue_checks_for_org_stats(db, [db_check.check_id])
+    if commit:
+        await db.commit()
     return db_check
 
 
+async def create_checks_bulk(
+        db: AsyncSession,
+        checks: Sequence[CheckCreate],
+        created_at: Optional[Sequence[datetime]] = None,
+        commit: bool = True,
+) -> list[int]:
+    """
+    Создать пачку чеков двумя многострочными INSERT (чеки и позиции).
+
+    `created_at`, если передан, задает время создания каждого чека.
+    Возвращает ID созданных чеков в порядке входных данных.
+    """
+    if not checks:
+        return []
+    check_rows = [
+        {"check_sum": check.check_sum, "user_id": check.user_id, "org_id": check.org_id}
+        for check in checks
+    ]
+    if created_at is not None:
+        for row, moment in zip(check_rows, created_at):
+            row["created_at"] = moment
+    result = await db.scalars(insert(Check).returning(Check.check_id, sort_by_parameter_order=True), check_rows)
+    check_ids = list(result)
+
+    item_rows = [
+        {**item.model_dump(), "check_id": check_id}
+        for check, check_id in zip(checks, check_ids)
+        for item in check.items
+    ]
+    if item_rows:
+        await db.execute(insert(Item), item_rows)
+        await crud_item.add_item_names(db, (row["item_name"] for row in item_rows))
+    await crud_user_stats.add_checks_to_user_stats(db, check_ids)
+    await crud_org_stats.enqueue_checks_for_org_stats(db, check_ids)
+    if commit:
+        await db.commit()
+    return check_ids
+
+
 async def link_check_to_invoice(db: AsyncSession, check_id: int, invoice_id: int):
     """Связать чек с накладной."""
     db_check_invoice = CheckInvoice(check_id=check_id, invoice_id=invoice_id)
@@ -92,15 +149,62 @@ async def link_check_to_invoice(db: AsyncSession, check_id: int, invoice_id: int
     return db_check_invoice
 
 
+async def link_checks_to_invoices(db: AsyncSession, links: Iterable[tuple[int, int]]):
+    """
+    Пакетно связать чеки с накладными.
+
+    Проверка существования чеков и накладных и вставка выполняются одним
+    запросом `INSERT ... ON CONFLICT DO NOTHING`. Возвращает по строке на
+    каждую уникальную пару (check_id, invoice_id) в исходном порядке со
+    статусом: `linked`, `already_linked`, `check_not_found` или `invoice_not_found`.
+    """
+    links = list(dict.fromkeys(links))
+    if not links:
+        return []
+    query = text("""
+                 WITH pairs AS (SELECT p.check_id, p.invoice_id, p.ord
+                                FROM unnest(CAST(:check_ids AS integer[]), CAST(:invoice_ids AS integer[]))
+                                         WITH ORDINALITY AS p(check_id, invoice_id, ord)),
+                      inserted AS (
+                          INSERT INTO check_invoices (check_id, invoice_id)
+                              SELECT p.check_id, p.invoice_id
+                              FROM pairs p
+                                       JOIN checks c ON c.check_id = p.check_id
+                                       JOIN invoices i ON i.invoice_id = p.invoice_id
+                              ON CONFLICT DO NOTHING
+                              RETURNING check_id, invoice_id)
+                 SELECT p.check_id,
+                        p.invoice_id,
+                        CASE
+                            WHEN c.check_id IS NULL THEN 'check_not_found'
+                            WHEN i.invoice_id IS NULL THEN 'invoice_not_found'
+                            WHEN ins.check_id IS NOT NULL THEN 'linked'
+                            ELSE 'already_linked'
+                            END AS status
+                 FROM pairs p
+                          LEFT JOIN checks c ON c.check_id = p.check_id
+                          LEFT JOIN invoices i ON i.invoice_id = p.invoice_id
+                          LEFT JOIN inserted ins ON ins.check_id = p.check_id AND ins.invoice_id = p.invoice_id
+                 ORDER BY p.ord;
+                 """)
+    result = await db.execute(query, {
+        "check_ids": [check_id for check_id, _ in links],
+        "invoice_ids": [invoice_id for _, invoice_id in links],
+    })
+    rows = result.all()
+    await db.commit()
+    return rows
+
+
 # Аналитика
 async def get_sales_by_organization(db: AsyncSession):
     """Получить аналитику по продажам в разрезе организаций."""
     query = text("""
                  SELECT o.org_name,
                         o.legal_form,
-                        COUNT(DISTINCT c.check_id) as total_checks,
+                        COUNT(*)                   as total_checks,
                         SUM(c.check_sum)           as total_revenue,
-                        AVG(c.check_sum)           as avg_check_amount
+                        ROUND(AVG(c.check_sum), 2) as avg_check_amount
                  FROM organizations o
                           JOIN checks c ON o.org_id = c.org_id
                  GROUP BY o.org_id, o.org_name, o.legal_form
@@ -110,25 +214,43 @@ async def get_sales_by_organization(db: AsyncSession):
     return result.all()
 
 
-async def get_checks_by_user_for_period(db: AsyncSession, user_id: int, start_date: date, end_date: date):
-    """Получить чеки пользователя за определенный период."""
-    query = text("""
-                 SELECT c.check_id,
-                        c.created_at,
-                        c.check_sum,
-                        o.org_name,
-                        o.legal_form,
-                        STRING_AGG(i.item_name, ', ') as items
-                 FROM checks c
-                          JOIN organizations o ON c.org_id = o.org_id
-                          JOIN items i ON c.check_id = i.check_id
-                 WHERE c.user_id = :user_id
-                   AND c.created_at BETWEEN :start_date AND :end_date
-                 GROUP BY c.check_id, o.org_name, o.legal_form
-                 ORDER BY c.created_at DESC;
-                 """)
-    result = await db.execute(query, {"user_id": user_id, "start_date": start_date, "end_date": end_date})
-    return result.all()
+async def get_checks_by_user_for_period(
+        db: AsyncSession,
+        user_id: int,
+        start_date: date,
+        end_date: date,
+        after_created_at: Optional[datetime] = None,
+        after_check_id: Optional[int] = None,
+        limit: int = 100,
+):
+    """
+    Получить страницу чеков пользователя за период (даты включительно), от новых к старым.
+
+    Keyset-пагинация по (created_at, check_id): чеки выбираются через индекс
+    `checks (user_id, created_at, check_id)`, позиции страницы — одним пакетным
+    запросом `IN (...)`. Чеки без позиций возвращаются с пустым списком.
+    Возвращает список словарей с полями `UserCheck`.
+    """
+    query = (
+        select(Check.check_id, Check.created_at, Check.check_sum, Organization.org_name, Organization.legal_form)
+        .join(Organization, Organization.org_id == Check.org_id)
+        .where(Check.user_id == user_id,
+               Check.created_at >= start_date,
+               Check.created_at < end_date + timedelta(days=1))
+        .order_by(Check.created_at.desc(), Check.check_id.desc())
+        .limit(limit)
+    )
+    if after_created_at is not None and after_check_id is not None:
+        query = query.where(tuple_(Check.created_at, Check.check_id) < tuple_(after_created_at, after_check_id))
+    checks = [dict(row._mapping, items=[]) for row in (await db.execute(query)).all()]
+    if not checks:
+        return checks
+
+    by_id = {check["check_id"]: check for check in checks}
+    items = await db.scalars(select(Item).where(Item.check_id.in_(list(by_id))).order_by(Item.item_id))
+    for item in items:
+        by_id[item.check_id]["items"].append(item)
+    return checks
 
 
 async def get_items_by_category(db: AsyncSession):
@@ -0,0 +1,44 @@
+"""
+Модуль с CRUD-операциями для модели DataVersion.
+"""
+from sqlalchemy import BigInteger, cast, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.receipt import DATA_VERSION_SHARDS, DataVersion, OrgStatsPending
+
+
+async def get_data_version(db: AsyncSession) -> str:
+    """
+    Текущая версия данных: меняется при каждом изменении данных.
+
+    Версия — сумма счетчика `data_versions`, наибольший ID и количество
+    чеков, ожидающих переноса в итоги организаций: новый чек меняет версию
+    сразу после фиксации, без записи в общий счетчик. Количество учитывает
+    и чек, зафиксированный позже чека с большим ID; убывает оно только при
+    переносе в итоги, который увеличивает счетчик.
+
+    Версию следует читать до запросов, результат которых она описывает:
+    тогда изменения, зафиксированные между чтением версии и запросом,
+    лишь приводят к новой версии при следующем чтении.
+    """
+    # sum(bigint) возвращает NUMERIC; приведение оставляет версию целым числом.
+    query = select(
+        cast(func.coalesce(func.sum(DataVersion.version), 0), BigInteger),
+        select(func.coalesce(func.max(OrgStatsPending.check_id), 0)).scalar_subquery(),
+        select(func.count()).select_from(OrgStatsPending).scalar_subquery(),
+    )
+    version, pending_max, pending_count = (await db.execute(query)).one()
+    return f"{version}.{pending_max}.{pending_count}"
+
+
+async def bump_data_version(db: AsyncSession):
+    """
+    Увеличить версию данных в текущей транзакции (без коммита).
+
+    Строка счетчика блокируется до фиксации, поэтому вызывать следует
+    последним выражением транзакции.
+    """
+    await db.execute(
+        text("UPDATE data_versions SET version = version + 1 WHERE shard = mod(txid_current(), :shards)"),
+        {"shards": DATA_VERSION_SHARDS},
+    )
@@ -0,0 +1,76 @@
+"""
+Модуль с CRUD-операциями для модели IdempotencyKey.
+"""
+from datetime import datetime, timedelta, UTC
+from typing import Any, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.receipt import IdempotencyKey
+
+
+async def reserve_idempotency_key(
+        db: AsyncSession,
+        user_id: int,
+        scope: str,
+        key: str,
+        request_hash: str,
+        ttl: timedelta,
+) -> Optional[IdempotencyKey]:
+    """
+    Зарезервировать ключ идемпотентности в текущей транзакции.
+
+    Выполняет `INSERT ... ON CONFLICT` по уникальному индексу (user_id, scope, key).
+    Просроченный ключ перезаписывается. Если конкурентная транзакция уже
+    вставила такой же ключ, PostgreSQL дождется ее завершения.
+
+    Returns:
+        None, если ключ зарезервирован этим запросом (нужно выполнить операцию
+        и сохранить ответ через `save_idempotent_response` до коммита),
+        иначе — ранее сохраненная запись.
+    """
+    stmt = insert(IdempotencyKey).values(user_id=user_id, scope=scope, key=key, request_hash=request_hash)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_idempotency_keys_user_id_scope_key",
+        set_={
+            "request_hash": stmt.excluded.request_hash,
+            "status_code": None,
+            "response_body": None,
+            "created_at": stmt.excluded.created_at,
+        },
+        where=IdempotencyKey.created_at < datetime.now(UTC) - ttl,
+    ).returning(IdempotencyKey.id)
+    if (await db.execute(stmt)).scalar() is not None:
+        return None
+    result = await db.execute(
+        select(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id, IdempotencyKey.scope == scope, IdempotencyKey.key == key
+        )
+    )
+    return result.scalars().first()
+
+
+async def save_idempotent_response(
+        db: AsyncSession,
+        user_id: int,
+        scope: str,
+        key: str,
+        status_code: int,
+        response_body: Any,
+):
+    """Сохранить ответ для зарезервированного ключа (коммит выполняет вызывающий код)."""
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        .values(status_code=status_code, response_body=response_body)
+    )
+
+
+async def delete_expired_idempotency_keys(db: AsyncSession, ttl: timedelta) -> int:
+    """Удалить просроченные ключи идемпотентности. Возвращает количество удаленных записей."""
+    result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < datetime.now(UTC) - ttl))
+    await db.commit()
+    return result.rowcount
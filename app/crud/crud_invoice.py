@@ -1,13 +1,19 @@
 """
 Модуль с CRUD-операциями для модели Invoice.
 """
+from typing import Optional
+
+from sqlalchemy import func, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import noload, selectinload
 
-from app.models.receipt import Invoice
+from app.models.receipt import Check, CheckInvoice, Invoice, InvoiceDiscrepancy
 from app.schemas.check import InvoiceCreate
 
+# Ключ рекомендательной блокировки сверки: одновременно выполняется не более одной сверки.
+RECONCILIATION_LOCK_KEY = 7_301_028
+
 
 async def get_invoice(db: AsyncSession, invoice_id: int):
     """Получить накладную по ID."""
@@ -15,12 +21,35 @@ async def get_invoice(db: AsyncSession, invoice_id: int):
     return result.scalars().first()
 
 
-async def get_invoice_with_checks(db: AsyncSession, invoice_id: int):
-    """Получить накладную с привязанными чеками."""
-    result = await db.execute(
-        select(Invoice).options(selectinload(Invoice.checks)).where(Invoice.invoice_id == invoice_id)
+async def get_invoice_checks(
+        db: AsyncSession,
+        invoice_id: int,
+        after_check_id: Optional[int] = None,
+        limit: int = 100,
+        include_items: bool = False,
+):
+    """
+    Получить страницу чеков, привязанных к накладной (keyset-пагинация по ID чека).
+
+    Чеки выбираются одним запросом через индекс `check_invoices (invoice_id, check_id)`,
+    позиции (если запрошены) — еще одним пакетным запросом `IN (...)` для всей страницы.
+    Возвращает кортеж (чеки страницы, общее количество привязанных чеков).
+    """
+    query = (
+        select(Check)
+        .join(CheckInvoice, CheckInvoice.check_id == Check.check_id)
+        .where(CheckInvoice.invoice_id == invoice_id)
+        .order_by(CheckInvoice.check_id)
+        .limit(limit)
+        .options(selectinload(Check.items) if include_items else noload(Check.items))
     )
-    return result.scalars().first()
+    if after_check_id is not None:
+        query = query.where(CheckInvoice.check_id > after_check_id)
+    checks = (await db.execute(query)).scalars().all()
+    total = (await db.execute(
+        select(func.count()).select_from(CheckInvoice).where(CheckInvoice.invoice_id == invoice_id)
+    )).scalar_one()
+    return checks, total
 
 
 async def get_invoices(db: AsyncSession, skip: int = 0, limit: int = 100):
@@ -37,3 +66,66 @@ async def create_invoice(db: AsyncSession, invoice: InvoiceCreate):
     await db.commit()
     await db.refresh(db_invoice)
     return db_invoice
+
+
+async def reconcile_invoices(db: AsyncSession):
+    """
+    Сверить суммы всех накладных с суммами привязанных к ним чеков.
+
+    Расхождения вычисляются одним проходом по `check_invoices` (агрегация
+    с группировкой по накладной) и целиком заменяют содержимое таблицы
+    `invoice_discrepancies` в одной транзакции, поэтому читатели всегда
+    видят согласованный отчет. Возвращает количество расхождений и время расчета.
+
+    Сверки из разных воркеров и реплик сериализуются транзакционной
+    рекомендательной блокировкой; если сверка уже выполняется, возвращает
+    None, не изменяя отчет.
+    """
+    locked = (await db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"),
+                               {"key": RECONCILIATION_LOCK_KEY})).scalar_one()
+    if not locked:
+        await db.rollback()
+        return None
+    await db.execute(text("DELETE FROM invoice_discrepancies"))
+    result = await db.execute(text("""
+                                   INSERT INTO invoice_discrepancies (invoice_id, invoice_sum, linked_sum,
+                                                                      checks_count, difference, computed_at)
+                                   SELECT i.invoice_id,
+                                          i.invoice_sum,
+                                          COALESCE(l.linked_sum, 0),
+                                          COALESCE(l.checks_count, 0),
+                                          i.invoice_sum - COALESCE(l.linked_sum, 0),
+                                          now()
+                                   FROM invoices i
+                                            LEFT JOIN (SELECT ci.invoice_id,
+                                                              SUM(c.check_sum) AS linked_sum,
+                                                              COUNT(*)         AS checks_count
+                                                       FROM check_invoices ci
+                                                                JOIN checks c ON c.check_id = ci.check_id
+                                                       GROUP BY ci.invoice_id) l ON l.invoice_id = i.invoice_id
+                                   WHERE i.invoice_sum <> COALESCE(l.linked_sum, 0);
+                                   """))
+    # now() возвращает время начала транзакции, то есть то же значение, что записано в computed_at.
+    computed_at = (await db.execute(select(func.now()))).scalar_one()
+    await db.commit()
+    return {"discrepancies": result.rowcount, "computed_at": computed_at}
+
+
+async def get_invoice_discrepancies(
+        db: AsyncSession,
+        after_invoice_id: Optional[int] = None,
+        limit: int = 100,
+):
+    """
+    Получить страницу отчета о расхождениях (keyset-пагинация по ID накладной).
+
+    Возвращает кортеж (строки страницы, общее количество расхождений, время расчета).
+    """
+    query = select(InvoiceDiscrepancy).order_by(InvoiceDiscrepancy.invoice_id).limit(limit)
+    if after_invoice_id is not None:
+        query = query.where(InvoiceDiscrepancy.invoice_id > after_invoice_id)
+    rows = (await db.execute(query)).scalars().all()
+    total, computed_at = (await db.execute(
+        select(func.count(), func.max(InvoiceDiscrepancy.computed_at))
+    )).one()
+    return rows, total, computed_at
@@ -0,0 +1,152 @@
+"""
+Модуль с CRUD-операциями для модели Item.
+"""
+from datetime import date, datetime, time, timedelta, UTC
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Релевантность названия и условие совпадения с запросом (псевдоним `n` — словарь `item_names`).
+_RANK = "ts_rank_cd(n.item_name_tsv, websearch_to_tsquery('russian', :q)) + word_similarity(:q, n.item_name)"
+_MATCH = "(n.item_name_tsv @@ websearch_to_tsquery('russian', :q) OR n.item_name %> :q)"
+# Названия, подходящие под запрос, с релевантностью, и релевантность названия из курсора.
+_RANKED_NAMES = f"""
+    ranked AS (SELECT n.item_name, {_RANK} AS rank FROM item_names n WHERE {_MATCH}),
+    after AS (SELECT {_RANK} AS rank FROM item_names n WHERE n.item_name = :after_name)
+"""
+# Позиция следует за курсором в порядке (релевантность по убыванию, название, ID позиции по убыванию).
+_AFTER_CURSOR = """
+    (CAST(:after_name AS varchar) IS NULL
+     OR names.rank < (SELECT rank FROM after)
+     OR names.rank = (SELECT rank FROM after)
+         AND (names.item_name > :after_name OR names.item_name = :after_name AND i.item_id < :after_id))
+"""
+# Пачка из `limit` названий, начиная с названия курсора (если у него могли остаться позиции).
+_NAMES_BATCH = """
+    names AS (SELECT * FROM ranked names
+              WHERE CAST(:after_name AS varchar) IS NULL
+                 OR names.rank < (SELECT rank FROM after)
+                 OR names.rank = (SELECT rank FROM after)
+                     AND (names.item_name > :after_name
+                          OR names.item_name = :after_name AND CAST(:after_id AS integer) IS NOT NULL)
+              ORDER BY names.rank DESC, names.item_name
+              LIMIT :limit)
+"""
+
+
+async def add_item_names(db: AsyncSession, names: Iterable[str]):
+    """
+    Пополнить словарь названий позиций (`item_names`) в текущей транзакции.
+
+    Уже известные названия пропускаются без записи; названия сортируются,
+    чтобы параллельные вставки одинаковых новых названий не взаимоблокировались.
+    """
+    names = sorted(set(names))
+    if names:
+        await db.execute(text("INSERT INTO item_names (item_name) SELECT unnest(CAST(:names AS varchar[])) "
+                              "ON CONFLICT DO NOTHING"), {"names": names})
+
+
+async def rebuild_item_names(db: AsyncSession):
+    """Добавить в словарь названия всех позиций (после загрузки данных в обход API)."""
+    await db.execute(text("INSERT INTO item_names (item_name) SELECT DISTINCT item_name FROM items "
+                          "ON CONFLICT DO NOTHING"))
+    await db.commit()
+
+
+async def search_items(
+        db: AsyncSession,
+        q: str,
+        limit: int = 20,
+        org_id: Optional[int] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        after_item_name: Optional[str] = None,
+        after_item_id: Optional[int] = None,
+):
+    """
+    Полнотекстовый и нечеткий поиск позиций по названию (keyset-пагинация).
+
+    Название подходит, если совпадает с запросом по полнотекстовому поиску
+    (русская морфология, `item_name_tsv`) или похоже на него по триграммам
+    (опечатки, части слов). Релевантность — ранг полнотекстового совпадения
+    плюс триграммная похожесть — зависит только от названия, поэтому
+    ранжируются различные названия из словаря `item_names` (GIN-индексы).
+    Результаты упорядочены по релевантности названия, затем по названию и
+    от новых позиций к старым; следующая страница начинается после позиции
+    (`after_item_name`, `after_item_id`), а релевантность названия из курсора
+    вычисляется заново, поэтому глубина листания не ограничена.
+
+    Без фильтров названия перебираются по порядку пачками по `limit`, и для
+    каждого по индексу `(item_name, item_id)` читается не больше `limit`
+    позиций. С фильтрами по организации или периоду кандидаты выбираются
+    обычным соединением: планировщик читает либо чеки фильтра по индексам
+    `checks (org_id, created_at)` / `checks (created_at)` и их позиции по
+    покрывающему индексу `items (check_id, item_name)`, либо позиции редких
+    названий, — так объем работы ограничен меньшим из двух множеств, а не
+    всеми позициями частого названия. Остальные поля читаются только для
+    позиций страницы.
+    """
+    # Избирательность фильтров и курсора зависит от значений, поэтому план строится
+    # для каждого запроса, а не берется общий из кэша подготовленных выражений.
+    await db.execute(text("SET LOCAL plan_cache_mode = force_custom_plan"))
+    params = {"q": q, "limit": limit, "after_name": after_item_name, "after_id": after_item_id}
+    conditions = []
+    if org_id:
+        conditions.append("c.org_id = :org_id")
+        params["org_id"] = org_id
+    if start_date:
+        conditions.append("c.created_at >= :start_date")
+        params["start_date"] = datetime.combine(start_date, time.min, tzinfo=UTC)
+    if end_date:
+        conditions.append("c.created_at < :end_date")
+        params["end_date"] = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=UTC)
+    if conditions:
+        query = text(f"""
+                     WITH {_RANKED_NAMES},
+                          page AS (SELECT i.item_id, names.item_name, names.rank, i.check_id, c.org_id, c.created_at
+                                   FROM ranked names
+                                            JOIN items i ON i.item_name = names.item_name
+                                            JOIN checks c ON c.check_id = i.check_id
+                                   WHERE {" AND ".join(conditions)} AND {_AFTER_CURSOR}
+                                   ORDER BY names.rank DESC, names.item_name, i.item_id DESC
+                                   LIMIT :limit)
+                     SELECT page.item_id, page.item_name, i.item_price, i.item_quantity, i.item_sum, i.item_type,
+                            page.check_id, page.org_id, page.created_at, page.rank
+                     FROM page
+                              JOIN items i ON i.item_id = page.item_id
+                     ORDER BY page.rank DESC, page.item_name, page.item_id DESC
+                     """)
+        return (await db.execute(query, params)).all()
+
+    # Названия пачки уже упорядочены, поэтому сортировка позиций идет группами по названию
+    # и останавливается, как только набрано `limit` позиций.
+    query = text(f"""
+                 WITH {_RANKED_NAMES}, {_NAMES_BATCH}
+                 SELECT p.item_id, names.item_name, p.item_price, p.item_quantity, p.item_sum, p.item_type,
+                        p.check_id, p.org_id, p.created_at, names.rank
+                 FROM names
+                          CROSS JOIN LATERAL (SELECT i.item_id, i.item_price, i.item_quantity, i.item_sum,
+                                                     i.item_type, i.check_id, c.org_id, c.created_at
+                                              FROM items i
+                                                       JOIN checks c ON c.check_id = i.check_id
+                                              WHERE i.item_name = names.item_name AND {_AFTER_CURSOR}
+                                              ORDER BY i.item_id DESC
+                                              LIMIT :limit) p
+                 ORDER BY names.rank DESC, names.item_name, p.item_id DESC
+                 LIMIT :limit
+                 """)
+    names_query = text(f"WITH {_RANKED_NAMES}, {_NAMES_BATCH} "
+                       "SELECT names.item_name FROM names ORDER BY names.rank DESC, names.item_name")
+    rows = []
+    while True:
+        rows.extend((await db.execute(query, params)).all())
+        if len(rows) >= limit:
+            return rows[:limit]
+        # Позиций меньше `limit`, значит, названия пачки исчерпаны; если пачка была полной,
+        # продолжаем со следующего за ней названия (бывают названия без позиций).
+        names = (await db.execute(names_query, params)).scalars().all()
+        if len(names) < limit:
+            return rows
+        params.update(after_name=names[-1], after_id=None)
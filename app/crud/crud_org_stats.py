@@ -0,0 +1,403 @@
+"""
+Модуль с операциями над итогами продаж организаций и товаров.
+
+Итоги по дням (UTC) хранятся в таблицах `org_daily_stats` (чеки и выручка
+организации) и `org_item_daily_stats` (количество, объем и выручка товара
+по названию в организации). Отчеты "топ товаров" и "топ организаций"
+суммируют эти строки вместо группировки всех позиций.
+
+Итоги организации обновляются всеми вставками чеков этой организации, поэтому
+обновлять их в транзакции вставки означало бы выстраивать конкурентные вставки
+в очередь на блокировке одной строки. Вместо этого вставка чека только
+добавляет его ID в `org_stats_pending`, а фоновая задача пачками переносит
+такие чеки в итоги (`refresh_org_stats`). Пока чек не перенесен, он не виден
+в отчетах; количество таких чеков возвращается вместе с отчетом как граница
+погрешности. Точный режим (`exact=True`) считает отчет по исходным таблицам.
+
+Для оценки количества уникальных покупателей за период в `org_daily_stats`
+хранится дневной скетч HyperLogLog (`buyers_sketch`), а для квантилей и
+гистограмм сумм чеков — скетч DDSketch (`check_sum_sketch`); скетчи дней
+периода объединяются при запросе.
+"""
+import asyncio
+import math
+from datetime import date, datetime, time, timedelta, UTC
+from typing import Optional, Sequence
+
+from sqlalchemy import func, text, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.sketches import DDSketch, HyperLogLog
+from app.crud import crud_data_version
+from app.models.receipt import Check, OrgDailyStats, OrgStatsPending
+
+# Столбцы сортировки отчетов: значение параметра -> выражение итогов.
+TOP_ITEMS_ORDER = {"revenue": "total_revenue", "quantity": "total_quantity", "count": "items_count"}
+TOP_ORGANIZATIONS_ORDER = {"revenue": "total_revenue", "checks": "checks_count"}
+
+# Пересчет итогов по всем чекам (после массовой загрузки данных в обход API).
+REBUILD_ORG_STATS_STATEMENTS = (
+    "TRUNCATE org_stats_pending, org_daily_stats, org_item_daily_stats",
+    """
+    INSERT INTO org_daily_stats (org_id, day, checks_count, total_sum)
+    SELECT org_id, (created_at AT TIME ZONE 'UTC')::date, COUNT(*), SUM(check_sum)
+    FROM checks
+    GROUP BY 1, 2
+    """,
+    """
+    INSERT INTO org_item_daily_stats (org_id, day, item_name, items_count, total_quantity, total_revenue)
+    SELECT c.org_id, (c.created_at AT TIME ZONE 'UTC')::date, i.item_name,
+           COUNT(*), COALESCE(SUM(i.item_quantity), 0), COALESCE(SUM(i.item_sum), 0)
+    FROM items i
+             JOIN checks c ON c.check_id = i.check_id
+    GROUP BY 1, 2, 3
+    """,
+)
+
+
+async def enqueue_checks_for_org_stats(db: AsyncSession, check_ids: Sequence[int]):
+    """Отметить только что вставленные чеки для переноса в итоги организаций (без коммита)."""
+    if not check_ids:
+        return
+    await db.execute(
+        text("INSERT INTO org_stats_pending (check_id) SELECT unnest(CAST(:check_ids AS integer[]))"),
+        {"check_ids": list(check_ids)},
+    )
+
+
+async def refresh_org_stats(db: AsyncSession, batch_size: int = 10_000) -> int:
+    """
+    Перенести в итоги организаций до `batch_size` ожидающих чеков одной транзакцией.
+
+    Пачка захватывается через `FOR UPDATE SKIP LOCKED`, поэтому задачу можно
+    запускать одновременно в нескольких процессах. Версия данных
+    увеличивается один раз на пачку последним выражением транзакции.
+    Возвращает количество перенесенных чеков.
+    """
+    query = text("""
+                 WITH batch AS (
+                     DELETE FROM org_stats_pending
+                         WHERE check_id IN (SELECT check_id
+                                            FROM org_stats_pending
+                                            ORDER BY check_id
+                                            LIMIT :batch_size FOR UPDATE SKIP LOCKED)
+                         RETURNING check_id),
+                      new_checks AS (SELECT c.check_id, c.org_id, (c.created_at AT TIME ZONE 'UTC')::date AS day,
+                                            c.check_sum, c.user_id
+                                     FROM checks c
+                                              JOIN batch b ON b.check_id = c.check_id),
+                      orgs AS (
+                          INSERT INTO org_daily_stats (org_id, day, checks_count, total_sum)
+                              SELECT org_id, day, COUNT(*), SUM(check_sum)
+                              FROM new_checks
+                              GROUP BY org_id, day
+                              ORDER BY org_id, day
+                              ON CONFLICT (org_id, day) DO UPDATE
+                                  SET checks_count = org_daily_stats.checks_count + EXCLUDED.checks_count,
+                                      total_sum = org_daily_stats.total_sum + EXCLUDED.total_sum),
+                      org_items AS (
+                          INSERT INTO org_item_daily_stats (org_id, day, item_name, items_count, total_quantity,
+                                                            total_revenue)
+                              SELECT n.org_id, n.day, i.item_name, COUNT(*),
+                                     COALESCE(SUM(i.item_quantity), 0), COALESCE(SUM(i.item_sum), 0)
+                              FROM new_checks n
+                                       JOIN items i ON i.check_id = n.check_id
+                              GROUP BY n.org_id, n.day, i.item_name
+                              ORDER BY n.org_id, n.day, i.item_name
+                              ON CONFLICT (org_id, day, item_name) DO UPDATE
+                                  SET items_count = org_item_daily_stats.items_count + EXCLUDED.items_count,
+                                      total_quantity = org_item_daily_stats.total_quantity
+                                          + EXCLUDED.total_quantity,
+                                      total_revenue = org_item_daily_stats.total_revenue
+                                          + EXCLUDED.total_revenue)
+                 SELECT org_id, day, user_id, check_sum
+                 FROM new_checks;
+                 """)
+    rows = (await db.execute(query, {"batch_size": batch_size})).all()
+    sketches = {}
+    for org_id, day, user_id, check_sum in rows:
+        buyers, amounts = sketches.setdefault((org_id, day), (HyperLogLog(), DDSketch()))
+        buyers.add(user_id)
+        amounts.add(check_sum)
+    await _merge_daily_sketches(db, sketches)
+    if rows:
+        await crud_data_version.bump_data_version(db)
+    await db.commit()
+    return len(rows)
+
+
+async def _merge_daily_sketches(db: AsyncSession,
+                                sketches: dict[tuple[int, date], tuple[HyperLogLog, DDSketch]]):
+    """
+    Объединить скетчи покупателей и сумм чеков с сохраненными в `org_daily_stats`.
+
+    Строки итогов уже заблокированы вставкой итогов в текущей транзакции,
+    поэтому чтение и запись скетча не конкурируют с другими обработчиками.
+    """
+    if not sketches:
+        return
+    result = await db.execute(
+        select(OrgDailyStats.org_id, OrgDailyStats.day, OrgDailyStats.buyers_sketch,
+               OrgDailyStats.check_sum_sketch)
+        .where(tuple_(OrgDailyStats.org_id, OrgDailyStats.day).in_(list(sketches)))
+    )
+    for org_id, day, stored_buyers, stored_amounts in result.all():
+        buyers, amounts = sketches[org_id, day]
+        if stored_buyers is not None:
+            buyers.merge(HyperLogLog(stored_buyers))
+        if stored_amounts is not None:
+            amounts.merge(DDSketch.from_bytes(stored_amounts))
+    await db.execute(update(OrgDailyStats), [
+        {"org_id": org_id, "day": day, "buyers_sketch": buyers.to_bytes(), "check_sum_sketch": amounts.to_bytes()}
+        for (org_id, day), (buyers, amounts) in sorted(sketches.items())
+    ])
+
+
+async def rebuild_org_stats(db: AsyncSession, chunk_size: int = 1000):
+    """
+    Пересчитать итоги организаций по всем чекам.
+
+    Итоги считаются в базе данных, скетчи — потоком чеков,
+    упорядоченных по организации и дню, и записываются порциями по
+    `chunk_size` дней организаций.
+    """
+    for statement in REBUILD_ORG_STATS_STATEMENTS:
+        await db.execute(text(statement))
+    stream = await db.stream(text("""
+                                  SELECT org_id, (created_at AT TIME ZONE 'UTC')::date AS day, user_id,
+                                         check_sum
+                                  FROM checks
+                                  ORDER BY org_id, day
+                                  """))
+    sketches = {}
+    async for org_id, day, user_id, check_sum in stream:
+        day_sketches = sketches.get((org_id, day))
+        if day_sketches is None:
+            if len(sketches) >= chunk_size:
+                await _merge_daily_sketches(db, sketches)
+                sketches = {}
+            day_sketches = sketches[org_id, day] = (HyperLogLog(), DDSketch())
+        day_sketches[0].add(user_id)
+        day_sketches[1].add(check_sum)
+    await _merge_daily_sketches(db, sketches)
+    await crud_data_version.bump_data_version(db)
+    await db.commit()
+
+
+async def count_pending_checks(db: AsyncSession, org_id: Optional[int] = None) -> int:
+    """Количество чеков (всех или одной организации), еще не перенесенных в итоги организаций."""
+    query = select(func.count()).select_from(OrgStatsPending)
+    if org_id is not None:
+        query = query.join(Check, Check.check_id == OrgStatsPending.check_id).where(Check.org_id == org_id)
+    return (await db.execute(query)).scalar_one()
+
+
+def _period_conditions(column: str, start_date: Optional[date], end_date: Optional[date], by_day: bool):
+    """
+    Условия отбора по периоду (даты включительно, UTC) и их параметры.
+
+    Для итогов сравнивается столбец `day`, для исходных чеков — `created_at`
+    с границами суток UTC, чтобы условие использовало индекс.
+    """
+    conditions, params = [], {}
+    if start_date is not None:
+        conditions.append(f"{column} >= :start")
+        params["start"] = start_date if by_day else datetime.combine(start_date, time.min, tzinfo=UTC)
+    if end_date is not None:
+        if by_day:
+            conditions.append(f"{column} <= :end")
+            params["end"] = end_date
+        else:
+            conditions.append(f"{column} < :end")
+            params["end"] = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=UTC)
+    return conditions, params
+
+
+async def get_top_items(
+        db: AsyncSession,
+        order_by: str = "revenue",
+        limit: int = 100,
+        org_id: Optional[int] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        exact: bool = False,
+):
+    """Получить товары (по названию) с наибольшей выручкой, объемом или числом продаж за период."""
+    if exact:
+        source = "items i JOIN checks c ON c.check_id = i.check_id"
+        columns = ("i.item_name, COUNT(*) AS items_count, COALESCE(SUM(i.item_quantity), 0) AS total_quantity, "
+                   "COALESCE(SUM(i.item_sum), 0) AS total_revenue")
+        group_by = "i.item_name"
+        conditions, params = _period_conditions("c.created_at", start_date, end_date, by_day=False)
+        org_column = "c.org_id"
+    else:
+        source = "org_item_daily_stats"
+        columns = ("item_name, SUM(items_count) AS items_count, SUM(total_quantity) AS total_quantity, "
+                   "SUM(total_revenue) AS total_revenue")
+        group_by = "item_name"
+        conditions, params = _period_conditions("day", start_date, end_date, by_day=True)
+        org_column = "org_id"
+    if org_id is not None:
+        conditions.append(f"{org_column} = :org_id")
+        params["org_id"] = org_id
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = text(f"""
+                 SELECT {columns}
+                 FROM {source}
+                 {where}
+                 GROUP BY {group_by}
+                 ORDER BY {TOP_ITEMS_ORDER[order_by]} DESC, item_name
+                 LIMIT :limit;
+                 """)
+    result = await db.execute(query, {**params, "limit": limit})
+    return result.all()
+
+
+async def get_top_organizations(
+        db: AsyncSession,
+        order_by: str = "revenue",
+        limit: int = 100,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        exact: bool = False,
+):
+    """Получить организации с наибольшей выручкой или числом чеков за период."""
+    if exact:
+        per_org = "SELECT org_id, COUNT(*) AS checks_count, SUM(check_sum) AS total_revenue FROM checks"
+        conditions, params = _period_conditions("created_at", start_date, end_date, by_day=False)
+    else:
+        per_org = ("SELECT org_id, SUM(checks_count) AS checks_count, SUM(total_sum) AS total_revenue "
+                   "FROM org_daily_stats")
+        conditions, params = _period_conditions("day", start_date, end_date, by_day=True)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = text(f"""
+                 WITH per_org AS ({per_org} {where} GROUP BY org_id)
+                 SELECT p.org_id, o.org_name, o.legal_form, p.checks_count, p.total_revenue
+                 FROM per_org p
+                          JOIN organizations o ON o.org_id = p.org_id
+                 ORDER BY p.{TOP_ORGANIZATIONS_ORDER[order_by]} DESC, p.org_id
+                 LIMIT :limit;
+                 """)
+    result = await db.execute(query, {**params, "limit": limit})
+    return result.all()
+
+
+async def get_distinct_buyers(
+        db: AsyncSession,
+        org_id: int,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        exact: bool = False,
+) -> dict:
+    """
+    Получить количество уникальных покупателей организации за период (даты включительно, UTC).
+
+    По умолчанию — оценка по объединению дневных скетчей HyperLogLog
+    (с относительной погрешностью `relative_error`), при `exact=True` —
+    точный `COUNT(DISTINCT user_id)` по чекам.
+    """
+    if exact:
+        conditions, params = _period_conditions("created_at", start_date, end_date, by_day=False)
+        where = "".join(f" AND {condition}" for condition in conditions)
+        query = text(f"SELECT COUNT(DISTINCT user_id) FROM checks WHERE org_id = :org_id{where}")
+        buyers = (await db.execute(query, {**params, "org_id": org_id})).scalar_one()
+        return {"distinct_buyers": buyers, "relative_error": None}
+
+    conditions, params = _period_conditions("day", start_date, end_date, by_day=True)
+    where = "".join(f" AND {condition}" for condition in conditions)
+    query = text(f"""
+                 SELECT buyers_sketch
+                 FROM org_daily_stats
+                 WHERE org_id = :org_id
+                   AND buyers_sketch IS NOT NULL{where}
+                 """)
+    sketches = (await db.execute(query, {**params, "org_id": org_id})).scalars().all()
+    # Объединение сотен скетчей занимает десятки миллисекунд, поэтому выполняется вне цикла событий.
+    sketch = await asyncio.to_thread(HyperLogLog.merged, sketches)
+    return {"distinct_buyers": round(sketch.estimate()), "relative_error": sketch.relative_error}
+
+
+async def get_check_sum_distribution(
+        db: AsyncSession,
+        org_id: Optional[int] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        bins: int = 20,
+        exact: bool = False,
+) -> dict:
+    """
+    Получить распределение сумм чеков за период (даты включительно, UTC), по
+    одной организации или по всем: количество, минимум, максимум, квантили
+    p50/p90/p99 и гистограмму с логарифмическими интервалами.
+
+    По умолчанию — по объединению дневных скетчей DDSketch (квантили с
+    относительной погрешностью `relative_accuracy`), при `exact=True` — по
+    исходным чекам (`percentile_cont`).
+    """
+    if exact:
+        return await _get_exact_check_sum_distribution(db, org_id, start_date, end_date, bins)
+
+    conditions, params = _period_conditions("day", start_date, end_date, by_day=True)
+    if org_id is not None:
+        conditions.append("org_id = :org_id")
+        params["org_id"] = org_id
+    where = "".join(f" AND {condition}" for condition in conditions)
+    query = text(f"SELECT check_sum_sketch FROM org_daily_stats WHERE check_sum_sketch IS NOT NULL{where}")
+    blobs = (await db.execute(query, params)).scalars().all()
+    # Объединение скетчей всех организаций за длинный период — заметная работа CPU.
+    sketch = await asyncio.to_thread(DDSketch.merged, blobs)
+    if not sketch.count:
+        return {"count": 0, "relative_accuracy": sketch.relative_accuracy, "histogram": []}
+    return {
+        "count": sketch.count,
+        "min": sketch.min,
+        "max": sketch.max,
+        "p50": sketch.quantile(0.5),
+        "p90": sketch.quantile(0.9),
+        "p99": sketch.quantile(0.99),
+        "relative_accuracy": sketch.relative_accuracy,
+        "histogram": [{"lower": lower, "upper": upper, "count": count}
+                      for lower, upper, count in sketch.histogram(bins)],
+    }
+
+
+async def _get_exact_check_sum_distribution(db: AsyncSession, org_id: Optional[int], start_date: Optional[date],
+                                            end_date: Optional[date], bins: int) -> dict:
+    """Точное распределение сумм чеков по исходной таблице (для офлайн-отчетов)."""
+    conditions, params = _period_conditions("created_at", start_date, end_date, by_day=False)
+    if org_id is not None:
+        conditions.append("org_id = :org_id")
+        params["org_id"] = org_id
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    summary = (await db.execute(text(f"""
+                 SELECT COUNT(*) AS count, MIN(check_sum) AS min, MAX(check_sum) AS max,
+                        percentile_cont(ARRAY [0.5, 0.9, 0.99]) WITHIN GROUP (ORDER BY check_sum) AS quantiles
+                 FROM checks
+                 {where}
+                 """), params)).one()
+    if not summary.count:
+        return {"count": 0, "histogram": []}
+    # Границы интервалов — те же, что у гистограммы по скетчу.
+    low = max(float(summary.min), DDSketch().min_value)
+    high = max(float(summary.max), low)
+    ratio = math.log(high / low) / bins if high > low else 0
+    edges = [low * math.exp(ratio * n) for n in range(1, bins)] if ratio else []
+    counts = dict((await db.execute(text(f"""
+                 SELECT width_bucket(CAST(check_sum AS float8), CAST(:edges AS float8[])) AS bucket, COUNT(*)
+                 FROM checks
+                 {where}
+                 GROUP BY bucket
+                 """), {**params, "edges": edges})).all())
+    lowers = [float(summary.min)] + edges
+    uppers = edges + [float(summary.max)]
+    return {
+        "count": summary.count,
+        "min": summary.min,
+        "max": summary.max,
+        "p50": summary.quantiles[0],
+        "p90": summary.quantiles[1],
+        "p99": summary.quantiles[2],
+        "histogram": [{"lower": lower, "upper": upper, "count": counts.get(n, 0)}
+                      for n, (lower, upper) in enumerate(zip(lowers, uppers))],
+    }
@@ -1,11 +1,18 @@
 """
 Модуль с CRUD-операциями для модели Organization.
 """
+from typing import Sequence
+
+from sqlalchemy import Integer, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.models.receipt import Organization
+from app.schemas import check as check_schema
 from app.schemas.check import OrganizationCreate
+from app.services import reference_cache
+from app.services.reference_cache import organization_cache
 
 
 async def get_organization(db: AsyncSession, org_id: int):
@@ -14,6 +21,28 @@ async def get_organization(db: AsyncSession, org_id: int):
     return result.scalars().first()
 
 
+async def get_organizations_by_ids(db: AsyncSession, org_ids: Sequence[int]) -> list[Organization]:
+    """Получить организации по списку ID одним запросом, в порядке `org_ids` (отсутствующие пропускаются)."""
+    result = await db.execute(
+        select(Organization).where(Organization.org_id == any_(bindparam("org_ids", list(org_ids),
+                                                                        type_=ARRAY(Integer))))
+    )
+    organizations = {organization.org_id: organization for organization in result.scalars()}
+    return [organizations[org_id] for org_id in org_ids if org_id in organizations]
+
+
+async def get_organizations_cached(db: AsyncSession, org_ids: Sequence[int]) -> dict[int, check_schema.Organization]:
+    """
+    Получить организации по списку ID из кэша процесса; отсутствующие в кэше
+    загружаются одним запросом. Ненайденные ID в результат не попадают.
+    """
+    async def load(missing: list[int]) -> dict[int, check_schema.Organization]:
+        return {organization.org_id: check_schema.Organization.model_validate(organization)
+                for organization in await get_organizations_by_ids(db, missing)}
+
+    return await organization_cache.get_many(org_ids, load)
+
+
 async def get_organizations(db: AsyncSession, skip: int = 0, limit: int = 100):
     """Получить список организаций."""
     result = await db.execute(select(Organization).offset(skip).limit(limit))
@@ -24,6 +53,9 @@ async def create_organization(db: AsyncSession, organization: OrganizationCreate
     """Создать новую организацию."""
     db_org = Organization(org_name=organization.org_name, legal_form=organization.legal_form)
     db.add(db_org)
+    await db.flush()
+    await reference_cache.notify_reference_changed(db, organization_cache.name, db_org.org_id)
     await db.commit()
+    reference_cache.invalidate_reference(organization_cache.name, db_org.org_id)
     await db.refresh(db_org)
     return db_org
@@ -1,12 +1,19 @@
 """
 Модуль с CRUD-операциями для модели User.
 """
+from typing import Sequence
+
+from sqlalchemy import Integer, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.core.security import get_password_hash
 from app.models.receipt import User
+from app.schemas import check as check_schema
 from app.schemas.check import UserCreate
+from app.services import reference_cache
+from app.services.reference_cache import user_cache
 
 
 async def get_user(db: AsyncSession, user_id: int):
@@ -15,6 +22,26 @@ async def get_user(db: AsyncSession, user_id: int):
     return result.scalars().first()
 
 
+async def get_users_by_ids(db: AsyncSession, user_ids: Sequence[int]) -> list[User]:
+    """Получить пользователей по списку ID одним запросом, в порядке `user_ids` (отсутствующие пропускаются)."""
+    result = await db.execute(
+        select(User).where(User.user_id == any_(bindparam("user_ids", list(user_ids), type_=ARRAY(Integer))))
+    )
+    users = {user.user_id: user for user in result.scalars()}
+    return [users[user_id] for user_id in user_ids if user_id in users]
+
+
+async def get_users_cached(db: AsyncSession, user_ids: Sequence[int]) -> dict[int, check_schema.User]:
+    """
+    Получить пользователей по списку ID из кэша процесса; отсутствующие в кэше
+    загружаются одним запросом. Ненайденные ID в результат не попадают.
+    """
+    async def load(missing: list[int]) -> dict[int, check_schema.User]:
+        return {user.user_id: check_schema.User.model_validate(user) for user in await get_users_by_ids(db, missing)}
+
+    return await user_cache.get_many(user_ids, load)
+
+
 async def get_user_by_username(db: AsyncSession, username: str):
     """Получить пользователя по имени пользователя."""
     result = await db.execute(select(User).where(User.username == username))
@@ -32,6 +59,9 @@ async def create_user(db: AsyncSession, user: UserCreate):
     hashed_password = get_password_hash(user.password)
     db_user = User(username=user.username, hashed_password=hashed_password)
     db.add(db_user)
+    await db.flush()
+    await reference_cache.notify_reference_changed(db, user_cache.name, db_user.user_id)
     await db.commit()
+    reference_cache.invalidate_reference(user_cache.name, db_user.user_id)
     await db.refresh(db_user)
     return db_user
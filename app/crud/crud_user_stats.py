@@ -0,0 +1,148 @@
+"""
+Модуль с операциями над накопленными итогами покупок пользователей.
+
+Итоги хранятся в двух таблицах и обновляются в той же транзакции, что и
+вставка чеков:
+- `user_org_stats` — итоги за все время в разрезе организаций;
+- `user_daily_stats` — итоги по дням (UTC) в разрезе организаций, из них
+  отвечают запросы за период.
+
+Сводка пользователя читает несколько строк этих таблиц вместо сканирования
+его чеков и позиций.
+"""
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import crud_data_version
+
+CENT = Decimal("0.01")
+
+# Пересчет итогов по всем чекам (после массовой загрузки данных в обход API).
+REBUILD_USER_STATS_STATEMENTS = (
+    "TRUNCATE user_org_stats, user_daily_stats",
+    """
+    INSERT INTO user_org_stats (user_id, org_id, checks_count, total_sum)
+    SELECT user_id, org_id, COUNT(*), SUM(check_sum)
+    FROM checks
+    GROUP BY user_id, org_id
+    """,
+    """
+    INSERT INTO user_daily_stats (user_id, day, org_id, checks_count, total_sum)
+    SELECT user_id, (created_at AT TIME ZONE 'UTC')::date, org_id, COUNT(*), SUM(check_sum)
+    FROM checks
+    GROUP BY 1, 2, 3
+    """,
+)
+
+
+async def add_checks_to_user_stats(db: AsyncSession, check_ids: Sequence[int]):
+    """
+    Добавить только что вставленные чеки к итогам пользователей.
+
+    Выполняется одним запросом без коммита, в транзакции вставки чеков.
+    Строки итогов обновляются в порядке первичного ключа, чтобы
+    параллельные пакетные вставки не приводили к взаимоблокировкам.
+    """
+    if not check_ids:
+        return
+    query = text("""
+                 WITH new_checks AS (SELECT user_id, org_id, created_at, check_sum
+                                     FROM checks
+                                     WHERE check_id = ANY (CAST(:check_ids AS integer[]))),
+                      daily AS (
+                          INSERT INTO user_daily_stats (user_id, day, org_id, checks_count, total_sum)
+                              SELECT user_id, (created_at AT TIME ZONE 'UTC')::date AS day, org_id,
+                                     COUNT(*), SUM(check_sum)
+                              FROM new_checks
+                              GROUP BY user_id, day, org_id
+                              ORDER BY user_id, day, org_id
+                              ON CONFLICT (user_id, day, org_id) DO UPDATE
+                                  SET checks_count = user_daily_stats.checks_count + EXCLUDED.checks_count,
+                                      total_sum = user_daily_stats.total_sum + EXCLUDED.total_sum)
+                 INSERT INTO user_org_stats (user_id, org_id, checks_count, total_sum)
+                 SELECT user_id, org_id, COUNT(*), SUM(check_sum)
+                 FROM new_checks
+                 GROUP BY user_id, org_id
+                 ORDER BY user_id, org_id
+                 ON CONFLICT (user_id, org_id) DO UPDATE
+                     SET checks_count = user_org_stats.checks_count + EXCLUDED.checks_count,
+                         total_sum = user_org_stats.total_sum + EXCLUDED.total_sum;
+                 """)
+    await db.execute(query, {"check_ids": list(check_ids)})
+
+
+async def rebuild_user_stats(db: AsyncSession):
+    """Пересчитать итоги пользователей по всем чекам."""
+    for statement in REBUILD_USER_STATS_STATEMENTS:
+        await db.execute(text(statement))
+    await crud_data_version.bump_data_version(db)
+    await db.commit()
+
+
+async def get_user_summary(
+        db: AsyncSession,
+        user_id: int,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        top: int = 5,
+) -> dict:
+    """
+    Получить сводку покупок пользователя: количество чеков, сумму и
+    организации с наибольшей суммой покупок.
+
+    Без периода сводка строится по итогам за все время, с периодом — по
+    дневным итогам (даты включительно, UTC).
+    """
+    if start_date is None and end_date is None:
+        per_org = """
+                  SELECT org_id, checks_count, total_sum
+                  FROM user_org_stats
+                  WHERE user_id = :user_id
+                  """
+    else:
+        period = "".join((
+            " AND day >= :start_date" if start_date is not None else "",
+            " AND day <= :end_date" if end_date is not None else "",
+        ))
+        per_org = f"""
+                  SELECT org_id, SUM(checks_count) AS checks_count, SUM(total_sum) AS total_sum
+                  FROM user_daily_stats
+                  WHERE user_id = :user_id{period}
+                  GROUP BY org_id
+                  """
+    # Общие итоги считаются оконными функциями до LIMIT, поэтому хватает одного запроса.
+    query = text(f"""
+                 WITH per_org AS ({per_org})
+                 SELECT p.org_id,
+                        o.org_name,
+                        p.checks_count,
+                        p.total_sum,
+                        SUM(p.checks_count) OVER () AS user_checks_count,
+                        SUM(p.total_sum) OVER ()    AS user_total_sum
+                 FROM per_org p
+                          JOIN organizations o ON o.org_id = p.org_id
+                 ORDER BY p.total_sum DESC, p.org_id
+                 LIMIT :top;
+                 """)
+    params = {"user_id": user_id, "top": top}
+    if start_date is not None:
+        params["start_date"] = start_date
+    if end_date is not None:
+        params["end_date"] = end_date
+    result = await db.execute(query, params)
+    rows = result.all()
+    checks_count = int(rows[0].user_checks_count) if rows else 0
+    total_sum = rows[0].user_total_sum if rows else Decimal(0)
+    return {
+        "user_id": user_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "checks_count": checks_count,
+        "total_sum": total_sum,
+        "avg_check_sum": (total_sum / checks_count).quantize(CENT, ROUND_HALF_UP) if checks_count else None,
+        "top_organizations": rows,
+    }
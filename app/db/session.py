@@ -5,53 +5,243 @@
 фабрика сессий (AsyncSessionLocal) и базовая декларативная модель (Base).
 Также определяется функция-зависимость `get_db` для использования в эндпоинтах FastAPI.
 """
+import asyncio
+import functools
 import logging
-from typing import AsyncGenerator
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, AsyncGenerator, AsyncIterator, Callable, Optional
 
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
-from tenacity import retry, stop_after_attempt, wait_fixed
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
+from app.core.admission import route_class
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 # Создаем асинхронный "движок"
-engine = create_async_engine(settings.DATABASE_URL, echo=True, future=True)
+# pool_timeout ограничивает ожидание свободного соединения пула, а timeout asyncpg — установку
+# нового соединения, чтобы запросы не зависали при недоступной или перегруженной базе.
+engine = create_async_engine(
+    settings.DATABASE_URL, echo=True, future=True,
+    pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    connect_args={"timeout": settings.DB_CONNECT_TIMEOUT_SECONDS},
+)
+
+
+def _dispose_engine_after_fork():
+    """
+    Заменяет пул соединений движка новым в дочернем процессе после fork.
+
+    Соединения, открытые родителем, принадлежат его циклу событий и не должны
+    использоваться другим процессом; `close=False` оставляет их открытыми для родителя.
+    """
+    engine.sync_engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_engine_after_fork)
 
 # Фабрика для создания асинхронных сессий
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+# Ключ `Session.info` с ограничением времени выполнения выражений сессии в миллисекундах.
+STATEMENT_TIMEOUT_INFO_KEY = "statement_timeout_ms"
+
+# SQLSTATE query_canceled: выражение прервано по statement_timeout или отменено.
+QUERY_CANCELED_SQLSTATE = "57014"
+
+
+@event.listens_for(Session, "after_begin")
+def _set_statement_timeout(session, transaction, connection):
+    """
+    Ограничивает время выполнения выражений каждой транзакции сессии.
+
+    `SET LOCAL` действует до конца транзакции, поэтому соединение возвращается
+    в пул без измененных настроек.
+    """
+    timeout_ms = session.info.get(STATEMENT_TIMEOUT_INFO_KEY)
+    if timeout_ms:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+def statement_timeout_for(method: str, path: str) -> int:
+    """Ограничение времени выражений (мс) для класса запроса (см. `app.core.admission.route_class`); 0 — нет."""
+    return settings.DB_STATEMENT_TIMEOUTS_MS.get(route_class(method, path) or "", 0)
+
+
 # Базовый класс для всех наших SQLAlchemy моделей
 Base = declarative_base()
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+# Выключатель получения соединения запросами API (см. app.core.circuit_breaker).
+db_breaker = CircuitBreaker(
+    "База данных",
+    failure_threshold=settings.DB_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.DB_BREAKER_RESET_TIMEOUT_SECONDS,
+)
+
+# Методы, запросы которых не изменяют данные; только для них получение соединения повторяется.
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class DatabaseUnavailableError(Exception):
+    """База данных недоступна; запрос следует повторить через `retry_after` секунд."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueryTimeoutError(Exception):
+    """Выражение прервано базой данных по `statement_timeout`."""
+
+
+async def acquire_session(attempts: int = 1, statement_timeout_ms: int = 0) -> AsyncSession:
+    """
+    Создать сессию и сразу получить для нее соединение из пула.
+
+    `statement_timeout_ms` ограничивает время выполнения каждого выражения
+    сессии (0 — без ограничения).
+
+    Получение соединения проходит через выключатель `db_breaker`: пока он
+    разомкнут, сразу выбрасывается `DatabaseUnavailableError`. Неудачные
+    попытки (ошибка соединения или таймаут подключения) учитываются
+    выключателем и повторяются до `attempts` раз с паузой со случайной
+    составляющей (full jitter), чтобы повторы разных запросов не совпадали
+    по времени. Таймаут ожидания свободного соединения пула означает
+    перегрузку, а не отказ базы: он не учитывается выключателем и не
+    повторяется, чтобы не удлинять очередь за соединениями.
+    """
+    for attempt in range(attempts):
+        try:
+            trial = db_breaker.before_call()
+        except CircuitOpenError as e:
+            raise DatabaseUnavailableError(str(e), e.retry_after) from e
+        session = AsyncSessionLocal(info={STATEMENT_TIMEOUT_INFO_KEY: statement_timeout_ms})
+        try:
+            await session.connection()
+        except PoolTimeoutError as e:
+            if trial:
+                db_breaker.record_abandoned()
+            await session.close()
+            logger.warning(f"Нет свободного соединения в пуле базы данных: {e!r}")
+            raise DatabaseUnavailableError("Все соединения с базой данных заняты", 1) from e
+        except Exception as e:
+            await session.close()
+            db_breaker.record_failure(e)
+            logger.error(f"Ошибка подключения к базе данных (попытка {attempt + 1} из {attempts}): {e!r}")
+            if attempt + 1 == attempts:
+                raise DatabaseUnavailableError("База данных недоступна", db_breaker.retry_after() or 1) from e
+            await asyncio.sleep(random.uniform(0, settings.DB_READ_RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+        except BaseException:
+            # Отмена во время пробного подключения не должна оставлять выключатель занятым навсегда.
+            if trial:
+                db_breaker.record_abandoned()
+            await session.close()
+            raise
+        else:
+            db_breaker.record_success()
+            return session
+
+
+@asynccontextmanager
+async def request_session(request: Request, statement_timeout_ms: Optional[int] = None) -> AsyncIterator[AsyncSession]:
+    """
+    Сессия базы данных для обработки запроса `request`.
+
+    Соединение получается сразу (см. `acquire_session`); для запросов чтения
+    неудачное получение повторяется `DB_READ_RETRY_ATTEMPTS` раз. Время
+    выполнения выражений ограничено `statement_timeout_ms`, по умолчанию —
+    `DB_STATEMENT_TIMEOUTS_MS` для класса запроса; прерванное по времени
+    выражение приводит к `QueryTimeoutError`. Потеря соединения во время
+    запроса учитывается выключателем.
+    Время работы с базой данных прибавляется к `request.state.db_seconds`,
+    поэтому сессии потоковых ответов, открытые после завершения эндпоинта,
+    тоже учитываются.
+    """
+    started = time.monotonic()
+    attempts = 1 + (settings.DB_READ_RETRY_ATTEMPTS if request.method in IDEMPOTENT_METHODS else 0)
+    if statement_timeout_ms is None:
+        statement_timeout_ms = statement_timeout_for(request.method, request.scope["path"])
+    session = await acquire_session(attempts, statement_timeout_ms=statement_timeout_ms)
+    try:
+        yield session
+    except DBAPIError as e:
+        if e.connection_invalidated:
+            db_breaker.record_failure(e)
+        if getattr(e.orig, "sqlstate", None) == QUERY_CANCELED_SQLSTATE:
+            raise QueryTimeoutError(f"Выражение выполнялось дольше {statement_timeout_ms} мс") from e
+        raise
+    finally:
+        await session.close()
+        # Время работы с базой (с ожиданием пула) для адаптивных лимитов app.core.admission.
+        request.state.db_seconds = getattr(request.state, "db_seconds", 0) + time.monotonic() - started
+
+
+# Открывает сессию `request_session` для запроса; аргумент — `statement_timeout_ms`.
+SessionOpener = Callable[..., AsyncContextManager[AsyncSession]]
+
+
+def get_session_opener(request: Request) -> SessionOpener:
+    """
+    Зависимость FastAPI для потоковых ответов: функция, открывающая сессию
+    базы данных (см. `request_session`).
+
+    Сессия `get_db` закрывается до отправки ответа, поэтому генератор
+    потокового ответа открывает и закрывает собственную сессию.
+    """
+    return functools.partial(request_session, request)
+
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """
     Зависимость FastAPI для получения асинхронной сессии базы данных.
 
-    Создает новую сессию `AsyncSession` для каждого запроса и гарантирует
-    ее закрытие после завершения запроса.
+    Сессия создается `request_session` и закрывается после завершения
+    запроса. Потоковые ответы не используют эту сессию после возврата из
+    эндпоинта, а открывают собственную (см. `get_session_opener`).
 
     Yields:
         AsyncSession: Асинхронная сессия SQLAlchemy.
     """
-    try:
-        async with AsyncSessionLocal() as session:
-            yield session
-    except Exception as e:
-        logger.error(f"Ошибка подключения к базе данных: {e}")
-        raise
+    async with request_session(request) as session:
+        yield session
+
+
+def pool_metrics() -> dict:
+    """Состояние пула соединений движка."""
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "timeout_seconds": settings.DB_POOL_TIMEOUT_SECONDS,
+    }
+
+
+async def ping_database():
+    """Выполняет `SELECT 1` на соединении из пула; при недоступности базы выбрасывает исключение."""
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
 
 
-async def check_db_connection():
-    """Проверяет доступность базы данных."""
+async def check_db_connection(timeout: float = 2) -> bool:
+    """Проверяет доступность базы данных не дольше `timeout` секунд."""
     try:
-        async with engine.connect() as conn:
-            await conn.execute("SELECT 1")
+        async with asyncio.timeout(timeout):
+            await ping_database()
         return True
     except Exception:
         return False
@@ -4,14 +4,33 @@
 Отвечает за создание экземпляра FastAPI, настройку,
 подключение роутеров и запуск фоновых задач.
 """
+import asyncio
 import logging
+import math
 import time
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 
-from app.api.v1.endpoints import checks, users, organizations, invoices, login, health
+from app.api.v1.endpoints import checks, users, organizations, invoices, login, health, items, export
+from app.core.admission import AdmissionControlMiddleware, admission_controller
+from app.core.compression import CompressionMiddleware
+from app.core.config import settings
+from app.core.disconnect import CancelOnDisconnectMiddleware
+from app.core.http_cache import ETagMiddleware
+from app.core.lifecycle import InFlightRequestsMiddleware, RequestTracker
 from app.core.logging import setup_logging
+from app.core.rate_limit import RateLimitMiddleware, rate_limiter
+from app.db.session import DatabaseUnavailableError, QueryTimeoutError, engine
+from app.services.db_health import db_health
+from app.services.idempotency import purge_expired_idempotency_keys
+from app.services.ingestion import drain_ingestion_queue, get_ingestion_queue
+from app.services.org_stats import refresh_org_stats
+from app.services.periodic import run_periodically
+from app.services.reconciliation import run_reconciliation
+from app.services.reference_cache import listen_for_invalidations
+from app.services.warmup import warm_up_pool
 
 # Настраиваем логирование
 setup_logging()
@@ -30,6 +49,10 @@ tags_metadata = [
         "name": "Чеки",
         "description": "Операции с чеками и аналитика.",
     },
+    {
+        "name": "Товары",
+        "description": "Поиск товарных позиций.",
+    },
     {
         "name": "Организации",
         "description": "Операции с организациями.",
@@ -38,21 +61,116 @@ tags_metadata = [
         "name": "Накладные",
         "description": "Операции с накладными.",
     },
+    {
+        "name": "Выгрузка",
+        "description": "Выгрузка данных в колоночных форматах для аналитики.",
+    },
     {
         "name": "Служебные",
         "description": "Служебные эндпоинты, например, для проверки состояния здоровья сервиса.",
     },
 ]
 
+
+# Выполняющиеся запросы процесса (см. app.core.lifecycle).
+request_tracker = RequestTracker()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Прогревает пул соединений и запускает фоновые задачи при старте приложения.
+
+    При остановке перестает принимать запросы, дожидается выполняющихся
+    запросов и текущих запусков фоновых задач не дольше
+    `SHUTDOWN_DRAIN_TIMEOUT_SECONDS`, отменяет оставшиеся задачи и закрывает
+    соединения пула.
+    """
+    # Соединения сверх постоянной части пула закрылись бы сразу после прогрева.
+    await warm_up_pool(min(settings.DB_POOL_WARMUP_CONNECTIONS, settings.DB_POOL_SIZE),
+                       timeout=settings.DB_WARMUP_TIMEOUT_SECONDS)
+    await db_health.check()
+    stopping = asyncio.Event()
+    periodic_jobs = [
+        (run_reconciliation, settings.RECONCILIATION_INTERVAL_SECONDS, "сверка накладных"),
+        (purge_expired_idempotency_keys, settings.IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS,
+         "очистка ключей идемпотентности"),
+        (refresh_org_stats, settings.ORG_STATS_REFRESH_INTERVAL_SECONDS, "обновление итогов организаций"),
+    ]
+    background_tasks = [
+        asyncio.create_task(run_periodically(job, interval, name, stopping))
+        for job, interval, name in periodic_jobs
+        if interval > 0 and settings.BACKGROUND_JOBS_ENABLED
+    ]
+    # Проверка базы данных для пробы готовности нужна в каждом воркере.
+    background_tasks.append(asyncio.create_task(
+        run_periodically(db_health.check, settings.HEALTH_CHECK_INTERVAL_SECONDS, "проверка базы данных", stopping)
+    ))
+    # Кэш справочников в каждом воркере свой, поэтому и подписка на его изменения своя.
+    listener_task = None
+    if settings.REFERENCE_CACHE_ENABLED:
+        listener_task = asyncio.create_task(listen_for_invalidations(
+            settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1),
+            settings.REFERENCE_CACHE_CHECK_INTERVAL_SECONDS,
+        ))
+    ingestion_queue = get_ingestion_queue()
+    ingestion_task = None
+    if ingestion_queue is not None:
+        ingestion_task = asyncio.create_task(drain_ingestion_queue(ingestion_queue))
+    yield
+
+    deadline = time.monotonic() + settings.SHUTDOWN_DRAIN_TIMEOUT_SECONDS
+    request_tracker.start_draining()
+    stopping.set()
+    if not await request_tracker.wait_idle(settings.SHUTDOWN_DRAIN_TIMEOUT_SECONDS):
+        logging.warning(f"Остановка: не дождались завершения запросов: {request_tracker.in_flight}")
+    # Периодические задачи завершаются после текущего запуска; не успевшие к сроку отменяются.
+    _, pending = await asyncio.wait(background_tasks, timeout=max(deadline - time.monotonic(), 0))
+    if pending:
+        logging.warning(f"Остановка: отменено фоновых задач: {len(pending)}")
+    # Записи, захваченные потребителем очереди, вернутся в очередь по истечении аренды.
+    if ingestion_task is not None:
+        background_tasks.append(ingestion_task)
+    if listener_task is not None:
+        background_tasks.append(listener_task)
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    if ingestion_queue is not None:
+        ingestion_queue.close()
+    await rate_limiter.store.close()
+    await engine.dispose()
+
+
 # Создаем экземпляр FastAPI
 app = FastAPI(
     title="API для Чеков",
     description="Сервис для управления чеками, пользователями, организациями и накладными.",
     version="1.0.0",
     openapi_tags=tags_metadata,
+    lifespan=lifespan,
 )
 
 
+# Добавляется первым, чтобы прерывать только обработку запроса, а внешние middleware получили ответ.
+if settings.DB_CANCEL_ON_DISCONNECT:
+    app.add_middleware(CancelOnDisconnectMiddleware)
+# ETag вычисляется по несжатому телу, поэтому ETagMiddleware находится внутри сжатия.
+if settings.ETAG_ENABLED:
+    app.add_middleware(ETagMiddleware)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, encodings=settings.COMPRESSION_ENCODINGS,
+                       minimum_size=settings.COMPRESSION_MIN_SIZE)
+# Внутри остальных middleware, чтобы учитывать только выполнение запроса.
+app.add_middleware(InFlightRequestsMiddleware, tracker=request_tracker)
+# Отклоненные при перегрузке запросы не доходят до учета выполняющихся, но попадают в журнал запросов.
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware, controller=admission_controller)
+# Ограничение частоты снаружи контроля допуска: запросы сверх лимита клиента не занимают очередь класса.
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Middleware для логирования HTTP-запросов."""
@@ -64,6 +182,26 @@ async def log_requests(request: Request, call_next):
     return response
 
 
+@app.exception_handler(DatabaseUnavailableError)
+async def database_unavailable_handler(request: Request, exc: DatabaseUnavailableError):
+    """Быстрый отказ, пока база данных недоступна (см. app.db.session.acquire_session)."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "База данных временно недоступна"},
+        headers={"Retry-After": str(max(math.ceil(exc.retry_after), 1))},
+    )
+
+
+@app.exception_handler(QueryTimeoutError)
+async def query_timeout_handler(request: Request, exc: QueryTimeoutError):
+    """Выражение SQL прервано по `DB_STATEMENT_TIMEOUTS_MS` (см. app.db.session.get_db)."""
+    logging.warning(f"Превышено время выполнения запроса к базе данных: {request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=504,
+        content={"detail": "Превышено время выполнения запроса к базе данных"},
+    )
+
+
 @app.exception_handler(Exception)
 async def validation_exception_handler(request: Request, exc: Exception):
     """Обработчик для логирования необработанных исключений."""
@@ -78,8 +216,10 @@ async def validation_exception_handler(request: Request, exc: Exception):
 app.include_router(users.router, prefix="/api/v1", tags=["Пользователи"])
 app.include_router(login.router, prefix="/api/v1", tags=["Аутентификация"])
 app.include_router(checks.router, prefix="/api/v1", tags=["Чеки"])
+app.include_router(items.router, prefix="/api/v1", tags=["Товары"])
 app.include_router(organizations.router, prefix="/api/v1", tags=["Организации"])
 app.include_router(invoices.router, prefix="/api/v1", tags=["Накладные"])
+app.include_router(export.router, prefix="/api/v1", tags=["Выгрузка"])
 app.include_router(health.router, tags=["Служебные"])
 
 
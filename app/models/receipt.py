@@ -5,9 +5,11 @@
 `invoices` и их взаимосвязи.
 """
 from sqlalchemy import (
-    Column, Integer, String, Float, DateTime, ForeignKey, func, Numeric, SMALLINT, VARCHAR
+    Column, Integer, String, Float, DateTime, ForeignKey, func, Numeric, SMALLINT, VARCHAR, Index, CHAR,
+    UniqueConstraint, Computed, DDL, event, Date, LargeBinary, BigInteger
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 
 from app.db.session import Base
 
@@ -52,6 +54,22 @@ class Invoice(Base):
     checks = relationship("Check", secondary="check_invoices", back_populates="invoices")
 
 
+class InvoiceDiscrepancy(Base):
+    """
+    Модель SQLAlchemy, представляющая расхождение суммы накладной с суммой привязанных чеков.
+
+    Таблица целиком пересчитывается задачей сверки накладных.
+    """
+    __tablename__ = "invoice_discrepancies"
+
+    invoice_id = Column(Integer, ForeignKey("invoices.invoice_id", ondelete="CASCADE"), primary_key=True)
+    invoice_sum = Column(Numeric(10, 2), nullable=False)
+    linked_sum = Column(Numeric(14, 2), nullable=False)
+    checks_count = Column(Integer, nullable=False)
+    difference = Column(Numeric(14, 2), nullable=False)
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+
+
 class CheckInvoice(Base):
     """
     Ассоциативная таблица для связи многие-ко-многим между чеками и накладными.
@@ -60,6 +78,11 @@ class CheckInvoice(Base):
     check_id = Column(Integer, ForeignKey('checks.check_id'), primary_key=True)
     invoice_id = Column(Integer, ForeignKey('invoices.invoice_id'), primary_key=True)
 
+    # Первичный ключ начинается с check_id, поэтому для выборки чеков накладной нужен отдельный индекс.
+    __table_args__ = (
+        Index("ix_check_invoices_invoice_id_check_id", "invoice_id", "check_id"),
+    )
+
 
 class Check(Base):
     """
@@ -80,6 +103,14 @@ class Check(Base):
     items = relationship("Item", back_populates="check", cascade="all, delete-orphan")
     invoices = relationship("Invoice", secondary="check_invoices", back_populates="checks")
 
+    # Выборка чеков пользователя за период с keyset-пагинацией по (created_at, check_id).
+    __table_args__ = (
+        Index("ix_checks_user_id_created_at", "user_id", "created_at", "check_id"),
+        # Фильтры поиска позиций по организации и периоду (см. `crud_item.search_items`).
+        Index("ix_checks_org_id_created_at", "org_id", "created_at", "check_id"),
+        Index("ix_checks_created_at", "created_at", "check_id"),
+    )
+
 
 class Item(Base):
     """
@@ -96,3 +127,179 @@ class Item(Base):
 
     check_id = Column(Integer, ForeignKey("checks.check_id"), nullable=False)
     check = relationship("Check", back_populates="items")
+
+    __table_args__ = (
+        # Позиции с найденным названием, начиная с новых (см. `crud_item.search_items`).
+        Index("ix_items_item_name_item_id", "item_name", "item_id"),
+        # Позиции чека; название и ID в индексе позволяют поиску с фильтрами
+        # отбирать позиции чеков без чтения таблицы.
+        Index("ix_items_check_id_item_name", "check_id", "item_name", postgresql_include=["item_id"]),
+    )
+
+
+class ItemName(Base):
+    """
+    Словарь различных названий позиций для поиска.
+
+    Релевантность зависит только от названия, поэтому поиск ранжирует
+    названия в словаре (их на порядки меньше, чем позиций), а позиции
+    выбирает по индексу `(item_name, item_id)` только для лучших названий.
+    Пополняется при создании чеков.
+    """
+    __tablename__ = "item_names"
+
+    item_name = Column(VARCHAR(255), primary_key=True)
+    # Поисковый вектор названия (русская конфигурация). Вычисляется базой данных и
+    # не загружается вместе с названием, так как нужен только для поиска.
+    item_name_tsv = deferred(Column(TSVECTOR, Computed("to_tsvector('russian', item_name)", persisted=True)))
+
+    __table_args__ = (
+        Index("ix_item_names_item_name_tsv", "item_name_tsv", postgresql_using="gin"),
+        Index("ix_item_names_item_name_trgm", "item_name", postgresql_using="gin",
+              postgresql_ops={"item_name": "gin_trgm_ops"}),
+    )
+
+
+# Триграммный индекс по названиям позиций требует расширения pg_trgm.
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
+class UserOrgStats(Base):
+    """
+    Модель SQLAlchemy, представляющая накопленные итоги покупок пользователя в организации.
+
+    Обновляется при создании чеков (см. `app.crud.crud_user_stats`).
+    """
+    __tablename__ = "user_org_stats"
+
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True)
+    org_id = Column(Integer, ForeignKey("organizations.org_id", ondelete="CASCADE"), primary_key=True)
+    checks_count = Column(Integer, nullable=False)
+    total_sum = Column(Numeric(14, 2), nullable=False)
+
+
+class UserDailyStats(Base):
+    """
+    Модель SQLAlchemy, представляющая итоги покупок пользователя в организации за день (UTC).
+
+    Обновляется при создании чеков (см. `app.crud.crud_user_stats`).
+    """
+    __tablename__ = "user_daily_stats"
+
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    org_id = Column(Integer, ForeignKey("organizations.org_id", ondelete="CASCADE"), primary_key=True)
+    checks_count = Column(Integer, nullable=False)
+    total_sum = Column(Numeric(14, 2), nullable=False)
+
+
+class OrgStatsPending(Base):
+    """
+    Модель SQLAlchemy, представляющая чек, еще не учтенный в итогах организаций.
+
+    Строки добавляются при создании чеков и удаляются фоновой задачей,
+    которая переносит чеки в итоги (см. `app.crud.crud_org_stats`).
+    """
+    __tablename__ = "org_stats_pending"
+
+    check_id = Column(Integer, primary_key=True)
+
+
+class OrgDailyStats(Base):
+    """
+    Модель SQLAlchemy, представляющая итоги продаж организации за день (UTC),
+    включая скетчи уникальных покупателей и распределения сумм чеков.
+    """
+    __tablename__ = "org_daily_stats"
+
+    org_id = Column(Integer, ForeignKey("organizations.org_id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    checks_count = Column(Integer, nullable=False)
+    total_sum = Column(Numeric(16, 2), nullable=False)
+    # Скетчи за день (см. app.core.sketches): HyperLogLog покупателей и DDSketch сумм чеков.
+    buyers_sketch = deferred(Column(LargeBinary))
+    check_sum_sketch = deferred(Column(LargeBinary))
+
+
+class OrgItemDailyStats(Base):
+    """
+    Модель SQLAlchemy, представляющая итоги продаж товара (по названию) в организации за день (UTC).
+    """
+    __tablename__ = "org_item_daily_stats"
+
+    org_id = Column(Integer, ForeignKey("organizations.org_id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    item_name = Column(VARCHAR(255), primary_key=True)
+    items_count = Column(Integer, nullable=False)
+    total_quantity = Column(Numeric(16, 3), nullable=False)
+    total_revenue = Column(Numeric(16, 2), nullable=False)
+
+
+class IdempotencyKey(Base):
+    """
+    Модель SQLAlchemy, представляющая ключ идемпотентности (заголовок `Idempotency-Key`).
+
+    Хранит хеш исходного запроса и сохраненный ответ, который повторно
+    отдается клиенту при повторе запроса с тем же ключом.
+    """
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
+    scope = Column(VARCHAR(50), nullable=False)
+    key = Column(VARCHAR(255), nullable=False)
+    request_hash = Column(CHAR(64), nullable=False)
+    status_code = Column(SMALLINT)
+    response_body = Column(JSONB)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "scope", "key", name="uq_idempotency_keys_user_id_scope_key"),
+    )
+
+
+class DataVersion(Base):
+    """
+    Модель SQLAlchemy, представляющая счетчик изменений данных (версию данных).
+
+    Версия данных — сумма `version` по всем строкам. Счетчик разбит на
+    строки: изменяющая транзакция увеличивает строку
+    `mod(txid_current(), DATA_VERSION_SHARDS)`, поэтому параллельные
+    транзакции редко ждут блокировки одной строки (строка блокируется до
+    фиксации транзакции).
+
+    Счетчик увеличивают триггеры редко изменяемых таблиц
+    (`DATA_VERSIONED_TABLES`) на каждое изменяющее выражение. Вставка чеков
+    его не трогает, чтобы не выстраивать конкурентные вставки в очередь:
+    новые чеки видны по водяному знаку `org_stats_pending`, а перенос чеков
+    в итоги и пересчет итогов увеличивают счетчик один раз перед фиксацией
+    (см. `app.crud.crud_data_version`).
+    """
+    __tablename__ = "data_versions"
+
+    shard = Column(SMALLINT, primary_key=True, autoincrement=False)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+DATA_VERSION_SHARDS = 64
+
+# Редко изменяемые таблицы, изменения которых меняют ответы аналитики. Чеки, позиции и итоги
+# меняются только вставкой чеков, переносом в итоги и пересчетом (см. класс DataVersion).
+DATA_VERSIONED_TABLES = ("users", "organizations", "invoices", "invoice_discrepancies", "check_invoices")
+
+event.listen(DataVersion.__table__, "after_create", DDL(
+    f"INSERT INTO data_versions (shard, version) SELECT generate_series(0, {DATA_VERSION_SHARDS - 1}), 0"
+))
+event.listen(Base.metadata, "after_create", DDL(f"""
+    CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE shard = mod(txid_current(), {DATA_VERSION_SHARDS});
+        RETURN NULL;
+    END
+    $$
+"""))
+for _table in DATA_VERSIONED_TABLES:
+    event.listen(Base.metadata, "after_create", DDL(
+        f"CREATE TRIGGER trg_{_table}_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {_table} "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()"
+    ))
@@ -5,17 +5,17 @@
 1.  Валидации JSON-объектов, поступающих в POST/PUT запросах.
 2.  Сериализации объектов SQLAlchemy в JSON для ответов API.
 3.  Автоматической генерации документации OpenAPI (Swagger/ReDoc).
+
+Денежные и количественные значения (NUMERIC) имеют тип Decimal, как их возвращает
+драйвер. В JSON pydantic-core выводит их строкой (`"179.80"`) без вызова Python-функций
+на каждое значение, поэтому значения в ответе в точности совпадают со значениями в базе.
 """
 
-from pydantic import BaseModel, ConfigDict, PlainSerializer
-from typing import List, Optional, Annotated
+from pydantic import BaseModel, ConfigDict
+from typing import List, Literal, Optional
 from datetime import datetime, date
 from decimal import Decimal
 
-# Пользовательский тип для корректной сериализации Decimal в float в Pydantic V2.
-# Annotated используется для добавления метаданных (в данном случае, сериализатора) к типу.
-DecimalAsFloat = Annotated[Decimal, PlainSerializer(lambda x: float(x), return_type=float)]
-
 
 # ==============================================================================
 # Схемы для сущности "Пользователь" (User)
@@ -37,6 +37,12 @@ class User(UserBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class UsersBatch(BaseModel):
+    """Пользователи по списку ID в порядке запроса и ID, которые не найдены."""
+    items: List[User]
+    missing_ids: List[int]
+
+
 # ==============================================================================
 # Схемы для сущности "Организация" (Organization)
 # ==============================================================================
@@ -58,13 +64,19 @@ class Organization(OrganizationBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class OrganizationsBatch(BaseModel):
+    """Организации по списку ID в порядке запроса и ID, которые не найдены."""
+    items: List[Organization]
+    missing_ids: List[int]
+
+
 # ==============================================================================
 # Схемы для сущности "Накладная" (Invoice)
 # ==============================================================================
 
 class InvoiceBase(BaseModel):
     """Базовая схема для накладной."""
-    invoice_sum: DecimalAsFloat
+    invoice_sum: Decimal
     invoice_type: Optional[int] = None
     payment_type: Optional[str] = None
 
@@ -81,8 +93,46 @@ class Invoice(InvoiceBase):
 
 
 class InvoiceWithChecks(Invoice):
-    """Расширенная схема накладной для будущего использования (например, с деталями чеков)."""
-    pass
+    """Схема накладной со страницей привязанных к ней чеков."""
+    total_checks: int
+    checks: List["InvoiceCheck"] = []
+    next_after_check_id: Optional[int] = None
+
+
+class InvoiceDiscrepancy(BaseModel):
+    """Схема расхождения суммы накладной с суммой привязанных чеков."""
+    invoice_id: int
+    invoice_sum: Decimal
+    linked_sum: Decimal
+    checks_count: int
+    difference: Decimal
+    model_config = ConfigDict(from_attributes=True)
+
+
+class InvoiceReconciliationReport(BaseModel):
+    """Страница отчета о сверке накладных."""
+    computed_at: Optional[datetime] = None
+    total: int
+    items: List[InvoiceDiscrepancy]
+    next_after_invoice_id: Optional[int] = None
+
+
+class InvoiceReconciliationRun(BaseModel):
+    """Итог запуска сверки накладных."""
+    discrepancies: int
+    computed_at: datetime
+
+
+class CheckInvoiceLink(BaseModel):
+    """Схема пары "чек — накладная" для пакетного связывания."""
+    check_id: int
+    invoice_id: int
+
+
+class CheckInvoiceLinkResult(CheckInvoiceLink):
+    """Результат связывания одной пары "чек — накладная"."""
+    status: Literal["linked", "already_linked", "check_not_found", "invoice_not_found"]
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ==============================================================================
@@ -92,10 +142,10 @@ class InvoiceWithChecks(Invoice):
 class ItemBase(BaseModel):
     """Базовая схема для товарной позиции в чеке."""
     item_name: str
-    item_price: Optional[DecimalAsFloat] = None
+    item_price: Optional[Decimal] = None
     item_type: Optional[int] = None
-    item_quantity: Optional[DecimalAsFloat] = None
-    item_sum: Optional[DecimalAsFloat] = None
+    item_quantity: Optional[Decimal] = None
+    item_sum: Optional[Decimal] = None
 
 
 class ItemCreate(ItemBase):
@@ -109,13 +159,28 @@ class Item(ItemBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ItemSearchResult(Item):
+    """Схема найденной товарной позиции: позиция, ее чек и релевантность."""
+    check_id: int
+    org_id: int
+    created_at: datetime
+    rank: float
+
+
+class ItemSearchPage(BaseModel):
+    """Страница результатов поиска позиций с курсором следующей страницы."""
+    items: List[ItemSearchResult]
+    next_after_item_name: Optional[str] = None
+    next_after_item_id: Optional[int] = None
+
+
 # ==============================================================================
 # Схемы для сущности "Чек" (Check)
 # ==============================================================================
 
 class CheckBase(BaseModel):
     """Базовая схема для чека."""
-    check_sum: DecimalAsFloat
+    check_sum: Decimal
     user_id: int
     org_id: int
 
@@ -135,11 +200,44 @@ class Check(CheckBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class InvoiceCheck(CheckBase):
+    """Схема чека в составе накладной. Позиции заполняются только по запросу."""
+    check_id: int
+    created_at: datetime
+    items: Optional[List[Item]] = None
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CheckBulkCreate(BaseModel):
+    """Массив чеков для пакетного создания."""
+    checks: List[CheckCreate]
+
+
+class CheckBulkCreateResult(BaseModel):
+    """Результат пакетного создания чеков: ID в порядке входного массива."""
+    check_ids: List[int]
+
+
+class CheckIngestionStatus(BaseModel):
+    """Статус чека, принятого через асинхронную очередь."""
+    tracking_id: str
+    status: Literal["pending", "processing", "done", "failed"]
+    accepted_at: datetime
+    check_id: Optional[int] = None
+    error: Optional[str] = None
+
+
 class CheckUpdate(CheckBase):
     """Схема для обновления существующего чека."""
     pass
 
 
+class ChecksBatch(BaseModel):
+    """Чеки по списку ID в порядке запроса и ID, которые не найдены."""
+    items: List[Check]
+    missing_ids: List[int]
+
+
 # Обновление forward-ссылок в моделях после их полного определения.
 # Необходимо для разрешения циклических зависимостей, если они появятся.
 InvoiceWithChecks.model_rebuild()
@@ -155,26 +253,130 @@ class SalesByOrganization(BaseModel):
     org_name: str
     legal_form: Optional[str] = None
     total_checks: int
-    total_revenue: DecimalAsFloat
-    avg_check_amount: DecimalAsFloat
+    total_revenue: Decimal
+    avg_check_amount: Decimal
+    model_config = ConfigDict(from_attributes=True)
+
+
+class UserOrganizationSpending(BaseModel):
+    """Схема итогов покупок пользователя в одной организации."""
+    org_id: int
+    org_name: str
+    checks_count: int
+    total_sum: Decimal
     model_config = ConfigDict(from_attributes=True)
 
 
+class UserSummary(BaseModel):
+    """Схема сводки покупок пользователя за все время или за период."""
+    user_id: int
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    checks_count: int
+    total_sum: Decimal
+    avg_check_sum: Optional[Decimal] = None
+    top_organizations: List[UserOrganizationSpending]
+
+
 class UserCheck(BaseModel):
     """Схема для вывода списка чеков пользователя за период."""
     check_id: int
     created_at: datetime
-    check_sum: DecimalAsFloat
+    check_sum: Decimal
     org_name: str
     legal_form: Optional[str] = None
-    items: str
+    items: List[Item] = []
     model_config = ConfigDict(from_attributes=True)
 
 
+class UserChecksPage(BaseModel):
+    """Страница чеков пользователя за период с курсором следующей страницы."""
+    checks: List[UserCheck]
+    next_after_created_at: Optional[datetime] = None
+    next_after_check_id: Optional[int] = None
+
+
 class ItemsByCategory(BaseModel):
     """Схема для вывода аналитики по товарам в разрезе категорий."""
     category: str
     items_sold: int
-    total_quantity: DecimalAsFloat
-    total_revenue: DecimalAsFloat
+    total_quantity: Decimal
+    total_revenue: Decimal
     model_config = ConfigDict(from_attributes=True)
+
+
+class TopItem(BaseModel):
+    """Схема итогов продаж товара (по названию) за период."""
+    item_name: str
+    items_count: int
+    total_quantity: Decimal
+    total_revenue: Decimal
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TopItemsReport(BaseModel):
+    """
+    Отчет "топ товаров". В режиме `rollup` не учтены последние чеки, число
+    которых указано в `pending_checks`; в режиме `exact` оно не заполняется.
+    """
+    mode: Literal["rollup", "exact"]
+    pending_checks: Optional[int] = None
+    items: List[TopItem]
+
+
+class TopOrganization(BaseModel):
+    """Схема итогов продаж организации за период."""
+    org_id: int
+    org_name: str
+    legal_form: Optional[str] = None
+    checks_count: int
+    total_revenue: Decimal
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TopOrganizationsReport(BaseModel):
+    """Отчет "топ организаций" (см. `TopItemsReport`)."""
+    mode: Literal["rollup", "exact"]
+    pending_checks: Optional[int] = None
+    organizations: List[TopOrganization]
+
+
+class DistinctBuyersReport(BaseModel):
+    """
+    Количество уникальных покупателей организации за период. В режиме
+    `sketch` это оценка с относительной погрешностью `relative_error`.
+    """
+    mode: Literal["sketch", "exact"]
+    org_id: int
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    distinct_buyers: int
+    relative_error: Optional[float] = None
+    pending_checks: Optional[int] = None
+
+
+class HistogramBin(BaseModel):
+    """Интервал гистограммы."""
+    lower: float
+    upper: float
+    count: int
+
+
+class CheckSumDistribution(BaseModel):
+    """
+    Распределение сумм чеков за период. В режиме `sketch` квантили и
+    гистограмма оцениваются по скетчам с относительной погрешностью `relative_accuracy`.
+    """
+    mode: Literal["sketch", "exact"]
+    org_id: Optional[int] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    count: int
+    min: Optional[float] = None
+    max: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p99: Optional[float] = None
+    relative_accuracy: Optional[float] = None
+    histogram: List[HistogramBin]
+    pending_checks: Optional[int] = None
@@ -0,0 +1,189 @@
+"""
+Точка входа для запуска приложения в production: несколько процессов-воркеров uvicorn.
+
+Один процесс uvicorn использует одно ядро, а хеширование паролей bcrypt и
+сериализация больших ответов занимают цикл событий. Главный процесс
+открывает слушающий сокет, загружает приложение (`SERVER_PRELOAD`) и
+запускает `SERVER_WORKERS` воркеров через fork (по умолчанию по числу
+доступных ядер); воркеры принимают соединения с общего сокета.
+
+- Цикл событий uvloop и HTTP-парсер httptools используются, если пакеты
+  установлены (`loop="auto"`, `http="auto"`), иначе — asyncio и h11.
+- Пул соединений движка SQLAlchemy пересоздается в каждом воркере сразу
+  после fork (см. `app.db.session`), поэтому соединения не разделяются
+  между процессами.
+- Воркер, обработавший `SERVER_MAX_REQUESTS` запросов (плюс случайная
+  добавка до `SERVER_MAX_REQUESTS_JITTER`, чтобы воркеры не перезапускались
+  одновременно), плавно завершается и заменяется новым; так же заменяется
+  аварийно завершившийся воркер.
+- SIGTERM/SIGINT передаются воркерам, которые дожидаются текущих запросов
+  не дольше `SERVER_GRACEFUL_TIMEOUT` секунд; оставшиеся воркеры
+  принудительно завершаются.
+- Периодические фоновые задачи (см. `app.main.lifespan`) выполняет только
+  первый воркер.
+
+На платформах без fork приложение запускается в одном процессе.
+
+Запуск:
+    python -m app.server
+"""
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from typing import Optional
+
+import uvicorn
+
+from app.core.config import settings
+from app.core.logging import setup_logging
+
+logger = logging.getLogger(__name__)
+
+APP_IMPORT_STRING = "app.main:app"
+
+# Минимальное время между перезапусками одного слота воркера, если воркеры завершаются аварийно.
+RESPAWN_BACKOFF_SECONDS = 1.0
+
+
+def worker_count() -> int:
+    """Количество воркеров: `SERVER_WORKERS` или число доступных процессу ядер."""
+    if settings.SERVER_WORKERS > 0:
+        return settings.SERVER_WORKERS
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - нет sched_getaffinity (macOS, Windows)
+        return os.cpu_count() or 1
+
+
+def server_config(app=APP_IMPORT_STRING) -> uvicorn.Config:
+    """Конфигурация uvicorn одного воркера."""
+    limit_max_requests = None
+    if settings.SERVER_MAX_REQUESTS > 0:
+        limit_max_requests = settings.SERVER_MAX_REQUESTS + random.randint(0, settings.SERVER_MAX_REQUESTS_JITTER)
+    return uvicorn.Config(
+        app,
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        loop="auto",
+        http="auto",
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_TIMEOUT,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+        limit_max_requests=limit_max_requests,
+        proxy_headers=True,
+        # Запросы логирует middleware приложения; логирование настроено в app.core.logging.
+        access_log=False,
+        log_config=None,
+    )
+
+
+class WorkerSupervisor:
+    """Главный процесс: запускает воркеры через fork, заменяет завершившиеся и останавливает их."""
+
+    def __init__(self, workers: int, app=APP_IMPORT_STRING):
+        self.workers = workers
+        self.app = app
+        self.children: dict[int, int] = {}  # pid -> номер слота
+        self.stopping = False
+        self._socket: Optional[socket.socket] = None
+        self._started_at: dict[int, float] = {}
+
+    def run(self):
+        self._socket = server_config(self.app).bind_socket()
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGALRM, self._handle_kill)
+        logger.info(f"Запуск {self.workers} воркеров (главный процесс {os.getpid()})")
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:  # pragma: no cover - воркеров уже нет
+                break
+            slot = self.children.pop(pid, None)
+            if slot is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                continue
+            if code != 0:
+                logger.warning(f"Воркер {pid} (слот {slot}) завершился с кодом {code}, перезапуск")
+                # Воркер, падающий сразу после запуска, не должен перезапускаться в цикле без паузы.
+                if time.monotonic() - self._started_at[slot] < RESPAWN_BACKOFF_SECONDS:
+                    time.sleep(RESPAWN_BACKOFF_SECONDS)
+            else:
+                logger.info(f"Воркер {pid} (слот {slot}) перезапускается после SERVER_MAX_REQUESTS запросов")
+            self._spawn(slot)
+        signal.alarm(0)
+        self._socket.close()
+        logger.info("Все воркеры остановлены")
+
+    def _spawn(self, slot: int):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = slot
+            self._started_at[slot] = time.monotonic()
+            return
+        # Дочерний процесс: возвращаться в цикл главного процесса нельзя.
+        code = 0
+        try:
+            self._run_worker(slot)
+        except BaseException:
+            logger.exception("Воркер завершился с ошибкой")
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def _run_worker(self, slot: int):
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGALRM):
+            signal.signal(signum, signal.SIG_DFL)
+        random.seed()
+        # Периодические задачи выполняет один воркер, а не каждый.
+        settings.BACKGROUND_JOBS_ENABLED = settings.BACKGROUND_JOBS_ENABLED and slot == 0
+        uvicorn.Server(server_config(self.app)).run(sockets=[self._socket])
+
+    def _handle_stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"Получен сигнал {signal.Signals(signum).name}, остановка воркеров")
+        self._signal_children(signal.SIGTERM)
+        # Воркер ждет соединения до SERVER_GRACEFUL_TIMEOUT, затем lifespan — до SHUTDOWN_DRAIN_TIMEOUT_SECONDS.
+        signal.alarm(int(settings.SERVER_GRACEFUL_TIMEOUT + settings.SHUTDOWN_DRAIN_TIMEOUT_SECONDS) + 5)
+
+    def _handle_kill(self, signum, frame):
+        logger.warning(f"Воркеры не остановились вовремя, принудительное завершение: {list(self.children)}")
+        self._signal_children(signal.SIGKILL)
+
+    def _signal_children(self, signum: int):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+
+def main():
+    """Запускает сервер с `worker_count()` воркерами."""
+    setup_logging()
+    app = APP_IMPORT_STRING
+    if settings.SERVER_PRELOAD:
+        # Приложение импортируется один раз в главном процессе; воркеры получают его через fork.
+        from app.main import app
+    workers = worker_count()
+    if workers == 1 or not hasattr(os, "fork"):
+        uvicorn.Server(server_config(app)).run()
+        return
+    WorkerSupervisor(workers, app).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Фоновая проверка доступности базы данных для проб готовности.
+
+Проба готовности оркестратора не обращается к базе сама: фоновая задача
+раз в `HEALTH_CHECK_INTERVAL_SECONDS` выполняет `SELECT 1` через пул с
+ограничением `HEALTH_CHECK_TIMEOUT_SECONDS`, а эндпоинт возвращает
+сохраненный результат. Поэтому при медленной базе пробы не накапливаются
+и не занимают соединения, а ответ пробы не зависит от времени ответа базы.
+Результат старше `HEALTH_CHECK_MAX_AGE_SECONDS` (фоновая проверка
+зависла или не запущена) считается отрицательным.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.db.session import ping_database
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseHealthMonitor:
+    """Последний результат проверки доступности базы данных."""
+
+    def __init__(self, ping: Callable[[], Awaitable[None]], timeout: float, max_age: float):
+        self.ping = ping
+        self.timeout = timeout
+        self.max_age = max_age
+        self.healthy = False
+        self.checked_at: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.error: Optional[str] = None
+
+    async def check(self) -> bool:
+        """Проверить базу данных и сохранить результат."""
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(self.timeout):
+                await self.ping()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = f"нет ответа за {self.timeout} с" if isinstance(e, TimeoutError) else repr(e)
+            if self.healthy or self.checked_at is None:
+                logger.warning(f"База данных недоступна: {error}")
+            self.healthy, self.error = False, error
+        else:
+            if not self.healthy and self.checked_at is not None:
+                logger.info("База данных снова доступна")
+            self.healthy, self.error = True, None
+        self.checked_at = time.monotonic()
+        self.latency = self.checked_at - started
+        return self.healthy
+
+    @property
+    def ready(self) -> bool:
+        """База данных доступна по результату не старше `max_age` секунд."""
+        return self.healthy and self.checked_at is not None and time.monotonic() - self.checked_at <= self.max_age
+
+    def status(self) -> dict:
+        """Состояние для ответа пробы."""
+        return {
+            "database": "up" if self.ready else "down",
+            "checked_seconds_ago": None if self.checked_at is None else round(time.monotonic() - self.checked_at, 3),
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "error": self.error if self.checked_at is not None else "проверка еще не выполнялась",
+        }
+
+
+db_health = DatabaseHealthMonitor(
+    ping_database,
+    timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+    max_age=settings.HEALTH_CHECK_MAX_AGE_SECONDS,
+)
@@ -0,0 +1,22 @@
+"""
+Фоновая задача удаления просроченных ключей идемпотентности.
+"""
+import logging
+from datetime import timedelta
+
+from app.core.config import settings
+from app.crud import crud_idempotency
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_expired_idempotency_keys():
+    """Удаляет ключи идемпотентности старше `IDEMPOTENCY_KEY_TTL_HOURS`."""
+    async with AsyncSessionLocal() as session:
+        deleted = await crud_idempotency.delete_expired_idempotency_keys(
+            session, ttl=timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+        )
+    if deleted:
+        logger.info(f"Удалено просроченных ключей идемпотентности: {deleted}")
+    return deleted
@@ -0,0 +1,305 @@
+"""
+Асинхронный (write-behind) прием чеков.
+
+Проверенные запросы на создание чека записываются в локальный журнал
+SQLite и сразу подтверждаются клиенту (`202 Accepted` с идентификатором
+отслеживания). Фоновый потребитель забирает записи из журнала большими
+пачками и записывает их в PostgreSQL.
+
+Гарантии:
+- Долговечность: запись подтверждается только после фиксации в SQLite (WAL,
+  `synchronous=FULL`).
+- Восстановление после сбоя: записи, захваченные потребителем, который не
+  успел их обработать, по истечении аренды (`INGESTION_CLAIM_TIMEOUT_SECONDS`)
+  снова становятся доступными. Чтобы повторная обработка не создала
+  дубликатов, идентификатор отслеживания записывается в `idempotency_keys`
+  в той же транзакции PostgreSQL, что и чек.
+- Обратное давление: при превышении `INGESTION_MAX_PENDING` необработанных
+  записей новые запросы отклоняются. Количество необработанных записей
+  хранится счетчиком в самом журнале и меняется в тех же транзакциях, что
+  и статусы записей, поэтому прием не пересчитывает очередь.
+"""
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, UTC
+from typing import Optional
+
+from sqlalchemy import tuple_
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.crud import crud_check
+from app.db.session import AsyncSessionLocal
+from app.models.receipt import IdempotencyKey
+from app.schemas.check import CheckCreate
+
+logger = logging.getLogger(__name__)
+
+INGESTION_SCOPE = "checks:ingest"
+
+
+class IngestionQueueFull(Exception):
+    """Очередь приема переполнена."""
+
+
+class IngestionKeyConflict(Exception):
+    """Ключ идемпотентности уже использован с другим телом запроса."""
+
+
+class IngestionQueue:
+    """
+    Долговечная очередь запросов на создание чеков поверх SQLite.
+
+    Методы синхронные и потокобезопасные; из асинхронного кода их следует
+    вызывать через `asyncio.to_thread`.
+    """
+
+    def __init__(self, path: str, max_pending: int, claim_timeout: float):
+        self.max_pending = max_pending
+        self.claim_timeout = claim_timeout
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingestion_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tracking_id TEXT NOT NULL UNIQUE,
+                client_key TEXT UNIQUE,
+                user_id INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                check_id INTEGER,
+                error TEXT,
+                accepted_at REAL NOT NULL,
+                claimed_at REAL,
+                request_hash TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_ingestion_queue_status_id ON ingestion_queue (status, id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingestion_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        # Счетчик создается один раз по содержимому журнала; дальше он меняется вместе со статусами.
+        self._conn.execute(
+            "INSERT OR IGNORE INTO ingestion_counters (name, value) "
+            "SELECT 'pending', COUNT(*) FROM ingestion_queue WHERE status IN ('pending', 'processing')"
+        )
+
+    def close(self):
+        """Закрывает соединение с журналом."""
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, user_id: int, payload: str, client_key: Optional[str] = None) -> dict:
+        """
+        Добавляет запрос в очередь и возвращает его запись.
+
+        Если `client_key` уже встречался, возвращается существующая запись;
+        если при этом отличается тело запроса, бросает `IngestionKeyConflict`.
+        Бросает `IngestionQueueFull`, если в очереди слишком много необработанных записей.
+        """
+        request_hash = hashlib.sha256(payload.encode()).hexdigest()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if client_key is not None:
+                    row = self._conn.execute(
+                        "SELECT * FROM ingestion_queue WHERE client_key = ?", (client_key,)
+                    ).fetchone()
+                    if row is not None:
+                        if row["request_hash"] != request_hash:
+                            raise IngestionKeyConflict()
+                        self._conn.execute("COMMIT")
+                        return dict(row)
+                pending = self._conn.execute(
+                    "SELECT value FROM ingestion_counters WHERE name = 'pending'"
+                ).fetchone()[0]
+                if pending >= self.max_pending:
+                    raise IngestionQueueFull()
+                tracking_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO ingestion_queue "
+                    "(tracking_id, client_key, user_id, payload, accepted_at, request_hash) VALUES (?, ?, ?, ?, ?, ?)",
+                    (tracking_id, client_key, user_id, payload, time.time(), request_hash),
+                )
+                self._conn.execute("UPDATE ingestion_counters SET value = value + 1 WHERE name = 'pending'")
+                row = self._conn.execute(
+                    "SELECT * FROM ingestion_queue WHERE tracking_id = ?", (tracking_id,)
+                ).fetchone()
+                self._conn.execute("COMMIT")
+                return dict(row)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def claim(self, limit: int) -> list[dict]:
+        """Захватывает до `limit` записей для обработки (включая записи с истекшей арендой)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT * FROM ingestion_queue "
+                    "WHERE status = 'pending' OR (status = 'processing' AND claimed_at < ?) "
+                    "ORDER BY id LIMIT ?",
+                    (now - self.claim_timeout, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE ingestion_queue SET status = 'processing', claimed_at = ? WHERE id = ?",
+                    [(now, row["id"]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [dict(row) for row in rows]
+
+    def _finish(self, sql: str, params: list[tuple]):
+        """
+        Переводит необработанные записи в конечный статус и уменьшает счетчик
+        необработанных записей на количество измененных строк.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.executemany(sql + " AND status IN ('pending', 'processing')", params)
+                self._conn.execute("UPDATE ingestion_counters SET value = value - ? WHERE name = 'pending'",
+                                   (cursor.rowcount,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def complete(self, results: dict[str, int]):
+        """Отмечает записи как обработанные. `results`: tracking_id -> check_id."""
+        self._finish(
+            "UPDATE ingestion_queue SET status = 'done', check_id = ?, payload = '' WHERE tracking_id = ?",
+            [(check_id, tracking_id) for tracking_id, check_id in results.items()],
+        )
+
+    def fail(self, errors: dict[str, str]):
+        """Отмечает записи как неуспешные. `errors`: tracking_id -> текст ошибки."""
+        self._finish(
+            "UPDATE ingestion_queue SET status = 'failed', error = ? WHERE tracking_id = ?",
+            [(error, tracking_id) for tracking_id, error in errors.items()],
+        )
+
+    def get(self, tracking_id: str) -> Optional[dict]:
+        """Возвращает запись по идентификатору отслеживания."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM ingestion_queue WHERE tracking_id = ?", (tracking_id,)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def purge(self, older_than: float) -> int:
+        """Удаляет завершенные записи, принятые раньше `older_than` (unix time)."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM ingestion_queue WHERE status IN ('done', 'failed') AND accepted_at < ?",
+                (older_than,),
+            )
+        return cursor.rowcount
+
+
+_queue: Optional[IngestionQueue] = None
+
+
+def get_ingestion_queue() -> Optional[IngestionQueue]:
+    """Возвращает очередь приема процесса (None, если асинхронный прием отключен)."""
+    global _queue
+    if _queue is None and settings.INGESTION_QUEUE_ENABLED:
+        _queue = IngestionQueue(
+            settings.INGESTION_QUEUE_PATH,
+            max_pending=settings.INGESTION_MAX_PENDING,
+            claim_timeout=settings.INGESTION_CLAIM_TIMEOUT_SECONDS,
+        )
+    return _queue
+
+
+async def _store_batch(rows: list[dict]) -> tuple[dict[str, int], dict[str, str]]:
+    """
+    Записывает пачку чеков в PostgreSQL одной транзакцией.
+
+    Возвращает (успешно записанные: tracking_id -> check_id, ошибки: tracking_id -> текст).
+    """
+    async with AsyncSessionLocal() as session:
+        # Записи, уже сохраненные до сбоя, повторно не вставляются.
+        result = await session.execute(
+            select(IdempotencyKey.key, IdempotencyKey.response_body).where(
+                tuple_(IdempotencyKey.user_id, IdempotencyKey.scope, IdempotencyKey.key).in_(
+                    [(row["user_id"], INGESTION_SCOPE, row["tracking_id"]) for row in rows]
+                )
+            )
+        )
+        done = {key: body["check_id"] for key, body in result.all()}
+        rows = [row for row in rows if row["tracking_id"] not in done]
+        if not rows:
+            return done, {}
+
+        checks = [CheckCreate.model_validate_json(row["payload"]) for row in rows]
+        created_at = [datetime.fromtimestamp(row["accepted_at"], UTC) for row in rows]
+        check_ids = await crud_check.create_checks_bulk(session, checks, created_at=created_at, commit=False)
+        session.add_all(
+            IdempotencyKey(user_id=row["user_id"], scope=INGESTION_SCOPE, key=row["tracking_id"],
+                           request_hash=row["request_hash"], status_code=201, response_body={"check_id": check_id})
+            for row, check_id in zip(rows, check_ids)
+        )
+        await session.commit()
+    done.update((row["tracking_id"], check_id) for row, check_id in zip(rows, check_ids))
+    return done, {}
+
+
+async def _store_rows(rows: list[dict]) -> tuple[dict[str, int], dict[str, str]]:
+    """
+    Записывает пачку; если пачка отклонена базой из-за данных, пишет записи
+    по одной, чтобы ошибка в одном чеке не блокировала остальные. Ошибки
+    подключения пробрасываются: записи останутся в очереди.
+    """
+    try:
+        return await _store_batch(rows)
+    except (IntegrityError, DataError) as e:
+        if len(rows) == 1:
+            return {}, {rows[0]["tracking_id"]: str(e.orig)}
+    done, errors = {}, {}
+    for row in rows:
+        row_done, row_errors = await _store_rows([row])
+        done.update(row_done)
+        errors.update(row_errors)
+    return done, errors
+
+
+async def drain_ingestion_queue(queue: IngestionQueue):
+    """
+    Бесконечно переносит записи из очереди приема в PostgreSQL пачками
+    по `INGESTION_BATCH_SIZE`. При пустой очереди ждет
+    `INGESTION_POLL_INTERVAL_SECONDS` и удаляет старые завершенные записи.
+    """
+    last_purge = 0.0
+    while True:
+        try:
+            rows = await asyncio.to_thread(queue.claim, settings.INGESTION_BATCH_SIZE)
+            if rows:
+                done, errors = await _store_rows(rows)
+                await asyncio.to_thread(queue.complete, done)
+                if errors:
+                    await asyncio.to_thread(queue.fail, errors)
+                    logger.warning(f"Не удалось сохранить чеков из очереди приема: {len(errors)}")
+                continue
+            if time.time() - last_purge > 60:
+                last_purge = time.time()
+                await asyncio.to_thread(queue.purge, time.time() - settings.INGESTION_RETENTION_HOURS * 3600)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Захваченные записи вернутся в очередь по истечении аренды.
+            logger.error(f"Ошибка обработки очереди приема: {e}")
+        await asyncio.sleep(settings.INGESTION_POLL_INTERVAL_SECONDS)
@@ -0,0 +1,24 @@
+"""
+Фоновая задача переноса новых чеков в итоги организаций.
+"""
+import logging
+
+from app.core.config import settings
+from app.crud import crud_org_stats
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+async def refresh_org_stats():
+    """Переносит в итоги все ожидающие чеки пачками по `ORG_STATS_BATCH_SIZE`."""
+    total = 0
+    async with AsyncSessionLocal() as session:
+        while True:
+            processed = await crud_org_stats.refresh_org_stats(session, batch_size=settings.ORG_STATS_BATCH_SIZE)
+            total += processed
+            if processed < settings.ORG_STATS_BATCH_SIZE:
+                break
+    if total:
+        logger.info(f"Перенесено чеков в итоги организаций: {total}")
+    return total
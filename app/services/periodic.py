@@ -0,0 +1,33 @@
+"""
+Запуск периодических фоновых задач.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(job: Callable[[], Awaitable[Any]], interval: float, name: str,
+                           stopping: Optional[asyncio.Event] = None):
+    """
+    Запускает задачу `job` с паузой `interval` секунд между запусками, пока
+    не установлено событие `stopping` (без него — бесконечно).
+
+    Ошибки задачи логируются и не прерывают цикл; отмена пробрасывается
+    дальше. Установка `stopping` не прерывает выполняющийся запуск задачи,
+    а завершает цикл после него.
+    """
+    stopping = stopping or asyncio.Event()
+    while not stopping.is_set():
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка фоновой задачи '{name}': {e}")
+        try:
+            async with asyncio.timeout(interval):
+                await stopping.wait()
+        except TimeoutError:
+            pass
@@ -0,0 +1,23 @@
+"""
+Фоновая задача сверки накладных.
+
+Пересчитывает таблицу расхождений между суммами накладных и суммами
+привязанных к ним чеков.
+"""
+import logging
+
+from app.crud import crud_invoice
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+async def run_reconciliation():
+    """Выполняет одну сверку накладных в отдельной сессии."""
+    async with AsyncSessionLocal() as session:
+        summary = await crud_invoice.reconcile_invoices(session)
+    if summary is None:
+        logger.info("Сверка накладных пропущена: уже выполняется в другом процессе")
+        return None
+    logger.info(f"Сверка накладных завершена: найдено расхождений {summary['discrepancies']}")
+    return summary
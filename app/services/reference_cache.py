@@ -0,0 +1,195 @@
+"""
+Кэш справочных данных (организаций и пользователей) в памяти процесса.
+
+Организации и пользователи меняются редко, а читаются с каждой страницей
+чеков. Кэш — LRU ограниченного размера (`ORGANIZATION_CACHE_SIZE`,
+`USER_CACHE_SIZE`) из схем ответа API, поэтому объекты не привязаны к
+сессии базы данных.
+
+Согласованность обеспечивается версией кэша: запись инвалидирует ключ и
+увеличивает версию, а значение, прочитанное из базы, сохраняется в кэш,
+только если версия не изменилась с начала чтения. Поэтому чтение,
+начавшееся до изменения, не вернет в кэш устаревшее значение.
+
+Изменения из других воркеров приходят через PostgreSQL `LISTEN/NOTIFY`:
+операция записи в той же транзакции выполняет `pg_notify` в канал
+`REFERENCE_CACHE_CHANNEL` (уведомление доставляется после фиксации), а
+фоновая задача каждого воркера слушает канал на отдельном соединении.
+Уведомления, отправленные без соединения, теряются, поэтому после
+подключения (и переподключения) кэши очищаются целиком.
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, Hashable, Iterable, Optional, TypeVar
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_CACHE_CHANNEL = "reference_cache"
+
+# Полезная нагрузка уведомления: `<таблица>:<ключ>` или `*` (сбросить все кэши).
+INVALIDATE_ALL = "*"
+
+_RECONNECT_MAX_DELAY_SECONDS = 30.0
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class VersionedLRUCache(Generic[K, V]):
+    """LRU-кэш ограниченного размера с версией, увеличивающейся при каждой инвалидации."""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        self.version = 0
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_cached(self, keys: Iterable[K]) -> tuple[dict[K, V], list[K]]:
+        """Найденные в кэше значения и список ключей, которых в кэше нет."""
+        found, missing = {}, []
+        for key in keys:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                found[key] = self._entries[key]
+            else:
+                missing.append(key)
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, values: dict[K, V], version: int) -> bool:
+        """Сохранить значения, прочитанные при версии `version`; устаревшие не сохраняются."""
+        if version != self.version or self.capacity <= 0:
+            return False
+        for key, value in values.items():
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        return True
+
+    async def get_many(self, keys: Iterable[K], load: Callable[[list[K]], Awaitable[dict[K, V]]]) -> dict[K, V]:
+        """Значения по ключам: из кэша, а отсутствующие — через `load` одним вызовом."""
+        found, missing = self.get_cached(keys)
+        if missing:
+            version = self.version
+            loaded = await load(missing)
+            self.put_many(loaded, version)
+            found.update(loaded)
+        return found
+
+    def invalidate(self, keys: Optional[Iterable[K]] = None):
+        """Удалить ключи (или все значения, если `keys` не задан) и увеличить версию."""
+        self.version += 1
+        self.invalidations += 1
+        if keys is None:
+            self._entries.clear()
+            return
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def metrics(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+def _capacity(size: int) -> int:
+    return size if settings.REFERENCE_CACHE_ENABLED else 0
+
+
+organization_cache: VersionedLRUCache[int, object] = VersionedLRUCache(
+    "organizations", _capacity(settings.ORGANIZATION_CACHE_SIZE))
+user_cache: VersionedLRUCache[int, object] = VersionedLRUCache("users", _capacity(settings.USER_CACHE_SIZE))
+
+# Таблица -> кэш ее строк (по первичному ключу).
+reference_caches = {cache.name: cache for cache in (organization_cache, user_cache)}
+
+
+def invalidate_reference(table: str, key: int):
+    """Инвалидировать строку таблицы в кэше текущего процесса."""
+    reference_caches[table].invalidate([key])
+
+
+def invalidate_all_references():
+    for cache in reference_caches.values():
+        cache.invalidate()
+
+
+async def notify_reference_changed(db: AsyncSession, table: str, key: int):
+    """
+    Отправить другим воркерам уведомление об изменении строки таблицы.
+
+    Выполняется в транзакции записи: PostgreSQL доставит уведомление только
+    после ее фиксации, а при откате не доставит.
+    """
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                     {"channel": REFERENCE_CACHE_CHANNEL, "payload": f"{table}:{key}"})
+
+
+def handle_notification(payload: str):
+    """Применить уведомление из канала `REFERENCE_CACHE_CHANNEL` к кэшам процесса."""
+    table, _, key = payload.partition(":")
+    if payload == INVALIDATE_ALL or table not in reference_caches:
+        # Неизвестное уведомление (например, от более новой версии сервиса): безопаснее сбросить все.
+        invalidate_all_references()
+        return
+    try:
+        reference_caches[table].invalidate([int(key)])
+    except ValueError:
+        reference_caches[table].invalidate()
+
+
+def _on_notification(connection, pid, channel, payload):
+    handle_notification(payload)
+
+
+def reference_cache_metrics() -> dict:
+    return {name: cache.metrics() for name, cache in reference_caches.items()}
+
+
+async def listen_for_invalidations(dsn: str, check_interval: float):
+    """
+    Слушать канал инвалидации на отдельном соединении до отмены задачи.
+
+    Соединение раз в `check_interval` секунд проверяется запросом; при
+    ошибке кэши очищаются, а подключение повторяется с растущей задержкой.
+    """
+    delay = 1.0
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn, timeout=check_interval)
+            await connection.add_listener(REFERENCE_CACHE_CHANNEL, _on_notification)
+            # Изменения, сделанные до подписки, могли не дойти до этого процесса.
+            invalidate_all_references()
+            logger.info("Кэш справочников: подписка на уведомления об изменениях")
+            delay = 1.0
+            while True:
+                await asyncio.sleep(check_interval)
+                await connection.fetchval("SELECT 1", timeout=check_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            invalidate_all_references()
+            logger.warning(f"Кэш справочников: нет подписки на уведомления ({e!r}), повтор через {delay} с")
+        finally:
+            if connection is not None:
+                connection.terminate()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, _RECONNECT_MAX_DELAY_SECONDS)
@@ -0,0 +1,71 @@
+"""
+Прогрев пула соединений при запуске приложения.
+
+Движок открывает соединения лениво, поэтому без прогрева первые запросы
+после запуска (или перезапуска воркера) ждут установки соединения с
+PostgreSQL, а каждый запрос к новому соединению — подготовки своих
+выражений: asyncpg кэширует подготовленные выражения отдельно для каждого
+соединения. Прогрев одновременно открывает `DB_POOL_WARMUP_CONNECTIONS`
+соединений, выполняет на каждом запросы горячих путей (`WARMUP_QUERIES`)
+с заведомо несуществующими значениями и возвращает соединения в пул.
+"""
+import asyncio
+import logging
+from datetime import date, datetime, UTC
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import crud_check, crud_organization, crud_user, crud_user_stats
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+_PAST_DAY = date(2000, 1, 1)
+
+# Запросы горячих путей: проверка токена, чтение чека и организации, страницы и сводка чеков пользователя.
+WARMUP_QUERIES: list[Callable[[AsyncSession], Awaitable]] = [
+    lambda db: crud_user.get_user_by_username(db, username=""),
+    lambda db: crud_user.get_user(db, user_id=0),
+    lambda db: crud_check.get_check(db, check_id=0),
+    lambda db: crud_organization.get_organization(db, org_id=0),
+    lambda db: crud_check.get_checks_by_user_for_period(db, user_id=0, start_date=_PAST_DAY, end_date=_PAST_DAY),
+    lambda db: crud_check.get_checks_by_user_for_period(
+        db, user_id=0, start_date=_PAST_DAY, end_date=_PAST_DAY,
+        after_created_at=datetime(2000, 1, 1, tzinfo=UTC), after_check_id=0,
+    ),
+    lambda db: crud_user_stats.get_user_summary(db, user_id=0),
+]
+
+
+async def _warm_up_connection(barrier: asyncio.Barrier):
+    async with engine.connect() as connection:
+        async with AsyncSession(bind=connection) as session:
+            for query in WARMUP_QUERIES:
+                await query(session)
+        await connection.rollback()
+        # Соединение возвращается в пул только после того, как открыты все остальные;
+        # иначе следующие задачи получили бы из пула уже прогретое соединение.
+        await barrier.wait()
+
+
+async def warm_up_pool(connections: int, timeout: float) -> bool:
+    """
+    Открыть и прогреть `connections` соединений пула не дольше `timeout` секунд.
+
+    Ошибки не прерывают запуск приложения: они логируются, и возвращается False.
+    """
+    if connections <= 0:
+        return True
+    barrier = asyncio.Barrier(connections)
+    try:
+        async with asyncio.timeout(timeout):
+            # TaskGroup отменяет остальные задачи при ошибке одной из них, и они не зависают на барьере.
+            async with asyncio.TaskGroup() as group:
+                for _ in range(connections):
+                    group.create_task(_warm_up_connection(barrier))
+    except Exception as e:
+        logger.warning(f"Не удалось прогреть пул соединений: {e!r}")
+        return False
+    logger.info(f"Пул соединений прогрет: {connections} соединений, {len(WARMUP_QUERIES)} запросов на соединение")
+    return True
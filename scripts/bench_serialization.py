@@ -0,0 +1,80 @@
+"""
+Бенчмарк сериализации товарных позиций в ответах API.
+
+Сравнивает стоимость обработки одной позиции в ответе из 10 000 позиций:
+- "до": денежные поля схемы имеют тип Decimal с сериализатором-лямбдой
+  (`PlainSerializer(lambda x: float(x))`), как было раньше;
+- "после": схема `app.schemas.check.Item` — Decimal без сериализатора,
+  который pydantic-core выводит в JSON строкой сам.
+
+В обоих вариантах драйвер возвращает одинаковый точный Decimal, поэтому
+разбор значений NUMERIC не сравнивается. Измеряются валидация из
+ORM-подобных объектов (`from_attributes`, как делает FastAPI с
+`response_model`) и сериализация в JSON так же, как в FastAPI
+(`mode="json"` + `json.dumps` в `JSONResponse`).
+
+Запуск:
+    python -m scripts.bench_serialization --items 10000 --repeat 30
+"""
+import argparse
+import json
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Annotated, List, Optional
+
+from pydantic import BaseModel, ConfigDict, PlainSerializer, TypeAdapter
+
+from app.schemas.check import Item
+
+LegacyDecimalAsFloat = Annotated[Decimal, PlainSerializer(lambda x: float(x), return_type=float)]
+
+
+class LegacyItem(BaseModel):
+    """Схема позиции в прежнем виде: Decimal + сериализатор-лямбда."""
+    item_name: str
+    item_price: Optional[LegacyDecimalAsFloat] = None
+    item_type: Optional[int] = None
+    item_quantity: Optional[LegacyDecimalAsFloat] = None
+    item_sum: Optional[LegacyDecimalAsFloat] = None
+    item_id: int
+    model_config = ConfigDict(from_attributes=True)
+
+
+def _rows(count: int) -> list[SimpleNamespace]:
+    """Объекты, похожие на строки SQLAlchemy, со значениями NUMERIC в виде Decimal."""
+    return [
+        SimpleNamespace(item_id=n, item_name="Молоко 3.2%", item_price=Decimal("89.90"), item_type=2,
+                        item_quantity=Decimal("2.000"), item_sum=Decimal("179.80"))
+        for n in range(count)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк сериализации позиций чеков.")
+    parser.add_argument("--items", type=int, default=10_000, help="Количество позиций в ответе.")
+    parser.add_argument("--repeat", type=int, default=30, help="Количество повторов.")
+    args = parser.parse_args(argv)
+
+    rows = _rows(args.items)
+    variants = {name: TypeAdapter(List[model]) for name, model in (("до", LegacyItem), ("после", Item))}
+
+    # Варианты чередуются в каждом повторе, а берется лучшее время: так меньше влияние фонового шума.
+    best = {name: [float("inf")] * 2 for name in variants}
+    for _ in range(args.repeat):
+        for name, adapter in variants.items():
+            started = time.perf_counter()
+            validated = adapter.validate_python(rows, from_attributes=True)
+            validated_at = time.perf_counter()
+            json.dumps(adapter.dump_python(validated, mode="json"))
+            timings = (validated_at - started, time.perf_counter() - validated_at)
+            best[name] = [min(current, timing) for current, timing in zip(best[name], timings)]
+
+    columns = ("валидация", "json (FastAPI)", "итого")
+    print(f"{'вариант':<10}" + "".join(f"{column:>16}" for column in columns) + "   (мкс на позицию)")
+    for name, (validate, serialize) in best.items():
+        timings = (validate, serialize, validate + serialize)
+        print(f"{name:<10}" + "".join(f"{t / args.items * 1e6:>16.2f}" for t in timings))
+
+if __name__ == "__main__":
+    main()
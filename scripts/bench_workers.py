@@ -0,0 +1,123 @@
+"""
+Бенчмарк пропускной способности сервера в зависимости от числа воркеров.
+
+Для каждого значения `--workers` запускает `python -m app.server` с
+`SERVER_WORKERS=<n>`, дожидается готовности и нагружает его GET-запросами
+к `--path` из нескольких процессов-генераторов нагрузки (по `--concurrency`
+одновременных запросов в каждом), после чего останавливает сервер
+сигналом SIGTERM. Выводит число запросов в секунду, задержки p50/p99 и
+ускорение относительно первого варианта.
+
+Генераторы нагрузки сами занимают ядра, поэтому для честного сравнения
+их лучше запускать на другой машине (`--url`) или оставлять серверу
+большую часть ядер.
+
+Запуск:
+    python -m scripts.bench_workers --workers 1 2 4 8 --duration 15
+    python -m scripts.bench_workers --path /api/v1/users/1/summary --header "Authorization: Bearer <token>"
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+async def _load(url: str, headers: dict, concurrency: int, duration: float) -> tuple[int, int, list[float]]:
+    """Нагрузка из одного процесса: (успешные запросы, ошибки, задержки в секундах)."""
+    ok = errors = 0
+    latencies = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal ok, errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.get(url, headers=headers)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if response.status_code < 400:
+                ok += 1
+            else:
+                errors += 1
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return ok, errors, latencies
+
+
+def _load_process(args: tuple) -> tuple[int, int, list[float]]:
+    return asyncio.run(_load(*args))
+
+
+def _wait_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Сервер не ответил за {timeout} с")
+
+
+def _percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else float("nan")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк пропускной способности по числу воркеров.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Варианты числа воркеров.")
+    parser.add_argument("--port", type=int, default=8765, help="Порт запускаемого сервера.")
+    parser.add_argument("--url", help="Адрес уже запущенного сервера (тогда --workers не используется).")
+    parser.add_argument("--path", default="/", help="Путь нагружаемого эндпоинта.")
+    parser.add_argument("--header", action="append", default=[], help="Заголовок запроса 'Имя: значение'.")
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Количество процессов-генераторов нагрузки.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Одновременных запросов на процесс.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность нагрузки, секунд.")
+    args = parser.parse_args(argv)
+    headers = dict(header.split(": ", 1) for header in args.header)
+
+    variants = [None] if args.url else args.workers
+    print(f"{'воркеры':>8}{'запросов/с':>14}{'ошибок':>10}{'p50, мс':>10}{'p99, мс':>10}{'ускорение':>11}")
+    baseline = None
+    for workers in variants:
+        base_url = args.url or f"http://127.0.0.1:{args.port}"
+        server = None
+        if workers is not None:
+            env = dict(os.environ, SERVER_WORKERS=str(workers), SERVER_PORT=str(args.port),
+                       SERVER_HOST="127.0.0.1", BACKGROUND_JOBS_ENABLED="false")
+            server = subprocess.Popen([sys.executable, "-m", "app.server"], env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_ready(base_url + args.path)
+            with multiprocessing.Pool(args.clients) as pool:
+                results = pool.map(_load_process, [
+                    (base_url + args.path, headers, args.concurrency, args.duration)
+                ] * args.clients)
+        finally:
+            if server is not None:
+                server.send_signal(signal.SIGTERM)
+                server.wait()
+        ok = sum(result[0] for result in results)
+        errors = sum(result[1] for result in results)
+        latencies = [latency for result in results for latency in result[2]]
+        throughput = ok / args.duration
+        baseline = baseline or throughput
+        print(f"{workers or '-':>8}{throughput:>14,.0f}{errors:>10}{_percentile(latencies, 0.5) * 1e3:>10.1f}"
+              f"{_percentile(latencies, 0.99) * 1e3:>10.1f}{throughput / baseline:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,361 @@
 """
-Скрипт для заполнения базы данных тестовыми данными.
+Генератор синтетических данных для заполнения базы данных.
+
+Создает пользователей, организации, чеки с товарными позициями, накладные
+и связи чеков с накладными в объемах, достаточных для нагрузочного
+тестирования (вплоть до 10^8 товарных позиций).
+
+Особенности:
+- Воспроизводимость: все данные детерминированно выводятся из `--seed`.
+  Чеки генерируются порциями (chunk) фиксированного размера, и каждая
+  порция использует собственный генератор случайных чисел, поэтому
+  результат не зависит от количества воркеров.
+- Реалистичные распределения: популярность пользователей и организаций
+  подчиняется закону Ципфа, типы товаров взвешены по категориям,
+  время покупок учитывает день недели и час суток, часть чеков
+  привязывается к накладным (с небольшой долей расхождений сумм).
+- Скорость: порции записываются параллельными процессами через
+  `COPY` (asyncpg `copy_records_to_table`).
+
+Пример запуска:
+    python -m scripts.populate_db --checks 20000000 --workers 8 --seed 42
 """
+import argparse
 import asyncio
-from datetime import datetime
+import bisect
+import functools
+import itertools
+import logging
+import multiprocessing
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, UTC
 from decimal import Decimal
 
-from app.db.session import get_db
-from app.crud import crud_check
-from app.schemas.check import UserCreate, OrganizationCreate, InvoiceCreate, CheckCreate, ItemCreate
+import asyncpg
 
+from app.core.config import settings
+from app.core.logging import setup_logging
+from app.core.security import get_password_hash
+from app.services.reference_cache import INVALIDATE_ALL, REFERENCE_CACHE_CHANNEL
+from scripts.rebuild_stats import rebuild_all_stats
 
-async def main():
-    """Главная функция для заполнения базы данных."""
-    print("Начинаем заполнение базы данных...")
-    db = await anext(get_db())
+logger = logging.getLogger(__name__)
+
+# Каталог товаров: тип товара -> список (название, базовая цена в копейках, весовой ли товар).
+# Типы согласованы с категориями из аналитики `items_by_category`.
+ITEM_CATALOG = {
+    1: [("Хлеб", 5000, False), ("Батон нарезной", 4500, False), ("Булочка с маком", 3500, False)],
+    2: [("Молоко 3.2%", 8900, False), ("Кефир", 7900, False), ("Сыр российский", 79900, True),
+        ("Творог 5%", 11900, False)],
+    3: [("Яблоки", 12900, True), ("Бананы", 10900, True), ("Картофель", 4900, True), ("Огурцы", 19900, True)],
+    4: [("Курица охлажденная", 28900, True), ("Фарш говяжий", 59900, True), ("Колбаса докторская", 69900, True)],
+    5: [("Чай черный", 14900, False), ("Кофе молотый", 44900, False), ("Сок яблочный", 12900, False),
+        ("Вода минеральная", 5900, False)],
+    7: [("Шампунь", 34900, False), ("Зубная паста", 15900, False), ("Мыло", 6900, False)],
+    9: [("Батарейки AA", 29900, False), ("Пакет", 900, False), ("Зажигалка", 4900, False)],
+    12: [("Консультация юриста", 250000, False), ("Консультация врача", 180000, False)],
+    13: [("Стрижка", 90000, False), ("Маникюр", 150000, False)],
+    14: [("Доставка", 29900, False)],
+    15: [("Ремонт обуви", 60000, False), ("Химчистка", 120000, False)],
+    16: [("Парковка", 15000, False)],
+    17: [("Мойка автомобиля", 80000, False)],
+    26: [("Пиво светлое", 11900, False), ("Вино красное", 69900, False), ("Водка", 49900, False)],
+}
+
+# Относительные веса типов товаров: продукты встречаются чаще всего.
+ITEM_TYPE_WEIGHTS = {1: 14, 2: 14, 3: 12, 4: 9, 5: 12, 7: 6, 9: 5, 12: 1, 13: 2, 14: 2, 15: 1, 16: 2, 17: 1, 26: 6}
+
+# Веса часов суток (0..23) и дней недели (пн..вс) для времени покупки.
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 8, 12, 12, 11, 11, 13, 13, 11, 10, 11, 14, 17, 18, 15, 10, 5, 2]
+WEEKDAY_WEIGHTS = [10, 10, 10, 11, 13, 16, 14]
+
+LEGAL_FORMS = ["ООО", "ИП", "АО", "ПАО", "ЗАО"]
+ORG_NAME_PARTS = ["Ромашка", "Луч", "Весна", "Престиж", "Гастроном", "Сервис", "Эталон", "Уют", "Восход", "Лидер"]
+
+MAX_ITEMS_PER_CHECK = 30
+
+
+@dataclass(frozen=True)
+class GenerationPlan:
+    """Параметры генерации, общие для всех воркеров."""
+    seed: int
+    users: int
+    orgs: int
+    checks: int
+    chunk_size: int
+    mean_items: float
+    link_ratio: float
+    mismatch_ratio: float
+    start_date: datetime
+    days: int
+    user_offset: int
+    org_offset: int
+    check_offset: int
+    invoice_offset: int
+    dsn: str
+
+    @property
+    def chunks(self) -> int:
+        """Количество порций чеков."""
+        return (self.checks + self.chunk_size - 1) // self.chunk_size
+
+
+@functools.lru_cache(maxsize=None)
+def _zipf_cum_weights(n: int, s: float) -> tuple[float, ...]:
+    """Кумулятивные веса распределения Ципфа для n элементов (кэшируются на процесс)."""
+    return tuple(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def _pick(rng: random.Random, cum_weights) -> int:
+    """Выбирает индекс по кумулятивным весам за O(log n)."""
+    return bisect.bisect_left(cum_weights, rng.random() * cum_weights[-1])
+
+
+def _money(cents: int) -> Decimal:
+    """Переводит сумму в копейках в Decimal с двумя знаками."""
+    return Decimal(cents).scaleb(-2)
+
+
+class _ChunkGenerator:
+    """Генерирует одну порцию чеков, позиций, накладных и связей."""
+
+    _type_keys = list(ITEM_TYPE_WEIGHTS)
+    _type_cum = list(itertools.accumulate(ITEM_TYPE_WEIGHTS.values()))
+    _hour_cum = list(itertools.accumulate(HOUR_WEIGHTS))
+    _weekday_cum = list(itertools.accumulate(WEEKDAY_WEIGHTS))
+
+    def __init__(self, plan: GenerationPlan, chunk_no: int):
+        self.plan = plan
+        self.chunk_no = chunk_no
+        self.rng = random.Random(plan.seed * 1_000_003 + chunk_no)
+        self.user_cum = _zipf_cum_weights(plan.users, 0.8)
+        self.org_cum = _zipf_cum_weights(plan.orgs, 1.1)
+
+    def _created_at(self) -> datetime:
+        rng = self.rng
+        days = self.plan.days
+        day = rng.randrange(days)
+        # Сдвигаем день так, чтобы распределение по дням недели соответствовало весам.
+        weekday = _pick(rng, self._weekday_cum)
+        day += (weekday - (self.plan.start_date + timedelta(days=day)).weekday()) % 7
+        if day >= days:
+            # Неделей раньше день недели сохраняется; период короче недели — по модулю его длины.
+            day = day - 7 if days >= 7 else day % days
+        moment = self.plan.start_date + timedelta(days=day)
+        return moment + timedelta(hours=_pick(rng, self._hour_cum), seconds=rng.randrange(3600))
+
+    def _items(self, check_id: int) -> tuple[list[tuple], int]:
+        rng = self.rng
+        count = 1 + int(rng.expovariate(1.0 / max(self.plan.mean_items - 1, 0.01)))
+        rows = []
+        total = 0
+        for _ in range(min(count, MAX_ITEMS_PER_CHECK)):
+            item_type = self._type_keys[_pick(rng, self._type_cum)]
+            name, base_price, by_weight = rng.choice(ITEM_CATALOG[item_type])
+            price = int(base_price * rng.uniform(0.85, 1.25))
+            if by_weight:
+                quantity_milli = rng.randint(150, 2500)
+            else:
+                quantity_milli = 1000 * (1 + int(rng.expovariate(1.5)))
+            item_sum = (price * quantity_milli + 500) // 1000
+            total += item_sum
+            rows.append((name, _money(price), item_type, Decimal(quantity_milli).scaleb(-3), _money(item_sum),
+                         check_id))
+        return rows, total
 
-    # --- Создание пользователей ---
-    print("Создаем пользователей...")
-    user1 = await crud_check.create_user(db, user=UserCreate(username="Иван Иванов"))
-    user2 = await crud_check.create_user(db, user=UserCreate(username="Петр Петров"))
+    def generate(self) -> tuple[list[tuple], list[tuple], list[tuple], list[tuple]]:
+        """Возвращает строки для таблиц checks, items, invoices и check_invoices."""
+        plan, rng = self.plan, self.rng
+        first = self.chunk_no * plan.chunk_size
+        size = min(plan.chunk_size, plan.checks - first)
 
-    # --- Создание организаций ---
-    print("Создаем организации...")
-    org1 = await crud_check.create_organization(db, organization=OrganizationCreate(org_name="ООО Ромашка", legal_form="ООО"))
-    org2 = await crud_check.create_organization(db, organization=OrganizationCreate(org_name="ИП Сидоров", legal_form="ИП"))
+        checks, items, invoices, links = [], [], [], []
+        pending: list[tuple[int, int]] = []
+        pending_target = 0
+        # Идентификаторы накладных порции не пересекаются: у накладной всегда есть хотя бы один чек.
+        invoice_id = plan.invoice_offset + first
+
+        def flush_invoice():
+            nonlocal invoice_id
+            invoice_id += 1
+            total = sum(cents for _, cents in pending)
+            if rng.random() < plan.mismatch_ratio:
+                total = max(total + rng.choice((-1, 1)) * rng.randint(1, 50000), 0)
+            invoices.append((invoice_id, _money(total), rng.randint(1, 3), rng.choice(("CARD", "CASH", "SBP"))))
+            links.extend((check_id, invoice_id) for check_id, _ in pending)
+            pending.clear()
+
+        for offset in range(size):
+            check_id = plan.check_offset + first + offset + 1
+            user_id = plan.user_offset + _pick(rng, self.user_cum) + 1
+            org_id = plan.org_offset + _pick(rng, self.org_cum) + 1
+            check_items, total = self._items(check_id)
+            items.extend(check_items)
+            checks.append((check_id, self._created_at(), _money(total), user_id, org_id))
+
+            if rng.random() < plan.link_ratio:
+                if not pending:
+                    pending_target = rng.randint(1, 8)
+                pending.append((check_id, total))
+                if len(pending) >= pending_target:
+                    flush_invoice()
+        if pending:
+            flush_invoice()
+        return checks, items, invoices, links
+
+
+# --- Воркеры -----------------------------------------------------------------
+
+_worker_loop: asyncio.AbstractEventLoop | None = None
+_worker_conn: asyncpg.Connection | None = None
+_worker_plan: GenerationPlan | None = None
+
+
+def _init_worker(plan: GenerationPlan):
+    """Открывает соединение с БД один раз на процесс-воркер."""
+    global _worker_loop, _worker_conn, _worker_plan
+    _worker_plan = plan
+    _worker_loop = asyncio.new_event_loop()
+    _worker_conn = _worker_loop.run_until_complete(asyncpg.connect(plan.dsn))
+
+
+async def _copy_chunk(conn: asyncpg.Connection, rows: tuple[list, list, list, list]):
+    checks, items, invoices, links = rows
+    async with conn.transaction():
+        await conn.copy_records_to_table(
+            "checks", records=checks, columns=["check_id", "created_at", "check_sum", "user_id", "org_id"])
+        await conn.copy_records_to_table(
+            "items", records=items,
+            columns=["item_name", "item_price", "item_type", "item_quantity", "item_sum", "check_id"])
+        await conn.copy_records_to_table(
+            "invoices", records=invoices, columns=["invoice_id", "invoice_sum", "invoice_type", "payment_type"])
+        await conn.copy_records_to_table("check_invoices", records=links, columns=["check_id", "invoice_id"])
+
+
+def _load_chunk(chunk_no: int) -> tuple[int, int, int]:
+    """Генерирует и записывает одну порцию. Возвращает (номер порции, чеков, позиций)."""
+    rows = _ChunkGenerator(_worker_plan, chunk_no).generate()
+    _worker_loop.run_until_complete(_copy_chunk(_worker_conn, rows))
+    return chunk_no, len(rows[0]), len(rows[1])
+
+
+# --- Справочники и подготовка ------------------------------------------------
+
+async def _prepare(conn: asyncpg.Connection, args: argparse.Namespace) -> dict[str, int]:
+    """Очищает таблицы (по запросу) и возвращает текущие максимальные идентификаторы."""
+    if args.truncate:
+        logger.info("Очищаем таблицы...")
+        await conn.execute("TRUNCATE check_invoices, items, item_names, checks, invoices, organizations, users "
+                           "RESTART IDENTITY CASCADE")
+        # ID пользователей и организаций будут выданы заново: кэши справочников работающих воркеров сбрасываются.
+        await conn.execute("SELECT pg_notify($1, $2)", REFERENCE_CACHE_CHANNEL, INVALIDATE_ALL)
+    offsets = {}
+    for table, column in (("users", "user_id"), ("organizations", "org_id"),
+                          ("checks", "check_id"), ("invoices", "invoice_id")):
+        offsets[table] = await conn.fetchval(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+    return offsets
+
+
+async def _create_reference_data(conn: asyncpg.Connection, args: argparse.Namespace, offsets: dict[str, int]):
+    """Создает пользователей и организации."""
+    rng = random.Random(args.seed)
+    # bcrypt дорог, поэтому у всех синтетических пользователей один и тот же пароль.
+    hashed_password = get_password_hash(args.password)
+    users = [(offsets["users"] + n, f"user_{args.seed}_{offsets['users'] + n}", hashed_password)
+             for n in range(1, args.users + 1)]
+    orgs = []
+    for n in range(1, args.orgs + 1):
+        legal_form = rng.choice(LEGAL_FORMS)
+        orgs.append((offsets["organizations"] + n, f"{legal_form} {rng.choice(ORG_NAME_PARTS)}-{n}", legal_form))
+    async with conn.transaction():
+        await conn.copy_records_to_table("users", records=users, columns=["user_id", "username", "hashed_password"])
+        await conn.copy_records_to_table("organizations", records=orgs, columns=["org_id", "org_name", "legal_form"])
+
+
+async def _finalize(conn: asyncpg.Connection):
+    """Сдвигает последовательности после вставки явных идентификаторов и обновляет статистику."""
+    for table, column in (("users", "user_id"), ("organizations", "org_id"),
+                          ("checks", "check_id"), ("invoices", "invoice_id")):
+        await conn.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+            f"GREATEST((SELECT MAX({column}) FROM {table}), 1))"
+        )
+    await conn.execute("ANALYZE users, organizations, checks, items, invoices, check_invoices, "
+                       "user_org_stats, user_daily_stats, org_daily_stats, org_item_daily_stats")
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Генератор синтетических данных для базы чеков.")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора случайных чисел.")
+    parser.add_argument("--users", type=int, default=10_000, help="Количество пользователей.")
+    parser.add_argument("--orgs", type=int, default=500, help="Количество организаций.")
+    parser.add_argument("--checks", type=int, default=100_000, help="Количество чеков.")
+    parser.add_argument("--mean-items", type=float, default=5.0, help="Среднее число позиций в чеке.")
+    parser.add_argument("--link-ratio", type=float, default=0.3, help="Доля чеков, привязанных к накладным.")
+    parser.add_argument("--mismatch-ratio", type=float, default=0.02,
+                        help="Доля накладных, сумма которых не совпадает с суммой чеков.")
+    parser.add_argument("--start-date", type=lambda s: datetime.fromisoformat(s).replace(tzinfo=UTC),
+                        default=datetime(2024, 1, 1, tzinfo=UTC), help="Начало периода (YYYY-MM-DD).")
+    parser.add_argument("--days", type=int, default=365, help="Длительность периода в днях.")
+    parser.add_argument("--chunk-size", type=int, default=20_000, help="Количество чеков в одной порции.")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="Количество параллельных процессов.")
+    parser.add_argument("--password", default="password", help="Пароль синтетических пользователей.")
+    parser.add_argument("--truncate", action="store_true", help="Очистить таблицы перед заполнением.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Главная функция для заполнения базы данных."""
+    setup_logging()
+    args = _parse_args(argv)
+    dsn = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
 
-    # --- Создание накладных ---
-    print("Создаем накладные...")
-    invoice1 = await crud_check.create_invoice(db, invoice=InvoiceCreate(invoice_sum=Decimal("1500.00"), invoice_type=1, payment_type="CARD"))
-    invoice2 = await crud_check.create_invoice(db, invoice=InvoiceCreate(invoice_sum=Decimal("3500.00"), invoice_type=2, payment_type="CASH"))
+    async def prepare() -> dict[str, int]:
+        conn = await asyncpg.connect(dsn)
+        try:
+            offsets = await _prepare(conn, args)
+            logger.info(f"Создаем {args.users} пользователей и {args.orgs} организаций...")
+            await _create_reference_data(conn, args, offsets)
+            return offsets
+        finally:
+            await conn.close()
 
-    # --- Создание чеков ---
-    print("Создаем чеки...")
-    check1_items = [
-        ItemCreate(item_name="Хлеб", item_price=Decimal("50.00"), item_quantity=Decimal("2.000"), item_sum=Decimal("100.00")),
-        ItemCreate(item_name="Молоко", item_price=Decimal("80.00"), item_quantity=Decimal("1.000"), item_sum=Decimal("80.00")),
-    ]
-    check1 = await crud_check.create_check(db, check=CheckCreate(check_sum=Decimal("180.00"), user_id=user1.user_id, org_id=org1.org_id, items=check1_items))
+    offsets = asyncio.run(prepare())
+    plan = GenerationPlan(
+        seed=args.seed, users=args.users, orgs=args.orgs, checks=args.checks, chunk_size=args.chunk_size,
+        mean_items=args.mean_items, link_ratio=args.link_ratio, mismatch_ratio=args.mismatch_ratio,
+        start_date=args.start_date, days=args.days, user_offset=offsets["users"],
+        org_offset=offsets["organizations"], check_offset=offsets["checks"], invoice_offset=offsets["invoices"],
+        dsn=dsn,
+    )
 
-    check2_items = [
-        ItemCreate(item_name="Консультация юриста", item_price=Decimal("2500.00"), item_quantity=Decimal("1.000"), item_sum=Decimal("2500.00")),
-    ]
-    check2 = await crud_check.create_check(db, check=CheckCreate(check_sum=Decimal("2500.00"), user_id=user2.user_id, org_id=org2.org_id, items=check2_items))
+    logger.info(f"Генерируем {plan.checks} чеков порциями по {plan.chunk_size} в {args.workers} процессах...")
+    started = time.perf_counter()
+    total_checks = total_items = 0
+    with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(plan,)) as pool:
+        for done, (_, checks, items) in enumerate(pool.imap_unordered(_load_chunk, range(plan.chunks)), start=1):
+            total_checks += checks
+            total_items += items
+            elapsed = time.perf_counter() - started
+            logger.info(f"Порция {done}/{plan.chunks}: {total_checks} чеков, {total_items} позиций "
+                        f"({total_items / elapsed:,.0f} позиций/с)")
 
-    # --- Связывание чеков с накладными ---
-    print("Связываем чеки с накладными...")
-    await crud_check.link_check_to_invoice(db, check_id=check1.check_id, invoice_id=invoice1.invoice_id)
-    await crud_check.link_check_to_invoice(db, check_id=check2.check_id, invoice_id=invoice2.invoice_id)
+    async def finalize():
+        # COPY не обновляет накопленные итоги и скетчи, поэтому они пересчитываются целиком.
+        logger.info("Пересчитываем итоги пользователей и организаций...")
+        await rebuild_all_stats()
+        conn = await asyncpg.connect(dsn)
+        try:
+            await _finalize(conn)
+        finally:
+            await conn.close()
 
-    print("Заполнение базы данных завершено.")
+    asyncio.run(finalize())
+    logger.info(f"Заполнение базы данных завершено за {time.perf_counter() - started:.1f}с.")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -0,0 +1,45 @@
+"""
+Пересчет накопленных итогов и скетчей по всем чекам.
+
+Нужен после загрузки данных в обход API (например, через COPY) и после
+миграций, добавляющих новые итоги: пересчитывает итоги пользователей
+(`user_org_stats`, `user_daily_stats`) и организаций (`org_daily_stats`
+со скетчами покупателей, `org_item_daily_stats`) и пополняет словарь
+названий позиций для поиска (`item_names`).
+
+Запуск:
+    python -m scripts.rebuild_stats
+"""
+import asyncio
+import logging
+import time
+
+from app.core.logging import setup_logging
+from app.crud import crud_item, crud_org_stats, crud_user_stats
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild_all_stats():
+    """Пересчитывает все итоги в отдельной сессии."""
+    async with AsyncSessionLocal() as session:
+        started = time.perf_counter()
+        await crud_user_stats.rebuild_user_stats(session)
+        logger.info(f"Итоги пользователей пересчитаны за {time.perf_counter() - started:.1f}с.")
+        started = time.perf_counter()
+        await crud_org_stats.rebuild_org_stats(session)
+        logger.info(f"Итоги организаций пересчитаны за {time.perf_counter() - started:.1f}с.")
+        started = time.perf_counter()
+        await crud_item.rebuild_item_names(session)
+        logger.info(f"Словарь названий позиций пополнен за {time.perf_counter() - started:.1f}с.")
+
+
+def main():
+    """Главная функция пересчета итогов."""
+    setup_logging()
+    asyncio.run(rebuild_all_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,10 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql import text
 
 from app.core.config import settings
-from app.db.session import Base, get_db
+from app.core.rate_limit import LocalRateLimitStore, rate_limiter
+from app.db.session import Base, get_db, get_session_opener
 from app.main import app
+from app.services.reference_cache import invalidate_all_references
 
 # Устанавливаем флаг тестирования
 settings.TESTING = True
@@ -35,6 +37,18 @@ async def setup_database():
     await engine.dispose()
 
 
+@pytest.fixture(autouse=True)
+def local_rate_limits():
+    """Лимиты частоты запросов в памяти процесса, свои для каждого теста."""
+    rate_limiter.store = LocalRateLimitStore(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+
+@pytest.fixture(autouse=True)
+def empty_reference_caches():
+    """Таблицы пересоздаются для каждого теста, поэтому кэш справочников тоже очищается."""
+    invalidate_all_references()
+
+
 @pytest_asyncio.fixture(scope="function")
 async def db_session():
     """
@@ -63,6 +77,8 @@ async def db_session():
             yield session
 
     app.dependency_overrides[get_db] = override_get_db
+    # Потоковые ответы открывают сессии сами, тоже в тестовой базе.
+    app.dependency_overrides[get_session_opener] = lambda: lambda **kwargs: TestingSessionLocal()
 
     # Передаем саму сессию, чтобы можно было подготовить данные перед тестом
     async with TestingSessionLocal() as session:
@@ -78,6 +94,7 @@ async def db_session():
 
     # 6. Удаляем переопределение
     del app.dependency_overrides[get_db]
+    del app.dependency_overrides[get_session_opener]
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -0,0 +1,103 @@
+"""
+Тесты контроля допуска: классы маршрутов, очередь с ограничением времени и AIMD-лимиты.
+"""
+import asyncio
+
+import pytest
+
+from app.core.admission import (
+    AdaptiveLimiter,
+    AdmissionControlMiddleware,
+    AdmissionController,
+    AdmissionRejected,
+    route_class,
+)
+from app.core.config import AdmissionClassSettings
+
+pytestmark = pytest.mark.asyncio
+
+
+def _config(**overrides) -> AdmissionClassSettings:
+    values = dict(max_concurrency=2, latency_target_ms=100, queue_timeout_seconds=0.05, max_queue=1)
+    values.update(overrides)
+    return AdmissionClassSettings(**values)
+
+
+async def test_route_classes():
+    """Тест распределения маршрутов по классам."""
+    assert route_class("POST", "/api/v1/checks/") == "ingestion"
+    assert route_class("POST", "/api/v1/login/token") == "login"
+    assert route_class("GET", "/api/v1/analysis/top_items") == "analytics"
+    assert route_class("GET", "/api/v1/users/1/summary") == "analytics"
+    assert route_class("GET", "/api/v1/checks/1") == "reads"
+    assert route_class("GET", "/health/ready") is None
+
+
+async def test_queue_timeout_and_full_queue_reject():
+    """Тест отказа по истечении времени в очереди и при заполненной очереди."""
+    limiter = AdaptiveLimiter("reads", _config(max_concurrency=1))
+    await limiter.acquire()
+
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected):
+        await limiter.acquire()  # очередь из одного места уже занята
+    with pytest.raises(AdmissionRejected):
+        await waiting
+    assert limiter.queued == 0 and limiter.in_flight == 1 and limiter.rejected_total == 2
+
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    limiter.release()
+    await waiting
+    assert limiter.in_flight == 1 and limiter.admitted_total == 2
+
+
+async def test_aimd_limit():
+    """Тест снижения лимита при медленной базе и постепенного роста при быстрой."""
+    limiter = AdaptiveLimiter("analytics", _config(max_concurrency=10, latency_target_ms=1000))
+    await limiter.acquire()
+    limiter.release(latency=5)
+    assert limiter.limit == 8
+    await limiter.acquire()
+    limiter.release(latency=5)  # повторное снижение в пределах того же окна не применяется
+    assert limiter.limit == 8
+    await limiter.acquire()
+    limiter.release(latency=0.01)
+    assert 8 < limiter.limit < 9
+
+
+async def test_middleware_rejects_with_retry_after():
+    """Тест ответа 503 с Retry-After для запроса, не дождавшегося места."""
+    controller = AdmissionController({"ingestion": _config(max_concurrency=1, max_queue=0)})
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        scope["state"]["db_seconds"] = 0.01
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = AdmissionControlMiddleware(app, controller)
+
+    async def call(messages: list):
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware({"type": "http", "method": "POST", "path": "/api/v1/checks/"}, receive, send)
+
+    first: list = []
+    request = asyncio.create_task(call(first))
+    await asyncio.sleep(0)
+    rejected: list = []
+    await call(rejected)
+    assert rejected[0]["status"] == 503
+    assert (b"retry-after", b"1") in rejected[0]["headers"]
+
+    release.set()
+    await request
+    assert first[0]["status"] == 201
+    assert controller.metrics()["ingestion"]["in_flight"] == 0
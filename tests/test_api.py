@@ -1,12 +1,16 @@
 """
 Тесты для API.
 """
+from decimal import Decimal
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.crud import crud_user, crud_organization, crud_invoice, crud_check
+from app.crud import crud_user, crud_organization, crud_invoice, crud_check, crud_org_stats
 from app.schemas.check import UserCreate, OrganizationCreate, InvoiceCreate, CheckCreate, ItemCreate
+from app.services.db_health import db_health
 
 pytestmark = pytest.mark.asyncio
 
@@ -121,7 +125,7 @@ async def test_create_invoice(client: AsyncClient, db_session: AsyncSession):
     )
     assert response.status_code == 201
     data = response.json()
-    assert data["invoice_sum"] == 1000
+    assert Decimal(data["invoice_sum"]) == 1000
 
 
 async def test_read_invoices(client: AsyncClient, db_session: AsyncSession):
@@ -148,7 +152,7 @@ async def test_read_invoice(client: AsyncClient, db_session: AsyncSession):
     )
     assert response.status_code == 200
     data = response.json()
-    assert data["invoice_sum"] == 3000
+    assert Decimal(data["invoice_sum"]) == 3000
 
 
 # --- Тесты для чеков ---
@@ -177,7 +181,7 @@ async def test_create_check(client: AsyncClient, db_session: AsyncSession):
     )
     assert response.status_code == 201
     data = response.json()
-    assert data["check_sum"] == 500
+    assert Decimal(data["check_sum"]) == 500
 
 
 async def test_read_checks(client: AsyncClient, db_session: AsyncSession):
@@ -214,7 +218,7 @@ async def test_read_check(client: AsyncClient, db_session: AsyncSession):
     )
     assert response.status_code == 200
     data = response.json()
-    assert data["check_sum"] == 1500
+    assert Decimal(data["check_sum"]) == 1500
 
 
 # --- Тесты для фильтрации и сортировки ---
@@ -253,5 +257,438 @@ async def test_sort_checks_by_sum(client: AsyncClient, db_session: AsyncSession)
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 2
-    assert data[0]["check_sum"] == 200
-    assert data[1]["check_sum"] == 100
+    assert Decimal(data[0]["check_sum"]) == 200
+    assert Decimal(data[1]["check_sum"]) == 100
+
+
+# --- Тесты для связывания чеков с накладными ---
+
+async def test_link_checks_to_invoice_batch(client: AsyncClient, db_session: AsyncSession):
+    """Тест пакетного связывания чеков с накладной."""
+    token = await create_user_and_get_token(client, db_session, "link_user", "link_password")
+    org = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Link Org"))
+    user = await crud_user.create_user(db_session, UserCreate(username="link_test_user", password="password"))
+    check1 = await crud_check.create_check(db_session,
+                                           CheckCreate(check_sum=100, user_id=user.user_id, org_id=org.org_id))
+    check2 = await crud_check.create_check(db_session,
+                                           CheckCreate(check_sum=200, user_id=user.user_id, org_id=org.org_id))
+    invoice = await crud_invoice.create_invoice(db_session, InvoiceCreate(invoice_sum=300))
+    await crud_check.link_check_to_invoice(db_session, check_id=check1.check_id, invoice_id=invoice.invoice_id)
+
+    response = await client.post(
+        f"/api/v1/invoices/{invoice.invoice_id}/checks",
+        json=[check1.check_id, check2.check_id, 999999],
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert [row["status"] for row in response.json()] == ["already_linked", "linked", "check_not_found"]
+
+    response = await client.post(
+        "/api/v1/invoices/links",
+        json=[{"check_id": check2.check_id, "invoice_id": 999999}],
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert response.json()[0]["status"] == "invoice_not_found"
+
+
+async def test_invoice_reconciliation(client: AsyncClient, db_session: AsyncSession):
+    """Тест сверки сумм накладных с суммами привязанных чеков."""
+    token = await create_user_and_get_token(client, db_session, "reconcile_user", "reconcile_password")
+    org = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Reconcile Org"))
+    user = await crud_user.create_user(db_session, UserCreate(username="reconcile_test_user", password="password"))
+    check = await crud_check.create_check(db_session,
+                                          CheckCreate(check_sum=100, user_id=user.user_id, org_id=org.org_id))
+    matched = await crud_invoice.create_invoice(db_session, InvoiceCreate(invoice_sum=100))
+    mismatched = await crud_invoice.create_invoice(db_session, InvoiceCreate(invoice_sum=250))
+    await crud_check.link_checks_to_invoices(db_session, [(check.check_id, matched.invoice_id),
+                                                          (check.check_id, mismatched.invoice_id)])
+
+    response = await client.post("/api/v1/invoices/reconciliation", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["discrepancies"] == 1
+
+    response = await client.get("/api/v1/invoices/reconciliation", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 1
+    assert data["items"][0]["invoice_id"] == mismatched.invoice_id
+    assert Decimal(data["items"][0]["difference"]) == 150
+
+
+async def test_read_invoice_with_checks(client: AsyncClient, db_session: AsyncSession):
+    """Тест получения накладной с привязанными чеками постранично."""
+    token = await create_user_and_get_token(client, db_session, "invoice_checks_user", "password")
+    org = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Invoice Checks Org"))
+    user = await crud_user.create_user(db_session, UserCreate(username="invoice_checks_test", password="password"))
+    invoice = await crud_invoice.create_invoice(db_session, InvoiceCreate(invoice_sum=300))
+    for check_sum in (100, 200):
+        check = await crud_check.create_check(db_session, CheckCreate(
+            check_sum=check_sum, user_id=user.user_id, org_id=org.org_id,
+            items=[ItemCreate(item_name="Item", item_price=check_sum, item_quantity=1, item_sum=check_sum)]
+        ))
+        await crud_check.link_check_to_invoice(db_session, check_id=check.check_id, invoice_id=invoice.invoice_id)
+
+    response = await client.get(
+        f"/api/v1/invoices/{invoice.invoice_id}/checks?limit=1&include_items=true",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_checks"] == 2
+    assert len(data["checks"]) == 1
+    assert data["checks"][0]["items"][0]["item_name"] == "Item"
+
+    response = await client.get(
+        f"/api/v1/invoices/{invoice.invoice_id}/checks?after_check_id={data['next_after_check_id']}",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    data = response.json()
+    assert [Decimal(check["check_sum"]) for check in data["checks"]] == [200]
+    assert data["checks"][0]["items"] is None
+    assert data["next_after_check_id"] is None
+
+
+async def test_create_check_idempotent(client: AsyncClient, db_session: AsyncSession):
+    """Тест повторного создания чека с тем же ключом идемпотентности."""
+    token = await create_user_and_get_token(client, db_session, "idempotency_user", "password")
+    org = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Idempotency Org"))
+    user = await crud_user.create_user(db_session, UserCreate(username="idempotency_test", password="password"))
+    payload = {"check_sum": 500, "user_id": user.user_id, "org_id": org.org_id,
+               "items": [{"item_name": "Test Item", "item_price": 500, "item_quantity": 1, "item_sum": 500}]}
+    headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "pos-1-retry-key"}
+
+    first = await client.post("/api/v1/checks/", json=payload, headers=headers)
+    second = await client.post("/api/v1/checks/", json=payload, headers=headers)
+    assert first.status_code == second.status_code == 201
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json() == first.json()
+    assert len(await crud_check.get_checks(db_session, user_id=user.user_id)) == 1
+
+    conflict = await client.post("/api/v1/checks/", json={**payload, "check_sum": 600}, headers=headers)
+    assert conflict.status_code == 422
+
+
+async def test_create_checks_bulk_validates_totals(client: AsyncClient, db_session: AsyncSession):
+    """Тест пакетного создания чеков с проверкой сумм."""
+    token = await create_user_and_get_token(client, db_session, "bulk_user", "bulk_password")
+    org = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Bulk Org"))
+    user = await crud_user.create_user(db_session, UserCreate(username="bulk_test_user", password="password"))
+    valid = {"check_sum": 100, "user_id": user.user_id, "org_id": org.org_id,
+             "items": [{"item_name": "Хлеб", "item_price": 50, "item_quantity": 2, "item_sum": 100}]}
+    invalid = {"check_sum": 90, "user_id": user.user_id, "org_id": org.org_id,
+               "items": [{"item_name": "Молоко", "item_price": 80, "item_quantity": 1, "item_sum": 85}]}
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await client.post("/api/v1/checks/bulk", json=[valid, invalid], headers=headers)
+    assert response.status_code == 422
+    locs = [error["loc"] for error in response.json()["detail"]]
+    assert locs == [["body", 1, "items", 0, "item_sum"], ["body", 1, "check_sum"]]
+
+    response = await client.post("/api/v1/checks/bulk", json=[valid, valid], headers=headers)
+    assert response.status_code == 201
+    assert len(response.json()["check_ids"]) == 2
+
+
+async def test_read_checks_batch(client: AsyncClient, db_session: AsyncSession):
+    """Тест получения чеков, пользователей и организаций по списку ID."""
+    token = await create_user_and_get_token(client, db_session, "batch_user", "password")
+    headers = {"Authorization": f"Bearer {token}"}
+    user = await crud_user.create_user(db_session, UserCreate(username="batch_test_user", password="password"))
+    org = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Batch Org"))
+    first, second = await crud_check.create_checks_bulk(db_session, [
+        CheckCreate(check_sum=10, user_id=user.user_id, org_id=org.org_id, items=[
+            ItemCreate(item_name="Чай", item_price=10, item_quantity=1, item_sum=10),
+        ]),
+        CheckCreate(check_sum=20, user_id=user.user_id, org_id=org.org_id),
+    ])
+
+    response = await client.get(f"/api/v1/checks/batch?ids={second},999999,{first},{second}", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [check["check_id"] for check in data["items"]] == [second, first]
+    assert data["items"][1]["items"][0]["item_name"] == "Чай"
+    assert data["items"][0]["organization"]["org_name"] == "Batch Org"
+    assert data["missing_ids"] == [999999]
+
+    response = await client.get(f"/api/v1/users/batch?ids={user.user_id},999999", headers=headers)
+    assert [u["username"] for u in response.json()["items"]] == ["batch_test_user"]
+    response = await client.get(f"/api/v1/organizations/batch?ids=999999,{org.org_id}", headers=headers)
+    assert response.json() == {"items": [{"org_name": "Batch Org", "legal_form": None, "org_id": org.org_id}],
+                               "missing_ids": [999999]}
+
+    response = await client.get("/api/v1/checks/batch?ids=1,abc", headers=headers)
+    assert response.status_code == 422
+
+
+async def test_search_items(client: AsyncClient, db_session: AsyncSession):
+    """Тест полнотекстового и нечеткого поиска позиций по названию."""
+    token = await create_user_and_get_token(client, db_session, "search_user", "password")
+    org = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Search Org"))
+    other_org = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Other Org"))
+    user = await crud_user.create_user(db_session, UserCreate(username="search_test", password="password"))
+    for org_id, name in ((org.org_id, "Молоко 3.2%"), (org.org_id, "Хлеб бородинский"),
+                         (other_org.org_id, "Молоко топленое")):
+        await crud_check.create_check(db_session, CheckCreate(
+            check_sum=100, user_id=user.user_id, org_id=org_id,
+            items=[ItemCreate(item_name=name, item_price=100, item_quantity=1, item_sum=100)]
+        ))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await client.get("/api/v1/items/search?q=молока", headers=headers)
+    assert response.status_code == 200
+    assert sorted(item["item_name"] for item in response.json()["items"]) == ["Молоко 3.2%", "Молоко топленое"]
+
+    # Постранично по одной позиции: курсор проходит по всем названиям без повторов.
+    found, params = [], {"q": "молока", "limit": 1}
+    while True:
+        page = (await client.get("/api/v1/items/search", params=params, headers=headers)).json()
+        found += [item["item_name"] for item in page["items"]]
+        if page["next_after_item_id"] is None:
+            break
+        params.update(after_item_name=page["next_after_item_name"], after_item_id=page["next_after_item_id"])
+    assert sorted(found) == ["Молоко 3.2%", "Молоко топленое"]
+
+    response = await client.get(f"/api/v1/items/search?q=бородинскй&org_id={org.org_id}", headers=headers)
+    assert [item["item_name"] for item in response.json()["items"]] == ["Хлеб бородинский"]
+
+    response = await client.get(f"/api/v1/items/search?q=молоко&org_id={other_org.org_id}", headers=headers)
+    assert [item["item_name"] for item in response.json()["items"]] == ["Молоко топленое"]
+
+    response = await client.get("/api/v1/items/search?q=молоко&after_item_id=1", headers=headers)
+    assert response.status_code == 422
+
+
+async def test_read_user_summary(client: AsyncClient, db_session: AsyncSession):
+    """Тест сводки покупок пользователя по накопленным итогам."""
+    token = await create_user_and_get_token(client, db_session, "summary_user", "password")
+    shop = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Shop"))
+    cafe = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Cafe"))
+    user = await crud_user.create_user(db_session, UserCreate(username="summary_test", password="password"))
+    await crud_check.create_check(db_session, CheckCreate(check_sum=100, user_id=user.user_id, org_id=shop.org_id))
+    await crud_check.create_checks_bulk(db_session, [
+        CheckCreate(check_sum=200, user_id=user.user_id, org_id=shop.org_id),
+        CheckCreate(check_sum=50, user_id=user.user_id, org_id=cafe.org_id),
+    ])
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await client.get(f"/api/v1/users/{user.user_id}/summary", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["checks_count"] == 3
+    assert Decimal(data["total_sum"]) == 350
+    assert [(org["org_name"], org["checks_count"], Decimal(org["total_sum"])) for org in data["top_organizations"]] == [
+        ("Shop", 2, 300), ("Cafe", 1, 50)
+    ]
+
+    response = await client.get(f"/api/v1/users/{user.user_id}/summary?start_date=2000-01-01&end_date=2000-12-31",
+                                headers=headers)
+    assert response.json()["checks_count"] == 0
+    assert response.json()["top_organizations"] == []
+
+
+async def test_checks_by_user_for_period_pagination(client: AsyncClient, db_session: AsyncSession):
+    """Тест постраничной и потоковой выдачи чеков пользователя за период."""
+    token = await create_user_and_get_token(client, db_session, "period_user", "password")
+    org = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Period Org"))
+    user = await crud_user.create_user(db_session, UserCreate(username="period_test", password="password"))
+    await crud_check.create_check(db_session, CheckCreate(check_sum=100, user_id=user.user_id, org_id=org.org_id))
+    await crud_check.create_check(db_session, CheckCreate(
+        check_sum=50, user_id=user.user_id, org_id=org.org_id,
+        items=[ItemCreate(item_name="Кефир", item_price=50, item_quantity=1, item_sum=50)]
+    ))
+    headers = {"Authorization": f"Bearer {token}"}
+    period = "start_date=2000-01-01&end_date=2100-01-01"
+
+    response = await client.get(f"/api/v1/users/{user.user_id}/checks_by_date?{period}&limit=1", headers=headers)
+    assert response.status_code == 200
+    page = response.json()
+    assert [Decimal(check["check_sum"]) for check in page["checks"]] == [50]
+    assert page["checks"][0]["items"][0]["item_name"] == "Кефир"
+
+    response = await client.get(
+        f"/api/v1/users/{user.user_id}/checks_by_date", headers=headers,
+        params={"start_date": "2000-01-01", "end_date": "2100-01-01", "limit": 1,
+                "after_created_at": page["next_after_created_at"], "after_check_id": page["next_after_check_id"]}
+    )
+    assert [(Decimal(check["check_sum"]), check["items"]) for check in response.json()["checks"]] == [(100, [])]
+
+    response = await client.get(f"/api/v1/users/{user.user_id}/checks_by_date/stream?{period}", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert len(response.text.splitlines()) == 2
+
+
+async def test_top_items_and_organizations(client: AsyncClient, db_session: AsyncSession):
+    """Тест отчетов "топ товаров" и "топ организаций" по итогам и в точном режиме."""
+    token = await create_user_and_get_token(client, db_session, "top_user", "password")
+    shop = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Top Shop"))
+    kiosk = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Top Kiosk"))
+    user = await crud_user.create_user(db_session, UserCreate(username="top_test", password="password"))
+    await crud_check.create_checks_bulk(db_session, [
+        CheckCreate(check_sum=300, user_id=user.user_id, org_id=shop.org_id, items=[
+            ItemCreate(item_name="Сыр", item_price=200, item_quantity=1, item_sum=200),
+            ItemCreate(item_name="Хлеб", item_price=50, item_quantity=2, item_sum=100),
+        ]),
+        CheckCreate(check_sum=50, user_id=user.user_id, org_id=kiosk.org_id, items=[
+            ItemCreate(item_name="Хлеб", item_price=50, item_quantity=1, item_sum=50),
+        ]),
+    ])
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await client.get("/api/v1/analysis/top_items", headers=headers)
+    assert response.json() == {"mode": "rollup", "pending_checks": 2, "items": []}
+    response = await client.get(f"/api/v1/analysis/top_items?org_id={kiosk.org_id}", headers=headers)
+    assert response.json()["pending_checks"] == 1
+
+    assert await crud_org_stats.refresh_org_stats(db_session) == 2
+    response = await client.get("/api/v1/analysis/top_items?order_by=quantity", headers=headers)
+    data = response.json()
+    assert data["pending_checks"] == 0
+    assert [(item["item_name"], Decimal(item["total_quantity"])) for item in data["items"]] == [("Хлеб", 3), ("Сыр", 1)]
+
+    exact = await client.get("/api/v1/analysis/top_items?order_by=quantity&exact=true", headers=headers)
+    assert exact.json()["items"] == data["items"]
+
+    response = await client.get(f"/api/v1/analysis/top_items?org_id={kiosk.org_id}", headers=headers)
+    assert [item["item_name"] for item in response.json()["items"]] == ["Хлеб"]
+
+    response = await client.get("/api/v1/analysis/top_organizations", headers=headers)
+    assert [(org["org_name"], Decimal(org["total_revenue"])) for org in response.json()["organizations"]] == [
+        ("Top Shop", 300), ("Top Kiosk", 50)
+    ]
+
+
+async def test_distinct_buyers(client: AsyncClient, db_session: AsyncSession):
+    """Тест оценки количества уникальных покупателей по дневным скетчам."""
+    token = await create_user_and_get_token(client, db_session, "buyers_user", "password")
+    org = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Buyers Org"))
+    first = await crud_user.create_user(db_session, UserCreate(username="buyer_one", password="password"))
+    second = await crud_user.create_user(db_session, UserCreate(username="buyer_two", password="password"))
+    await crud_check.create_checks_bulk(db_session, [
+        CheckCreate(check_sum=10, user_id=user_id, org_id=org.org_id)
+        for user_id in (first.user_id, first.user_id, second.user_id)
+    ])
+    await crud_org_stats.refresh_org_stats(db_session)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await client.get(f"/api/v1/analysis/distinct_buyers?org_id={org.org_id}", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["mode"] == "sketch"
+    assert data["distinct_buyers"] == 2
+    assert data["pending_checks"] == 0
+
+    response = await client.get(f"/api/v1/analysis/distinct_buyers?org_id={org.org_id}&exact=true", headers=headers)
+    assert response.json()["distinct_buyers"] == 2
+
+
+async def test_check_sum_distribution(client: AsyncClient, db_session: AsyncSession):
+    """Тест квантилей и гистограммы сумм чеков по скетчам и в точном режиме."""
+    token = await create_user_and_get_token(client, db_session, "distribution_user", "password")
+    org = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Distribution Org"))
+    user = await crud_user.create_user(db_session, UserCreate(username="distribution_test", password="password"))
+    await crud_check.create_checks_bulk(db_session, [
+        CheckCreate(check_sum=check_sum, user_id=user.user_id, org_id=org.org_id) for check_sum in range(1, 101)
+    ])
+    await crud_org_stats.refresh_org_stats(db_session)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await client.get(f"/api/v1/analysis/check_sum_distribution?org_id={org.org_id}&bins=5",
+                                headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["count"], data["min"], data["max"]) == (100, 1, 100)
+    assert data["p50"] == pytest.approx(50.5, rel=0.02)
+    assert data["p99"] == pytest.approx(99, rel=0.02)
+    assert sum(interval["count"] for interval in data["histogram"]) == 100
+
+    response = await client.get(f"/api/v1/analysis/check_sum_distribution?org_id={org.org_id}&bins=5&exact=true",
+                                headers=headers)
+    exact = response.json()
+    assert exact["p50"] == 50.5
+    assert sum(interval["count"] for interval in exact["histogram"]) == 100
+
+
+async def test_export_checks_incremental(client: AsyncClient, db_session: AsyncSession):
+    """Тест выгрузки чеков в Arrow IPC: инкрементальная выгрузка содержит только новые чеки."""
+    pyarrow = pytest.importorskip("pyarrow")
+    token = await create_user_and_get_token(client, db_session, "export_user", "password")
+    org = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="Export Shop"))
+    user = await crud_user.create_user(db_session, UserCreate(username="export_test", password="password"))
+    await crud_check.create_check(db_session, CheckCreate(check_sum=10, user_id=user.user_id, org_id=org.org_id))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await client.get("/api/v1/export/checks", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    snapshot = response.headers["X-Export-Snapshot"]
+    table = pyarrow.ipc.open_stream(response.content).read_all()
+    assert 10 in table.column("check_sum").to_pylist()
+
+    check = await crud_check.create_check(
+        db_session, CheckCreate(check_sum=20, user_id=user.user_id, org_id=org.org_id,
+                                items=[ItemCreate(item_name="Кефир", item_price=20, item_quantity=1, item_sum=20)])
+    )
+    response = await client.get("/api/v1/export/checks", params={"since": snapshot}, headers=headers)
+    assert pyarrow.ipc.open_stream(response.content).read_all().column("check_id").to_pylist() == [check.check_id]
+    response = await client.get("/api/v1/export/items", params={"since": snapshot}, headers=headers)
+    table = pyarrow.ipc.open_stream(response.content).read_all()
+    assert table.column("item_name").to_pylist() == ["Кефир"]
+
+
+async def test_health_probes(client: AsyncClient, db_session: AsyncSession, monkeypatch):
+    """Тест проб живости и готовности (готовность — по результату фоновой проверки)."""
+    response = await client.get("/health/live")
+    assert response.json() == {"status": "OK"}
+
+    monkeypatch.setattr(db_health, "ping", lambda: db_session.execute(text("SELECT 1")))
+    assert await db_health.check()
+    response = await client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json()["database"] == "up"
+
+
+async def test_conditional_get(client: AsyncClient, db_session: AsyncSession):
+    """Тест ответа 304: по версии данных для аналитики и по хешу тела для остальных запросов."""
+    token = await create_user_and_get_token(client, db_session, "etag_user", "password")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await client.get("/api/v1/analysis/sales_by_organization", headers=headers)
+    etag = response.headers["etag"]
+    response = await client.get("/api/v1/analysis/sales_by_organization", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    org = await crud_organization.create_organization(db_session, OrganizationCreate(org_name="ETag Shop"))
+    response = await client.get("/api/v1/analysis/sales_by_organization", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+    # Новый чек и его перенос в итоги меняют версию данных.
+    etag = response.headers["etag"]
+    user = await crud_user.create_user(db_session, UserCreate(username="etag_buyer", password="password"))
+    await crud_check.create_checks_bulk(db_session, [CheckCreate(check_sum=10, user_id=user.user_id,
+                                                                 org_id=org.org_id)])
+    response = await client.get("/api/v1/analysis/sales_by_organization", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+    etag = response.headers["etag"]
+    await crud_org_stats.refresh_org_stats(db_session)
+    response = await client.get("/api/v1/analysis/sales_by_organization", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+    # Чек, попавший в очередь позже чека с большим ID, тоже меняет версию.
+    first_id, _ = await crud_check.create_checks_bulk(db_session, [
+        CheckCreate(check_sum=10, user_id=user.user_id, org_id=org.org_id),
+        CheckCreate(check_sum=20, user_id=user.user_id, org_id=org.org_id),
+    ])
+    await db_session.execute(text("DELETE FROM org_stats_pending WHERE check_id = :id"), {"id": first_id})
+    await db_session.commit()
+    etag = (await client.get("/api/v1/analysis/sales_by_organization", headers=headers)).headers["etag"]
+    await crud_org_stats.enqueue_checks_for_org_stats(db_session, [first_id])
+    await db_session.commit()
+    response = await client.get("/api/v1/analysis/sales_by_organization", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+    response = await client.get(f"/api/v1/organizations/{org.org_id}", headers=headers)
+    response = await client.get(f"/api/v1/organizations/{org.org_id}",
+                                headers={**headers, "If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
@@ -0,0 +1,102 @@
+"""
+Тесты автоматического выключателя.
+"""
+import asyncio
+import time
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.db import session as db_session_module
+
+
+def test_breaker_opens_after_consecutive_failures():
+    """Тест размыкания после порога ошибок подряд; успех сбрасывает счетчик."""
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+    breaker.record_failure(ConnectionRefusedError())
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert 0 < error.value.retry_after <= 60
+    assert breaker.metrics()["rejected_total"] == 1
+    assert breaker.metrics()["opened_total"] == 1
+
+
+def test_breaker_half_open_allows_single_trial():
+    """Тест пробного вызова после паузы: ошибка снова размыкает, успех замыкает."""
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # пробный вызов уже выполняется
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_breaker_abandoned_trial_allows_next_trial():
+    """Тест: прерванный (отмененный) пробный вызов не блокирует следующий."""
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.before_call()
+    breaker.record_abandoned()
+    assert breaker.state == "half_open"
+    assert breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_connection_releases_breaker(monkeypatch):
+    """Тест: отмена запроса во время пробного подключения освобождает пробный вызов."""
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    monkeypatch.setattr(db_session_module, "db_breaker", breaker)
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    acquiring = asyncio.create_task(db_session_module.acquire_session())
+    await asyncio.sleep(0)  # задача заняла пробный вызов и ждет соединения
+    acquiring.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await acquiring
+    assert breaker.state == "half_open"
+    breaker.before_call()
+
+
+@pytest.mark.asyncio
+async def test_pool_timeout_is_not_a_database_failure(monkeypatch):
+    """Тест: исчерпание пула не размыкает выключатель и не повторяется."""
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    monkeypatch.setattr(db_session_module, "db_breaker", breaker)
+    checkouts = []
+
+    class ExhaustedPoolSession:
+        async def connection(self):
+            checkouts.append(1)
+            raise PoolTimeoutError("QueuePool limit reached")
+
+        async def close(self):
+            pass
+
+    monkeypatch.setattr(db_session_module, "AsyncSessionLocal", lambda **kwargs: ExhaustedPoolSession())
+    with pytest.raises(db_session_module.DatabaseUnavailableError):
+        await db_session_module.acquire_session(attempts=3)
+    assert len(checkouts) == 1
+    assert breaker.state == "closed"
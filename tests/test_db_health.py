@@ -0,0 +1,41 @@
+"""
+Тесты фоновой проверки доступности базы данных.
+"""
+import asyncio
+
+import pytest
+
+from app.services.db_health import DatabaseHealthMonitor
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_monitor_caches_result_and_times_out():
+    """Тест сохранения результата проверки и ограничения времени медленной проверки."""
+    delay = 0
+
+    async def ping():
+        await asyncio.sleep(delay)
+
+    monitor = DatabaseHealthMonitor(ping, timeout=0.05, max_age=60)
+    assert not monitor.ready
+    assert monitor.status()["error"] == "проверка еще не выполнялась"
+
+    assert await monitor.check()
+    assert monitor.ready and monitor.status()["database"] == "up"
+
+    delay = 1
+    assert not await asyncio.wait_for(monitor.check(), timeout=0.5)
+    assert not monitor.ready
+    assert "нет ответа" in monitor.status()["error"]
+
+
+async def test_monitor_result_expires():
+    """Тест: устаревший положительный результат не считается готовностью."""
+    async def ping():
+        pass
+
+    monitor = DatabaseHealthMonitor(ping, timeout=1, max_age=0)
+    await monitor.check()
+    await asyncio.sleep(0.01)
+    assert monitor.healthy and not monitor.ready
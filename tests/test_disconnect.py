@@ -0,0 +1,66 @@
+"""
+Тесты прерывания обработки запроса при отключении клиента.
+"""
+import asyncio
+
+import pytest
+
+from app.core.disconnect import CLIENT_CLOSED_REQUEST, CancelOnDisconnectMiddleware
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _run(app, method: str, disconnect: asyncio.Event) -> list:
+    messages = []
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    await CancelOnDisconnectMiddleware(app)({"type": "http", "method": method, "path": "/"}, receive, send)
+    return messages
+
+
+async def test_read_request_cancelled_on_disconnect():
+    """Тест отмены запроса чтения после отключения клиента."""
+    cancelled = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    disconnect = asyncio.Event()
+    request = asyncio.create_task(_run(slow_app, "GET", disconnect))
+    await asyncio.sleep(0.01)
+    disconnect.set()
+    messages = await asyncio.wait_for(request, timeout=1)
+    assert cancelled.is_set()
+    assert messages[0]["status"] == CLIENT_CLOSED_REQUEST
+
+
+async def test_completed_and_write_requests_not_cancelled():
+    """Тест обычного ответа на запрос чтения и необрываемого запроса записи."""
+    async def app(scope, receive, send):
+        assert (await receive())["type"] == "http.request"
+        await asyncio.sleep(0.02)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    messages = await _run(app, "GET", asyncio.Event())
+    assert messages[0]["status"] == 200
+
+    disconnect = asyncio.Event()
+    disconnect.set()
+    messages = await _run(app, "POST", disconnect)
+    assert messages[0]["status"] == 200
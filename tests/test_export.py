@@ -0,0 +1,60 @@
+"""
+Тесты для колоночной выгрузки (без базы данных).
+"""
+from datetime import datetime, UTC
+
+import pytest
+
+pyarrow = pytest.importorskip("pyarrow")
+import pyarrow.parquet  # noqa: E402
+
+from app.services import export  # noqa: E402
+
+CHECK_ROWS = [
+    (1, datetime(2026, 1, 1, tzinfo=UTC), 10.5, 7, 3),
+    (2, datetime(2026, 1, 2, tzinfo=UTC), 99.0, 8, 3),
+    (3, None, 0.01, 7, 4),
+]
+
+
+async def _batches(rows, size):
+    schema = export.arrow_schema("checks")
+    for start in range(0, len(rows), size):
+        yield export.rows_to_record_batch(rows[start:start + size], schema)
+
+
+def test_rows_to_record_batch():
+    """Тест преобразования строк запроса в пачку записей по схеме таблицы."""
+    batch = export.rows_to_record_batch(CHECK_ROWS, export.arrow_schema("checks"))
+    assert batch.num_rows == 3
+    assert batch.column("check_sum").to_pylist() == [10.5, 99.0, 0.01]
+    assert batch.column("created_at").to_pylist()[:2] == [row[1] for row in CHECK_ROWS[:2]]
+    assert export.rows_to_record_batch([], export.arrow_schema("items")).num_rows == 0
+
+
+@pytest.mark.asyncio
+async def test_arrow_stream_roundtrip():
+    """Тест потока Arrow IPC, собранного из частей по пачке."""
+    schema = export.arrow_schema("checks")
+    chunks = [chunk async for chunk in export.iter_arrow_stream(_batches(CHECK_ROWS, 2), schema)]
+    table = pyarrow.ipc.open_stream(b"".join(chunks)).read_all()
+    assert table.schema == schema
+    assert table.column("check_id").to_pylist() == [1, 2, 3]
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_part_writer_rotates_files(tmp_path, file_format):
+    """Тест разбиения раздела на файлы по `rows_per_file` строк."""
+    schema = export.arrow_schema("checks")
+    writer = export._PartWriter(str(tmp_path), schema, file_format, rows_per_file=2)
+    writer.write(export.rows_to_record_batch(CHECK_ROWS, schema))
+    writer.close()
+    assert writer.rows == 3
+    assert [path.rsplit("/", 1)[-1] for path in writer.files] == [
+        f"part-00000.{file_format}", f"part-00001.{file_format}",
+    ]
+    if file_format == "parquet":
+        tables = [pyarrow.parquet.read_table(path) for path in writer.files]
+    else:
+        tables = [pyarrow.ipc.open_file(path).read_all() for path in writer.files]
+    assert [table.num_rows for table in tables] == [2, 1]
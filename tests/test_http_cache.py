@@ -0,0 +1,78 @@
+"""
+Тесты сжатия ответов и условных GET-запросов (ETag/304).
+"""
+import gzip
+import zlib
+
+import pytest
+
+from app.core.compression import CompressionMiddleware, negotiate_encoding
+from app.core.http_cache import ETagMiddleware, etag_matches
+
+pytestmark = pytest.mark.asyncio
+
+
+def _app(*chunks: bytes, content_type: bytes = b"application/json"):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", content_type)]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+async def _call(middleware, headers: list, method: str = "GET") -> list:
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware({"type": "http", "method": method, "path": "/", "headers": headers}, receive, send)
+    return messages
+
+
+async def test_negotiate_encoding():
+    """Тест выбора кодировки по весам Accept-Encoding и порядку предпочтения сервера."""
+    assert negotiate_encoding("gzip, br", ["zstd", "br", "gzip"]) == "br"
+    assert negotiate_encoding("gzip;q=1, br;q=0.5", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("br;q=0, *", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("identity", ["gzip"]) is None
+
+
+async def test_compression_threshold_and_streaming():
+    """Тест сжатия ответа целиком, пропуска малых ответов и сжатия потока по частям."""
+    body = b'{"items": [' + b'{"name": "x"},' * 500 + b"]}"
+    middleware = CompressionMiddleware(_app(body), encodings=["gzip"], minimum_size=1024)
+    start, message = await _call(middleware, [(b"accept-encoding", b"gzip")])
+    assert (b"content-encoding", b"gzip") in start["headers"]
+    assert gzip.decompress(message["body"]) == body
+
+    middleware = CompressionMiddleware(_app(b"{}"), encodings=["gzip"], minimum_size=1024)
+    start, message = await _call(middleware, [(b"accept-encoding", b"gzip")])
+    assert message["body"] == b"{}"
+
+    middleware = CompressionMiddleware(_app(b'{"a": 1}\n', b'{"a": 2}\n', content_type=b"application/x-ndjson"),
+                                       encodings=["gzip"], minimum_size=1024)
+    start, first, last = await _call(middleware, [(b"accept-encoding", b"gzip")])
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # Первая часть потока декодируется сразу, не дожидаясь конца ответа.
+    assert decompressor.decompress(first["body"]) == b'{"a": 1}\n'
+    assert decompressor.decompress(last["body"]) == b'{"a": 2}\n'
+
+
+async def test_etag_not_modified():
+    """Тест ETag по хешу тела и ответа 304 на совпадающий If-None-Match."""
+    middleware = ETagMiddleware(_app(b'{"a": 1}'))
+    start, _ = await _call(middleware, [])
+    etag = dict(start["headers"])[b"etag"]
+
+    start, message = await _call(middleware, [(b"if-none-match", etag)])
+    assert start["status"] == 304 and message["body"] == b""
+    start, _ = await _call(middleware, [(b"if-none-match", b'W/"other"')])
+    assert start["status"] == 200
+
+    assert etag_matches('"v1", W/"v2"', 'W/"v2"')
+    assert not etag_matches(None, 'W/"v2"')
@@ -0,0 +1,84 @@
+"""
+Тесты для очереди асинхронного приема чеков.
+"""
+import pytest
+
+from app.services.ingestion import IngestionKeyConflict, IngestionQueue, IngestionQueueFull
+
+
+@pytest.fixture
+def queue(tmp_path):
+    """Создает очередь приема во временном файле."""
+    queue = IngestionQueue(str(tmp_path / "queue.sqlite3"), max_pending=2, claim_timeout=60)
+    yield queue
+    queue.close()
+
+
+def test_enqueue_claim_complete(queue: IngestionQueue):
+    """Тест полного цикла: постановка в очередь, захват и завершение."""
+    row = queue.enqueue(1, '{"check_sum": 1}')
+    assert row["status"] == "pending"
+
+    claimed = queue.claim(10)
+    assert [r["tracking_id"] for r in claimed] == [row["tracking_id"]]
+    assert queue.claim(10) == []
+
+    queue.complete({row["tracking_id"]: 42})
+    stored = queue.get(row["tracking_id"])
+    assert stored["status"] == "done"
+    assert stored["check_id"] == 42
+
+
+def test_enqueue_with_client_key_is_idempotent(queue: IngestionQueue):
+    """Тест повторной постановки с тем же ключом клиента."""
+    first = queue.enqueue(1, "{}", client_key="1:key")
+    second = queue.enqueue(1, "{}", client_key="1:key")
+    assert first["tracking_id"] == second["tracking_id"]
+
+
+def test_backpressure(queue: IngestionQueue):
+    """Тест отказа в приеме при переполнении очереди."""
+    queue.enqueue(1, "{}")
+    queue.enqueue(1, "{}")
+    with pytest.raises(IngestionQueueFull):
+        queue.enqueue(1, "{}")
+
+
+def test_expired_claim_is_recovered(tmp_path):
+    """Тест повторной выдачи записей, захваченных упавшим потребителем."""
+    path = str(tmp_path / "queue.sqlite3")
+    crashed = IngestionQueue(path, max_pending=10, claim_timeout=0)
+    row = crashed.enqueue(1, "{}")
+    assert crashed.claim(10)
+    crashed.close()
+
+    restarted = IngestionQueue(path, max_pending=10, claim_timeout=0)
+    assert [r["tracking_id"] for r in restarted.claim(10)] == [row["tracking_id"]]
+    restarted.close()
+
+
+def test_client_key_with_different_payload_conflicts(queue: IngestionQueue):
+    """Тест отказа при повторе ключа клиента с другим телом запроса."""
+    queue.enqueue(1, '{"check_sum": 1}', client_key="1:key")
+    with pytest.raises(IngestionKeyConflict):
+        queue.enqueue(1, '{"check_sum": 2}', client_key="1:key")
+
+
+def test_pending_counter_follows_statuses(tmp_path):
+    """Тест счетчика необработанных записей: завершенные записи освобождают место, повторно не учитываются."""
+    path = str(tmp_path / "queue.sqlite3")
+    queue = IngestionQueue(path, max_pending=2, claim_timeout=60)
+    first = queue.enqueue(1, "{}")
+    second = queue.enqueue(1, "{}")
+    queue.claim(10)
+    queue.complete({first["tracking_id"]: 1})
+    queue.complete({first["tracking_id"]: 1})
+    queue.fail({second["tracking_id"]: "ошибка"})
+    queue.enqueue(1, "{}")
+    queue.close()
+
+    restarted = IngestionQueue(path, max_pending=2, claim_timeout=60)
+    restarted.enqueue(1, "{}")
+    with pytest.raises(IngestionQueueFull):
+        restarted.enqueue(1, "{}")
+    restarted.close()
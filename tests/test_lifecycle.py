@@ -0,0 +1,64 @@
+"""
+Тесты плавной остановки: учет выполняющихся запросов и остановка фоновых задач.
+"""
+import asyncio
+
+import pytest
+
+from app.core.lifecycle import InFlightRequestsMiddleware, RequestTracker
+from app.services.periodic import run_periodically
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _call(middleware, messages: list):
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware({"type": "http", "method": "GET", "path": "/"}, receive, send)
+
+
+async def test_tracker_waits_for_in_flight_requests():
+    """Тест ожидания выполняющегося запроса и отказа в новых запросах при остановке."""
+    tracker = RequestTracker()
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = InFlightRequestsMiddleware(app, tracker)
+    first: list = []
+    request = asyncio.create_task(_call(middleware, first))
+    await asyncio.sleep(0)
+    assert tracker.in_flight == 1
+
+    tracker.start_draining()
+    rejected: list = []
+    await _call(middleware, rejected)
+    assert rejected[0]["status"] == 503
+    assert not await tracker.wait_idle(timeout=0.01)
+
+    release.set()
+    assert await tracker.wait_idle(timeout=1)
+    await request
+    assert first[0]["status"] == 200 and tracker.in_flight == 0
+
+
+async def test_periodic_job_stops_after_current_run():
+    """Тест завершения цикла периодической задачи по событию без прерывания текущего запуска."""
+    stopping = asyncio.Event()
+    runs = []
+
+    async def job():
+        runs.append("start")
+        stopping.set()
+        await asyncio.sleep(0.01)
+        runs.append("end")
+
+    await asyncio.wait_for(run_periodically(job, interval=3600, name="test", stopping=stopping), timeout=1)
+    assert runs == ["start", "end"]
@@ -0,0 +1,121 @@
+"""
+Тесты ограничения частоты запросов: ведро токенов, ключ клиента и ответ 429.
+"""
+import pytest
+
+from app.core.config import RateLimitRule
+from app.core.rate_limit import (
+    LocalRateLimitStore,
+    RateLimitMiddleware,
+    RateLimiter,
+    RedisRateLimitStore,
+    client_key,
+)
+from app.core.security import create_access_token
+
+pytestmark = pytest.mark.asyncio
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def test_token_bucket_refills_over_time():
+    """Тест расхода всплеска и пополнения ведра со временем."""
+    clock = _Clock()
+    store = LocalRateLimitStore(max_keys=10, clock=clock)
+    results = [await store.consume("k", rate=2, capacity=3) for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert results[2].remaining == 0 and results[3].retry_after == pytest.approx(0.5)
+
+    clock.now = 0.5
+    assert (await store.consume("k", rate=2, capacity=3)).allowed
+    assert not (await store.consume("k", rate=2, capacity=3)).allowed
+    assert (await store.consume("other", rate=2, capacity=3)).allowed
+
+
+async def test_local_store_evicts_least_recently_used():
+    """Тест ограничения количества ведер в памяти."""
+    store = LocalRateLimitStore(max_keys=2, clock=_Clock())
+    for key in ("a", "b", "a", "c"):
+        await store.consume(key, rate=1, capacity=1)
+    assert (await store.consume("a", rate=1, capacity=1)).allowed is False
+    assert (await store.consume("b", rate=1, capacity=1)).allowed is True  # ведро "b" было вытеснено
+
+
+async def test_client_key_uses_token_or_ip():
+    """Тест определения клиента по JWT-токену и по IP-адресу."""
+    token = create_access_token({"sub": "alice"})
+    scope = {"headers": [(b"authorization", f"Bearer {token}".encode())], "client": ("10.0.0.1", 5000)}
+    assert client_key(scope) == "user:alice"
+    scope["headers"] = [(b"authorization", b"Bearer forged")]
+    assert client_key(scope) == "ip:10.0.0.1"
+
+
+async def test_redis_store_falls_back_to_local_buckets():
+    """Тест ограничения локальными ведрами при недоступном Redis."""
+    class UnavailableRedis:
+        def register_script(self, script):
+            async def call(keys, args):
+                raise ConnectionError("redis down")
+            return call
+
+    store = RedisRateLimitStore(UnavailableRedis(), fallback=LocalRateLimitStore(max_keys=10, clock=_Clock()))
+    assert (await store.consume("k", rate=1, capacity=1)).allowed
+    assert not (await store.consume("k", rate=1, capacity=1)).allowed
+
+
+async def test_redis_store_skips_redis_during_cooldown():
+    """Тест: после ошибки Redis не вызывается до истечения паузы."""
+    calls = []
+
+    class UnavailableRedis:
+        def register_script(self, script):
+            async def call(keys, args):
+                calls.append(keys)
+                raise ConnectionError("redis down")
+            return call
+
+    store = RedisRateLimitStore(UnavailableRedis(), fallback=LocalRateLimitStore(max_keys=10, clock=_Clock()),
+                                cooldown_seconds=60)
+    for _ in range(3):
+        await store.consume("k", rate=10, capacity=10)
+    assert len(calls) == 1
+    assert store.breaker.state == "open"
+
+
+async def test_middleware_returns_429_with_headers():
+    """Тест заголовков RateLimit-* и ответа 429 с Retry-After."""
+    rule = RateLimitRule(name="login", path="/api/v1/login/", methods=["POST"], limit=1, period_seconds=60)
+    limiter = RateLimiter([rule], LocalRateLimitStore(max_keys=10))
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = RateLimitMiddleware(app, limiter)
+
+    async def call() -> dict:
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/api/v1/login/token",
+                 "headers": [], "client": ("10.0.0.1", 5000)}
+        await middleware(scope, receive, send)
+        return messages[0]
+
+    first, second = await call(), await call()
+    assert first["status"] == 200
+    assert (b"ratelimit-remaining", b"0") in first["headers"]
+    assert (b"ratelimit-policy", b"1;w=60") in first["headers"]
+    assert second["status"] == 429
+    assert (b"retry-after", b"60") in second["headers"]
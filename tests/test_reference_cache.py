@@ -0,0 +1,59 @@
+"""
+Тесты кэша справочников в памяти процесса.
+"""
+import asyncio
+
+import pytest
+
+from app.services.reference_cache import VersionedLRUCache, handle_notification, organization_cache, user_cache
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_lru_eviction_and_loading():
+    """Тест загрузки отсутствующих ключей одним вызовом и вытеснения давно не читавшихся."""
+    cache = VersionedLRUCache("test", capacity=2)
+    loads = []
+
+    async def load(keys):
+        loads.append(keys)
+        return {key: f"value-{key}" for key in keys if key != 404}
+
+    assert await cache.get_many([1, 2, 404], load) == {1: "value-1", 2: "value-2"}
+    assert await cache.get_many([1], load) == {1: "value-1"}
+    await cache.get_many([3], load)  # вытесняет 2: к 1 обращались позже
+    assert cache.get_cached([1, 2, 3]) == ({1: "value-1", 3: "value-3"}, [2])
+    assert loads == [[1, 2, 404], [3]]
+
+
+async def test_stale_load_not_cached_after_invalidation():
+    """Тест: значение, прочитанное до инвалидации, не попадает в кэш."""
+    cache = VersionedLRUCache("test", capacity=10)
+    reading = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_load(keys):
+        reading.set()
+        await release.wait()
+        return {key: "old" for key in keys}
+
+    request = asyncio.create_task(cache.get_many([1], slow_load))
+    await reading.wait()
+    cache.invalidate([1])
+    release.set()
+    assert await request == {1: "old"}
+    assert cache.get_cached([1]) == ({}, [1])
+
+
+async def test_notification_invalidates_caches():
+    """Тест применения уведомлений об изменении строки и о сбросе всех кэшей."""
+    organization_cache.put_many({1: "org-1", 2: "org-2"}, organization_cache.version)
+    user_cache.put_many({1: "user-1"}, user_cache.version)
+
+    handle_notification("organizations:1")
+    assert organization_cache.get_cached([1, 2]) == ({2: "org-2"}, [1])
+    assert user_cache.get_cached([1]) == ({1: "user-1"}, [])
+
+    handle_notification("*")
+    assert organization_cache.get_cached([2]) == ({}, [2])
+    assert user_cache.get_cached([1]) == ({}, [1])
@@ -0,0 +1,51 @@
+"""
+Тесты для вероятностных скетчей аналитики.
+"""
+import pytest
+
+from app.core.sketches import DDSketch, HyperLogLog
+
+
+@pytest.mark.parametrize("count", [10, 1_000, 50_000])
+def test_hyperloglog_estimate(count: int):
+    """Тест точности оценки в пределах трех стандартных погрешностей."""
+    sketch = HyperLogLog()
+    sketch.update(range(count))
+    sketch.update(range(count))  # повторы не влияют на оценку
+    assert sketch.estimate() == pytest.approx(count, rel=3 * sketch.relative_error)
+
+
+def test_hyperloglog_merge():
+    """Тест объединения скетчей с пересекающимися множествами."""
+    first, second = HyperLogLog(), HyperLogLog()
+    first.update(range(0, 20_000))
+    second.update(range(10_000, 30_000))
+
+    merged = HyperLogLog.merged([first.to_bytes(), second.to_bytes()])
+    assert merged.estimate() == pytest.approx(30_000, rel=3 * merged.relative_error)
+
+    first.merge(second)
+    assert first.to_bytes() == merged.to_bytes()
+    assert HyperLogLog.merged([]).estimate() == 0
+
+
+def test_ddsketch_quantiles_and_merge():
+    """Тест квантилей DDSketch и совпадения векторного и поэлементного объединения."""
+    values = [round(1.05 ** n, 2) for n in range(1, 200)]
+    parts = [DDSketch() for _ in range(3)]
+    for n, value in enumerate(values):
+        parts[n % 3].add(value)
+
+    merged = DDSketch.merged(part.to_bytes() for part in parts)
+    expected = sorted(values)
+    for q in (0.5, 0.9, 0.99):
+        assert merged.quantile(q) == pytest.approx(expected[int(q * (len(values) - 1))],
+                                                   rel=merged.relative_accuracy)
+    assert (merged.count, merged.min, merged.max) == (len(values), min(values), max(values))
+    assert sum(count for _, _, count in merged.histogram(10)) == len(values)
+
+    sequential = DDSketch()
+    for part in parts:
+        sequential.merge(DDSketch.from_bytes(part.to_bytes()))
+    assert sequential.bins == merged.bins
+    assert DDSketch.merged([]).quantile(0.5) is None